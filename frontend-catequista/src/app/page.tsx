@@ -5,14 +5,15 @@ import {
   MapPin, Clock, Calendar, Users, Search, X,
   Save, BookOpen, Cake, AlertCircle, ChevronLeft, ChevronRight, FileDown,
   ArrowUp, ArrowDown, ArrowUpDown,
-  User, Heart, MessageSquare, Book, Star, Info, FileText, Pencil, Home, Shield, Phone,
+  User, Heart, MessageSquare, Book, Star, Info, FileText, Pencil, Home, Shield, Phone, ClipboardCheck,
 } from 'lucide-react';
 import Nav from '@/components/Nav';
 import PhaseChip from '@/components/PhaseChip';
 import { FullPageLoading } from '@/components/Loading';
 import { useAuthGuard } from '@/lib/useAuthGuard';
+import { subscribeAvisos } from '@/lib/realtime';
 import { api } from '@/lib/api';
-import type { TurmaComCatecumenos, CatecumenoCompleto, FieldConfigItem, PortalSectionConfig, AvisoAtivo, RetiroProximo } from '@/types/catequista';
+import type { TurmaComCatecumenos, CatecumenoCompleto, FieldConfigItem, PortalSectionConfig, AvisoAtivo, RetiroProximo, RegistoPresencasResult } from '@/types/catequista';
 
 // ── Section icon map ──────────────────────────────────────────────────────────
 
@@ -841,6 +842,192 @@ function SidePanel({ open, cat, turma, fieldConfig, sectionConfig, allCatecumeno
   );
 }
 
+// ── Registo de presenças (one session of a turma) ────────────────────────────
+// Totals are never edited directly: each session is sent to registar_presencas,
+// which logs it and adjusts the totals by increment on the server.
+
+function todayISO(): string {
+  const d = new Date();
+  return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+}
+
+interface PresencasModalProps {
+  turma: TurmaComCatecumenos;
+  onClose: () => void;
+  onSaved: (totais: RegistoPresencasResult['totais']) => void;
+}
+
+function PresencasModal({ turma, onClose, onSaved }: PresencasModalProps) {
+  const [data,     setData]     = useState(todayISO());
+  const [marks,    setMarks]    = useState<Record<string, 0 | 1>>({});
+  const [loading,  setLoading]  = useState(true);
+  const [saving,   setSaving]   = useState(false);
+  const [error,    setError]    = useState('');
+  const [existing, setExisting] = useState(false);
+
+  const activos = useMemo(
+    () => turma.catecumenos.filter(c => c.status === 'Activo'),
+    [turma],
+  );
+
+  // Load what was already logged for this date — re-saving a session corrects it
+  useEffect(() => {
+    let cancelled = false;
+    setLoading(true);
+    setError('');
+    api.getPresencasSessao(turma.name, data)
+      .then(logged => {
+        if (cancelled) return;
+        const next: Record<string, 0 | 1> = {};
+        activos.forEach(c => { next[c.name] = c.name in logged ? logged[c.name] : 1; });
+        setMarks(next);
+        setExisting(Object.keys(logged).length > 0);
+      })
+      .catch(e => { if (!cancelled) setError(String((e as Error).message || e)); })
+      .finally(() => { if (!cancelled) setLoading(false); });
+    return () => { cancelled = true; };
+  }, [turma.name, data, activos]);
+
+  useEffect(() => {
+    const onKey = (e: KeyboardEvent) => { if (e.key === 'Escape' && !saving) onClose(); };
+    window.addEventListener('keydown', onKey);
+    return () => window.removeEventListener('keydown', onKey);
+  }, [onClose, saving]);
+
+  const presentes = Object.values(marks).filter(v => v === 1).length;
+
+  async function handleSave() {
+    setSaving(true);
+    setError('');
+    try {
+      const res = await api.registarPresencas(
+        turma.name,
+        data,
+        Object.entries(marks).map(([catecumeno, presente]) => ({ catecumeno, presente })),
+      );
+      const failed = res.results.filter(r => !r.success);
+      onSaved(res.totais);
+      if (failed.length) {
+        setError(failed.map(r => `${r.catecumeno}: ${r.error}`).join('\n'));
+      } else {
+        onClose();
+      }
+    } catch (e) {
+      setError(String((e as Error).message || e));
+    } finally {
+      setSaving(false);
+    }
+  }
+
+  return (
+    <div className="fixed inset-0 z-50 flex items-end md:items-center justify-center md:p-4 bg-navy-900/60 backdrop-blur-sm" onClick={() => !saving && onClose()}>
+      <div
+        className="w-full md:max-w-lg bg-white rounded-t-2xl md:rounded-2xl shadow-2xl flex flex-col max-h-[90dvh] animate-fade-up"
+        onClick={e => e.stopPropagation()}
+      >
+        <div className="flex items-start justify-between gap-2 px-5 py-4 border-b border-cream-200 shrink-0">
+          <div className="min-w-0">
+            <h3 className="font-display font-bold text-navy-900 text-base">Registar presenças</h3>
+            <p className="text-xs text-slate-500 mt-0.5 truncate">{turma.name}</p>
+          </div>
+          <button
+            onClick={onClose}
+            disabled={saving}
+            className="p-1.5 rounded-lg text-slate-400 hover:text-navy-900 hover:bg-cream-100 transition-colors shrink-0"
+          >
+            <X className="w-5 h-5" />
+          </button>
+        </div>
+
+        <div className="px-5 py-3 border-b border-cream-200 shrink-0 flex items-center gap-3 flex-wrap">
+          <label className="text-xs font-medium text-slate-500">Data da sessão</label>
+          <input
+            type="date"
+            value={data}
+            max={todayISO()}
+            onChange={e => e.target.value && setData(e.target.value)}
+            className="text-sm border border-cream-300 rounded-lg px-2.5 py-1.5 focus:outline-none focus:ring-2 focus:ring-navy-900/20"
+          />
+          {existing && !loading && (
+            <span className="text-xs font-medium text-amber-700 bg-amber-50 border border-amber-200 rounded-full px-2.5 py-0.5">
+              Sessão já registada — as alterações corrigem-na
+            </span>
+          )}
+        </div>
+
+        <div className="overflow-y-auto flex-1 min-h-0 px-5 py-3">
+          {loading ? (
+            <div className="py-10 flex justify-center">
+              <div className="w-6 h-6 rounded-full border-2 border-cream-300 border-t-navy-900 animate-spin" />
+            </div>
+          ) : activos.length === 0 ? (
+            <p className="py-10 text-center text-sm text-slate-400">Sem catecúmenos activos nesta turma.</p>
+          ) : (
+            <ul className="divide-y divide-cream-100">
+              {activos.map(c => {
+                const presente = marks[c.name] === 1;
+                return (
+                  <li key={c.name} className="flex items-center justify-between gap-3 py-2.5">
+                    <span className="text-sm text-navy-900 truncate">{c.name}</span>
+                    <div className="flex rounded-lg border border-cream-300 overflow-hidden shrink-0 text-xs font-semibold">
+                      <button
+                        onClick={() => setMarks(m => ({ ...m, [c.name]: 1 }))}
+                        className={`px-3 py-1.5 transition-colors ${presente ? 'bg-emerald-600 text-white' : 'text-slate-500 hover:bg-cream-100'}`}
+                      >
+                        Presente
+                      </button>
+                      <button
+                        onClick={() => setMarks(m => ({ ...m, [c.name]: 0 }))}
+                        className={`px-3 py-1.5 transition-colors ${!presente ? 'bg-rose-600 text-white' : 'text-slate-500 hover:bg-cream-100'}`}
+                      >
+                        Falta
+                      </button>
+                    </div>
+                  </li>
+                );
+              })}
+            </ul>
+          )}
+
+          {error && (
+            <div className="mt-3 flex items-start gap-2 bg-rose-50 border border-rose-200 rounded-lg px-3.5 py-3">
+              <AlertCircle className="w-4 h-4 text-rose-500 shrink-0 mt-0.5" />
+              <p className="text-sm text-rose-700 whitespace-pre-line">{error}</p>
+            </div>
+          )}
+        </div>
+
+        <div className="px-5 py-4 border-t border-cream-200 shrink-0 flex items-center justify-between gap-3">
+          <span className="text-xs text-slate-500 tabular-nums">
+            {presentes} / {activos.length} presentes
+          </span>
+          <div className="flex items-center gap-3">
+            <button
+              onClick={onClose}
+              disabled={saving}
+              className="px-4 py-2 rounded-lg text-sm font-medium text-slate-600 hover:bg-cream-100 transition-colors"
+            >
+              Cancelar
+            </button>
+            <button
+              onClick={handleSave}
+              disabled={saving || loading || activos.length === 0}
+              className="flex items-center gap-2 px-4 py-2 rounded-lg bg-navy-900 hover:bg-navy-800 text-white text-sm font-semibold transition-all disabled:opacity-50"
+            >
+              {saving ? (
+                <div className="w-4 h-4 rounded-full border-2 border-white/30 border-t-white animate-spin" />
+              ) : (
+                <Save className="w-4 h-4" />
+              )}
+              {saving ? 'A guardar...' : 'Guardar sessão'}
+            </button>
+          </div>
+        </div>
+      </div>
+    </div>
+  );
+}
+
 // ── Catecumenos Table ─────────────────────────────────────────────────────────
 
 interface TableProps {
@@ -1088,12 +1275,11 @@ function dequeueRetry(avisoName: string): void {
 async function drainAvisoRetryQueue(): Promise<void> {
   const pending = getPendingRetries();
   if (!pending.length) return;
-  for (const name of pending) {
-    try {
-      await api.marcarAvisoVisto(name);
-      dequeueRetry(name);
-    } catch { /* still offline — leave for next drain */ }
-  }
+  try {
+    // Whole queue in one call; unknown avisos are dropped server-side
+    await api.marcarAvisosVistos(pending);
+    pending.forEach(dequeueRetry);
+  } catch { /* still offline — leave for next drain */ }
 }
 
 function AvisoModal({
@@ -1507,6 +1693,7 @@ export default function DashboardPage() {
   const closePanelTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
   const [birthdayPanelOpen, setBirthdayPanelOpen] = useState(false);
   const [avisos, setAvisos] = useState<AvisoAtivo[]>([]);
+  const [presencasTurmaIdx, setPresencasTurmaIdx] = useState<number | null>(null);
 
   const weekBirthdayCount = useMemo(
     () => turmas.flatMap(t => t.catecumenos).filter(c => isBirthdaySoon(c.data_de_nascimento)).length,
@@ -1522,6 +1709,14 @@ export default function DashboardPage() {
     return () => document.removeEventListener('visibilitychange', onVisible);
   }, [auth]);
 
+  // New / edited avisos are pushed over realtime — refetch only when notified
+  useEffect(() => {
+    if (!auth) return;
+    return subscribeAvisos(auth.realtime_namespace || '/', () => {
+      api.getAvisosAtivos().then(setAvisos).catch(() => { /* keep current list */ });
+    });
+  }, [auth]);
+
   useEffect(() => {
     if (!auth) return;
     Promise.all([api.getMinhaTurma(), api.getFieldConfig(), api.getAvisosAtivos(), api.getProximosRetiros()])
@@ -1570,6 +1765,15 @@ export default function DashboardPage() {
     setPanel(p => p ? { ...p, cat: updated } : null);
   }, [panel]);
 
+  // Apply the totals returned by registar_presencas to the turma (and the open panel)
+  const handlePresencasSaved = useCallback((turmaIdx: number, totais: RegistoPresencasResult['totais']) => {
+    const withTotais = (c: CatecumenoCompleto) => (c.name in totais ? { ...c, ...totais[c.name] } : c);
+    setTurmas(prev => prev.map((t, i) => (
+      i === turmaIdx ? { ...t, catecumenos: t.catecumenos.map(withTotais) } : t
+    )));
+    setPanel(p => (p && p.turmaIdx === turmaIdx ? { ...p, cat: withTotais(p.cat) } : p));
+  }, []);
+
   const retry = useCallback(() => {
     setDataLoading(true);
     setDataError('');
@@ -1657,9 +1861,18 @@ export default function DashboardPage() {
             )}
             <TurmaHeader turma={turma} fieldConfig={fieldConfig} />
             <div className="mt-5">
-              <h3 className="font-display font-bold text-navy-900 text-base mb-3 px-0.5">
-                Catecúmenos
-              </h3>
+              <div className="flex items-center justify-between gap-3 mb-3 px-0.5">
+                <h3 className="font-display font-bold text-navy-900 text-base">
+                  Catecúmenos
+                </h3>
+                <button
+                  onClick={() => setPresencasTurmaIdx(turmaIdx)}
+                  className="flex items-center gap-1.5 px-3 py-1.5 rounded-lg border border-cream-300 bg-white text-xs font-semibold text-navy-900 hover:bg-cream-100 transition-colors"
+                >
+                  <ClipboardCheck className="w-3.5 h-3.5" />
+                  Registar presenças
+                </button>
+              </div>
               <CatecumenosTable
                 catecumenos={turma.catecumenos}
                 fieldConfig={fieldConfig}
@@ -1677,6 +1890,15 @@ export default function DashboardPage() {
         turmas={turmas}
       />
 
+      {/* Session attendance sheet */}
+      {presencasTurmaIdx !== null && turmas[presencasTurmaIdx] && (
+        <PresencasModal
+          turma={turmas[presencasTurmaIdx]}
+          onClose={() => setPresencasTurmaIdx(null)}
+          onSaved={totais => handlePresencasSaved(presencasTurmaIdx, totais)}
+        />
+      )}
+
       {/* Side panel */}
       <SidePanel
         open={panelOpen}
@@ -1,4 +1,4 @@
-import type { AuthInfo, CatecumenoCompleto, TurmaComCatecumenos, FieldConfigItem, PortalSectionConfig, AvisoAtivo, QuotasResumo, RetiroProximo } from '@/types/catequista';
+import type { AuthInfo, CatecumenoCompleto, TurmaComCatecumenos, FieldConfigItem, PortalSectionConfig, AvisoAtivo, QuotasResumo, RetiroProximo, RegistoPresencasResult } from '@/types/catequista';
 
 const BASE_URL = process.env.NEXT_PUBLIC_FRAPPE_URL || '';
 const APP = 'portal.api';
@@ -54,15 +54,27 @@ function parseServerMsg(raw: unknown): string {
   }
 }
 
+// Last ETag + payload per URL. Replayed as If-None-Match so unchanged data
+// comes back as an empty 304 instead of the full JSON payload.
+// Kept in memory only (never persisted) and cleared on logout.
+const _etagCache = new Map<string, { etag: string; message: unknown }>();
+
 async function frappeFetch<T>(method: string, params?: Record<string, string>): Promise<T> {
   const qs = params ? '?' + new URLSearchParams(params).toString() : '';
-  const res = await fetch(`${BASE_URL}/api/method/${APP}.${method}${qs}`, {
+  const url = `${BASE_URL}/api/method/${APP}.${method}${qs}`;
+  const cached = _etagCache.get(url);
+  const headers: Record<string, string> = { Accept: 'application/json' };
+  if (cached) headers['If-None-Match'] = cached.etag;
+  const res = await fetch(url, {
     credentials: 'include',
-    headers: { Accept: 'application/json' },
+    cache: 'no-store',
+    headers,
   });
 
   if (res.status === 403 || res.status === 401) return _handleAuthError();
 
+  if (res.status === 304 && cached) return cached.message as T;
+
   if (!res.ok) {
     const body = await res.json().catch(() => ({})) as Record<string, unknown>;
     throw new Error(parseServerMsg(body._server_messages) || `Erro ${res.status}`);
@@ -75,6 +87,8 @@ async function frappeFetch<T>(method: string, params?: Record<string, string>):
   if (data.exc) {
     throw new Error(parseServerMsg(data._server_messages) || String(data.exc_value || 'Erro no servidor'));
   }
+  const etag = res.headers.get('ETag');
+  if (etag) _etagCache.set(url, { etag, message: data.message });
   return data.message as T;
 }
 
@@ -134,6 +148,7 @@ export async function login(usr: string, pwd: string): Promise<void> {
 }
 
 export async function logout(): Promise<void> {
+  _etagCache.clear();
   await fetch(`${BASE_URL}/api/method/logout`, {
     credentials: 'include',
   }).catch(() => {});
@@ -164,6 +179,28 @@ export const api = {
       ...dados,
     }),
 
+  atualizarCatecumenosEmLote: (
+    turma: string,
+    edits: { catecumeno: string; row_name?: string; fields: Record<string, string | number | null | undefined> }[]
+  ): Promise<{ success: boolean; results: { catecumeno: string; success: boolean; error?: string }[] }> =>
+    frappePOST<{ success: boolean; results: { catecumeno: string; success: boolean; error?: string }[] }>(
+      'atualizar_catecumenos_em_lote',
+      { turma, edits: JSON.stringify(edits) },
+    ),
+
+  registarPresencas: (
+    turma: string,
+    data: string,
+    presencas: { catecumeno: string; presente: 0 | 1 }[]
+  ): Promise<RegistoPresencasResult> =>
+    frappePOST<RegistoPresencasResult>(
+      'registar_presencas',
+      { turma, data, presencas: JSON.stringify(presencas) },
+    ),
+
+  getPresencasSessao: (turma: string, data: string): Promise<Record<string, 0 | 1>> =>
+    frappeFetch<Record<string, 0 | 1>>('get_presencas_sessao', { turma, data }),
+
   alterarSenha: (senha_atual: string, senha_nova: string): Promise<{ success: boolean }> =>
     frappePOST<{ success: boolean }>('alterar_senha', { senha_atual, senha_nova }),
 
@@ -173,6 +210,9 @@ export const api = {
   marcarAvisoVisto: (aviso_name: string): Promise<{ success: boolean }> =>
     frappePOST<{ success: boolean }>('marcar_aviso_visto', { aviso_name }),
 
+  marcarAvisosVistos: (avisos: string[]): Promise<{ success: boolean; marcados: string[] }> =>
+    frappePOST<{ success: boolean; marcados: string[] }>('marcar_avisos_vistos', { avisos: JSON.stringify(avisos) }),
+
   getQuotasResumo: (ano?: string): Promise<QuotasResumo> =>
     frappeFetch<QuotasResumo>('get_quotas_resumo', ano ? { ano } : undefined),
 
@@ -181,4 +221,4 @@ export const api = {
 };
 
 // Re-export types for convenience
-export type { AuthInfo, CatecumenoCompleto, TurmaComCatecumenos, FieldConfigItem, PortalSectionConfig, AvisoAtivo, QuotasResumo, RetiroProximo };
+export type { AuthInfo, CatecumenoCompleto, TurmaComCatecumenos, FieldConfigItem, PortalSectionConfig, AvisoAtivo, QuotasResumo, RetiroProximo, RegistoPresencasResult };
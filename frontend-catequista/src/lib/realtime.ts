@@ -0,0 +1,60 @@
+// Realtime aviso notifications over Frappe's socket.io server.
+//
+// The socket.io client is loaded from the Frappe site itself
+// (/socket.io/socket.io.js is served by the socketio process), so the portal
+// needs no extra npm dependency and always matches the server's version.
+// The server joins each connection to its user room from the session cookie;
+// portal.avisos.publicar_aviso emits AVISO_EVENT to the affected users.
+
+const BASE_URL = process.env.NEXT_PUBLIC_FRAPPE_URL || '';
+const AVISO_EVENT = 'portal_aviso';
+
+interface RealtimeSocket {
+  on(event: string, handler: (data: unknown) => void): void;
+  disconnect(): void;
+}
+
+type SocketIoFactory = (url: string, opts: Record<string, unknown>) => RealtimeSocket;
+
+let _ioPromise: Promise<SocketIoFactory | null> | null = null;
+
+function loadSocketIo(): Promise<SocketIoFactory | null> {
+  if (typeof window === 'undefined') return Promise.resolve(null);
+  if (_ioPromise) return _ioPromise;
+
+  _ioPromise = new Promise(resolve => {
+    const w = window as unknown as { io?: SocketIoFactory };
+    if (w.io) return resolve(w.io);
+
+    const script = document.createElement('script');
+    script.src = `${BASE_URL}/socket.io/socket.io.js`;
+    script.async = true;
+    script.onload = () => resolve(w.io ?? null);
+    // No realtime server — the portal still works, just without live avisos
+    script.onerror = () => { _ioPromise = null; resolve(null); };
+    document.head.appendChild(script);
+  });
+  return _ioPromise;
+}
+
+/** Calls onChange whenever an aviso targeting this user is activated, edited
+ *  or deactivated. Returns an unsubscribe function. */
+export function subscribeAvisos(namespace: string, onChange: () => void): () => void {
+  let socket: RealtimeSocket | null = null;
+  let cancelled = false;
+
+  loadSocketIo().then(io => {
+    if (!io || cancelled) return;
+    const origin = BASE_URL || window.location.origin;
+    socket = io(`${origin}${namespace === '/' ? '' : namespace}`, {
+      withCredentials: true,
+      reconnectionAttempts: 5,
+    });
+    socket.on(AVISO_EVENT, () => onChange());
+  });
+
+  return () => {
+    cancelled = true;
+    socket?.disconnect();
+  };
+}
@@ -2,6 +2,7 @@ export interface AuthInfo {
   catequista: string;
   user: string;
   csrf_token: string;
+  realtime_namespace?: string;
 }
 
 export interface CatecumenoCompleto {
@@ -17,6 +18,9 @@ export interface CatecumenoCompleto {
   idade: number | null;
   obs: string | null;
   row_name: string | null;
+  // Turma Catecumenos totals — read-only, maintained by registar_presencas
+  total_presencas?: number;
+  total_faltas?: number;
 }
 
 export interface TurmaComCatecumenos {
@@ -35,6 +39,12 @@ export interface TurmaComCatecumenos {
   [key: string]: unknown;
 }
 
+export interface RegistoPresencasResult {
+  success: boolean;
+  results: { catecumeno: string; success: boolean; error?: string }[];
+  totais: Record<string, { total_presencas: number; total_faltas: number }>;
+}
+
 export interface AvisoAtivo {
   name: string;
   titulo: string;
@@ -1,36 +1,103 @@
 'use client';
 
-import { useEffect, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 import { Search, X } from 'lucide-react';
 import { api } from '@/lib/api';
-import type { Catecumeno } from '@/types/catequese';
+import type { Catecumeno, Turma } from '@/types/catequese';
 import PhaseChip from './PhaseChip';
 import Loading from './Loading';
 
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 250;
+
 export default function CatecumenosTable() {
-  const [all, setAll] = useState<Catecumeno[]>([]);
+  const [rows, setRows] = useState<Catecumeno[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [hasMore, setHasMore] = useState(true);
+  const [total, setTotal] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [fase, setFase] = useState('');
+  const [turma, setTurma] = useState('');
   const [filter, setFilter] = useState('');
+  const [q, setQ] = useState('');
+  const [fases, setFases] = useState<string[]>([]);
+  const [turmas, setTurmas] = useState<Turma[]>([]);
+
+  // Incremented on every filter change so late responses for old filters are dropped
+  const requestId = useRef(0);
+  const sentinel = useRef<HTMLDivElement | null>(null);
 
   useEffect(() => {
-    api.getCatecumenos()
-      .then((r) => setAll(r ?? []))
-      .catch(() => {})
-      .finally(() => setLoading(false));
+    api.getEstatisticas()
+      .then((e) => setFases((e?.por_fase ?? []).map((f) => f.fase)))
+      .catch(() => {});
+    api.getTurmas()
+      .then((t) => setTurmas(t ?? []))
+      .catch(() => {});
   }, []);
 
-  const filtered = filter.trim().length === 0
-    ? all
-    : all.filter((c) => {
-        const q = filter.toLowerCase();
-        return (
-          c.name.toLowerCase().includes(q) ||
-          (c.turma && c.turma.toLowerCase().includes(q)) ||
-          (c.fase && c.fase.toLowerCase().includes(q)) ||
-          (c.catequista && c.catequista.toLowerCase().includes(q)) ||
-          (c.local && c.local.toLowerCase().includes(q))
-        );
-      });
+  // The text filter is applied by the server — debounce it before querying
+  useEffect(() => {
+    const timer = setTimeout(() => setQ(filter.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [filter]);
+
+  // Reset and load the first page whenever the filters change
+  useEffect(() => {
+    const id = ++requestId.current;
+    setLoading(true);
+    setRows([]);
+    setCursor(null);
+    setHasMore(true);
+    setTotal(null);
+
+    api.getTotalCatecumenos({ fase, turma, q })
+      .then((n) => { if (id === requestId.current) setTotal(n ?? 0); })
+      .catch(() => {});
+
+    api.getCatecumenosPagina({ pageSize: PAGE_SIZE, fase, turma, q })
+      .then((page) => {
+        if (id !== requestId.current) return;
+        setRows(page?.rows ?? []);
+        setCursor(page?.next_cursor ?? null);
+        setHasMore(Boolean(page?.next_cursor));
+      })
+      .catch(() => { if (id === requestId.current) setHasMore(false); })
+      .finally(() => { if (id === requestId.current) setLoading(false); });
+  }, [fase, turma, q]);
+
+  const loadMore = useCallback(() => {
+    if (loading || loadingMore || !hasMore || !cursor) return;
+    const id = requestId.current;
+    setLoadingMore(true);
+    api.getCatecumenosPagina({ cursor, pageSize: PAGE_SIZE, fase, turma, q })
+      .then((page) => {
+        if (id !== requestId.current) return;
+        setRows((prev) => [...prev, ...(page?.rows ?? [])]);
+        setCursor(page?.next_cursor ?? null);
+        setHasMore(Boolean(page?.next_cursor));
+      })
+      .catch(() => { if (id === requestId.current) setHasMore(false); })
+      .finally(() => setLoadingMore(false));
+  }, [loading, loadingMore, hasMore, cursor, fase, turma, q]);
+
+  // Infinite scroll — fetch the next page when the sentinel scrolls into view
+  useEffect(() => {
+    const el = sentinel.current;
+    if (!el) return;
+    const observer = new IntersectionObserver(
+      (entries) => { if (entries[0]?.isIntersecting) loadMore(); },
+      { rootMargin: '400px' },
+    );
+    observer.observe(el);
+    return () => observer.disconnect();
+  }, [loadMore]);
+
+  const turmasDaFase = fase ? turmas.filter((t) => t.fase === fase) : turmas;
+  const hasFilter = Boolean(fase || turma || q);
+
+  const selectClass = 'py-2 pl-3 pr-8 text-sm rounded-xl border border-cream-300 bg-white focus:outline-none focus:ring-2 focus:ring-navy-700/20 focus:border-navy-700/30 transition-all';
 
   return (
     <div>
@@ -38,23 +105,44 @@ export default function CatecumenosTable() {
       <div className="flex items-center justify-between gap-4 mb-4 flex-wrap">
         <div>
           <p className="text-xs text-slate-500">
-            {loading ? '...' : `${all.length} catecúmenos activos`}
+            {total === null ? '...' : `${total} catecúmenos activos`}
           </p>
         </div>
-        <div className="relative">
-          <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-3.5 h-3.5 text-slate-400" />
-          <input
-            type="text"
-            value={filter}
-            onChange={(e) => setFilter(e.target.value)}
-            placeholder="Filtrar por nome, turma, fase..."
-            className="pl-8 pr-8 py-2 text-sm rounded-xl border border-cream-300 bg-white focus:outline-none focus:ring-2 focus:ring-navy-700/20 focus:border-navy-700/30 transition-all w-64"
-          />
-          {filter && (
+        <div className="flex items-center gap-2 flex-wrap">
+          <div className="relative">
+            <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-3.5 h-3.5 text-slate-400" />
+            <input
+              type="text"
+              value={filter}
+              onChange={(e) => setFilter(e.target.value)}
+              placeholder="Filtrar por nome ou catequista..."
+              className="pl-8 pr-3 py-2 text-sm rounded-xl border border-cream-300 bg-white focus:outline-none focus:ring-2 focus:ring-navy-700/20 focus:border-navy-700/30 transition-all w-56"
+              aria-label="Filtrar por nome ou catequista"
+            />
+          </div>
+          <select
+            value={fase}
+            onChange={(e) => { setFase(e.target.value); setTurma(''); }}
+            className={selectClass}
+            aria-label="Filtrar por fase"
+          >
+            <option value="">Todas as fases</option>
+            {fases.map((f) => <option key={f} value={f}>{f}</option>)}
+          </select>
+          <select
+            value={turma}
+            onChange={(e) => setTurma(e.target.value)}
+            className={`${selectClass} w-48`}
+            aria-label="Filtrar por turma"
+          >
+            <option value="">Todas as turmas</option>
+            {turmasDaFase.map((t) => <option key={t.name} value={t.name}>{t.name}</option>)}
+          </select>
+          {hasFilter && (
             <button
-              onClick={() => setFilter('')}
-              className="absolute right-2.5 top-1/2 -translate-y-1/2 text-slate-400 hover:text-slate-700"
-              aria-label="Limpar filtro"
+              onClick={() => { setFase(''); setTurma(''); setFilter(''); setQ(''); }}
+              className="p-2 text-slate-400 hover:text-slate-700"
+              aria-label="Limpar filtros"
             >
               <X className="w-3.5 h-3.5" />
             </button>
@@ -74,15 +162,17 @@ export default function CatecumenosTable() {
             <span>Horário</span>
           </div>
 
-          {filtered.length === 0 ? (
+          {rows.length === 0 ? (
             <div className="px-6 py-12 text-center text-slate-400 text-sm font-display italic">
-              {filter
-                ? `Nenhum resultado para "${filter}"`
+              {q
+                ? `Nenhum resultado para "${q}"`
+                : hasFilter
+                ? 'Nenhum catecúmeno activo para estes filtros.'
                 : 'Nenhum catecúmeno activo.'}
             </div>
           ) : (
             <div className="divide-y divide-cream-100">
-              {filtered.map((c) => (
+              {rows.map((c) => (
                 <a
                   key={c.name}
                   href={`/portal/catecumeno/?nome=${encodeURIComponent(c.name)}`}
@@ -123,11 +213,15 @@ export default function CatecumenosTable() {
             </div>
           )}
 
-          {filter && filtered.length > 0 && (
+          {rows.length > 0 && (
             <div className="px-5 py-3 border-t border-cream-200 bg-cream-50/60 text-xs text-slate-500">
-              {filtered.length} de {all.length} catecúmenos
+              {loadingMore
+                ? 'A carregar mais...'
+                : `${rows.length}${total !== null ? ` de ${total}` : ''} catecúmenos`}
             </div>
           )}
+
+          {hasMore && <div ref={sentinel} aria-hidden className="h-px" />}
         </div>
       )}
     </div>
@@ -2,6 +2,7 @@ import type {
   Turma,
   TurmaDetalhe,
   Catecumeno,
+  CatecumenosPagina,
   Aniversariante,
   Estatisticas,
   ResultadoPesquisa,
@@ -72,16 +73,26 @@ async function frappeAuthPOST<T>(method: string, body: Record<string, string | n
   return data.message as T;
 }
 
+// Last ETag + payload per URL. Replayed as If-None-Match so unchanged data
+// comes back as an empty 304 instead of the full JSON payload.
+const etagCache = new Map<string, { etag: string; message: unknown }>();
+
 async function frappeFetch<T>(method: string, params?: Record<string, string>): Promise<T> {
   const qs = params ? '?' + new URLSearchParams(params).toString() : '';
   const urlStr = `${BASE_URL}/api/method/${method}${qs}`;
-  const res = await fetch(urlStr, {
-    headers: { 'Content-Type': 'application/json' },
-  });
+  const cached = etagCache.get(urlStr);
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+  if (cached) headers['If-None-Match'] = cached.etag;
+  const res = await fetch(urlStr, { headers, cache: 'no-store' });
+  if (res.status === 304 && cached) {
+    return cached.message as T;
+  }
   if (!res.ok) {
     throw new Error(`API error ${res.status}: ${method}`);
   }
   const data = await res.json();
+  const etag = res.headers.get('ETag');
+  if (etag) etagCache.set(urlStr, { etag, message: data.message });
   return data.message as T;
 }
 
@@ -130,6 +141,25 @@ export const api = {
   getCatecumenos: () =>
     frappeFetch<Catecumeno[]>(`${APP}.get_catecumenos_publicos`),
 
+  getCatecumenosPagina: (
+    opts: { cursor?: string | null; pageSize?: number; fase?: string; turma?: string; q?: string } = {},
+  ) => {
+    const params: Record<string, string> = { page_size: String(opts.pageSize ?? 50) };
+    if (opts.cursor) params.cursor = opts.cursor;
+    if (opts.fase) params.fase = opts.fase;
+    if (opts.turma) params.turma = opts.turma;
+    if (opts.q) params.q = opts.q;
+    return frappeFetch<CatecumenosPagina>(`${APP}.get_catecumenos_publicos`, params);
+  },
+
+  getTotalCatecumenos: (filtros: { fase?: string; turma?: string; q?: string } = {}) => {
+    const params: Record<string, string> = {};
+    if (filtros.fase) params.fase = filtros.fase;
+    if (filtros.turma) params.turma = filtros.turma;
+    if (filtros.q) params.q = filtros.q;
+    return frappeFetch<number>(`${APP}.get_total_catecumenos_publicos`, params);
+  },
+
   getPreparacoesSacramento: () =>
     frappeFetch<PreparacaoSacramentoLista[]>(`${APP}.get_preparacoes_sacramento`),
 
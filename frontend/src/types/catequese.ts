@@ -38,6 +38,11 @@ export interface Catecumeno {
   found_via?: string; // 'encarregado' when matched via guardian name
 }
 
+export interface CatecumenosPagina {
+  rows: Catecumeno[];
+  next_cursor: string | null; // null when there are no more pages
+}
+
 export interface Aniversariante {
   name: string;
   fase: string;
@@ -3,15 +3,45 @@ Portal Público de Catequese — API
 Todos os endpoints são públicos (allow_guest=True) e não expõem dados sensíveis.
 """
 
+import json
+
 import frappe
 from frappe import _
 from frappe.utils import cint
 from datetime import date, timedelta
 
+from portal import avisos as aviso_counters
+from portal import bulk
+from portal import cache as public_cache
+from portal import conditional
+from portal import presencas as presencas_log
+from portal import search
+from portal.permissions import get_catequista_name
+
+# Doctypes each read endpoint depends on — used to fingerprint its ETag
+_TURMA_DOCTYPES         = ("Turma", "Turma Catecumenos")
+_CATECUMENO_DOCTYPES    = ("Catecumeno", "Turma")
+_ESTATISTICAS_DOCTYPES  = ("Catecumeno", "Turma", "Catequista")
+_SACRAMENTO_DOCTYPES    = ("Preparacao do Sacramento", "Candidatos ao Sacramento Table")
+_PORTAL_CONFIG_DOCTYPES = ("Catequista Portal Field", "Catequista Portal Section")
+
+
+def _public_response(endpoint, doctypes, build, **kwargs):
+    """Redis-cached build of a public endpoint, served as a conditional (ETag) response."""
+    return conditional.respond(
+        endpoint, doctypes,
+        lambda: public_cache.get_or_build(endpoint, build, **kwargs),
+        vary=kwargs,
+    )
+
 
 @frappe.whitelist(allow_guest=True)
 def get_turmas_publicas():
     """Lista de turmas activas com contagem de catecúmenos."""
+    return _public_response("get_turmas_publicas", _TURMA_DOCTYPES, _turmas_publicas)
+
+
+def _turmas_publicas():
     turmas = frappe.db.sql("""
         SELECT
             t.name,
@@ -36,6 +66,14 @@ def get_turmas_publicas():
 @frappe.whitelist(allow_guest=True)
 def get_turma_detalhe(turma_nome):
     """Detalhe de uma turma: info + lista de catecúmenos (só nomes)."""
+    return conditional.respond(
+        "get_turma_detalhe", _TURMA_DOCTYPES,
+        lambda: _turma_detalhe(turma_nome),
+        vary=turma_nome,
+    )
+
+
+def _turma_detalhe(turma_nome):
     turma = frappe.db.get_value(
         "Turma", turma_nome,
         ["name", "fase", "ano_lectivo", "local", "dia", "hora",
@@ -61,83 +99,28 @@ def get_turma_detalhe(turma_nome):
 
 @frappe.whitelist(allow_guest=True)
 def pesquisar(query):
-    """Pesquisa global por nome de catecúmeno ou catequista."""
+    """
+    Pesquisa global por nome de catecúmeno, encarregado ou catequista.
+    Usa o índice de pesquisa (portal/search.py): sem acentos, por prefixo
+    ("Dercio" encontra "Dércio"), ordenado por relevância e numa só consulta.
+    """
     if not query or len(query.strip()) < 2:
         return {"catecumenos": [], "catequistas": []}
 
-    q = f"%{query.strip()}%"
-
-    catecumenos = frappe.db.sql("""
-        SELECT
-            c.name,
-            c.fase,
-            c.turma,
-            c.sexo,
-            c.status,
-            c.encarregado,
-            t.local,
-            t.dia,
-            t.hora,
-            t.catequista,
-            t.catequista_adj,
-            NULL AS found_via
-        FROM `tabCatecumeno` c
-        LEFT JOIN `tabTurma` t ON c.turma = t.name
-        WHERE c.name LIKE %s
-        ORDER BY c.name ASC
-        LIMIT 20
-    """, (q,), as_dict=True)
-
-    # Search by encarregado name (field may vary — graceful fallback)
-    try:
-        enc = frappe.db.sql("""
-            SELECT
-                c.name,
-                c.fase,
-                c.turma,
-                c.sexo,
-                c.status,
-                c.encarregado,
-                t.local,
-                t.dia,
-                t.hora,
-                t.catequista,
-                t.catequista_adj,
-                'encarregado' AS found_via
-            FROM `tabCatecumeno` c
-            LEFT JOIN `tabTurma` t ON c.turma = t.name
-            WHERE c.encarregado LIKE %s
-            ORDER BY c.name ASC
-            LIMIT 10
-        """, (q,), as_dict=True)
-        # Avoid duplicates
-        existing = {r.name for r in catecumenos}
-        catecumenos += [r for r in enc if r.name not in existing]
-    except Exception:
-        pass
-
-    catequistas = frappe.db.sql("""
-        SELECT DISTINCT
-            t.catequista,
-            t.catequista_adj,
-            t.name  AS turma,
-            t.fase,
-            t.local,
-            t.dia,
-            t.hora,
-            t.status
-        FROM `tabTurma` t
-        WHERE (t.catequista LIKE %s OR t.catequista_adj LIKE %s)
-        ORDER BY t.catequista ASC
-        LIMIT 10
-    """, (q, q), as_dict=True)
-
-    return {"catecumenos": catecumenos, "catequistas": catequistas}
+    return search.pesquisar(query)
 
 
 @frappe.whitelist(allow_guest=True)
 def get_catecumeno_publico(catecumeno_nome):
     """Ficha pública de catecúmeno — sem dados sensíveis."""
+    return conditional.respond(
+        "get_catecumeno_publico", _CATECUMENO_DOCTYPES,
+        lambda: _catecumeno_publico(catecumeno_nome),
+        vary=catecumeno_nome,
+    )
+
+
+def _catecumeno_publico(catecumeno_nome):
     cat = frappe.db.get_value(
         "Catecumeno", catecumeno_nome,
         ["name", "fase", "turma", "sexo", "status", "encarregado"],
@@ -162,6 +145,15 @@ def get_catecumeno_publico(catecumeno_nome):
 @frappe.whitelist(allow_guest=True)
 def get_catecumenos_aniversariantes(tipo="hoje"):
     """Aniversariantes hoje ou esta semana. Não expõe data de nascimento exacta."""
+    # The result depends on the current date as well as on the data
+    return conditional.respond(
+        "get_catecumenos_aniversariantes", _CATECUMENO_DOCTYPES,
+        lambda: _catecumenos_aniversariantes(tipo),
+        vary=[tipo, date.today().isoformat()],
+    )
+
+
+def _catecumenos_aniversariantes(tipo):
     today = date.today()
 
     if tipo == "hoje":
@@ -209,6 +201,10 @@ def get_catecumenos_aniversariantes(tipo="hoje"):
 @frappe.whitelist(allow_guest=True)
 def get_estatisticas_publicas():
     """Estatísticas gerais para o dashboard público."""
+    return _public_response("get_estatisticas_publicas", _ESTATISTICAS_DOCTYPES, _estatisticas_publicas)
+
+
+def _estatisticas_publicas():
     total_catecumenos = frappe.db.count("Catecumeno", {"status": "Activo"})
     total_turmas = frappe.db.count("Turma", {"status": "Activo"})
 
@@ -239,6 +235,10 @@ def get_estatisticas_publicas():
 @frappe.whitelist(allow_guest=True)
 def get_preparacoes_sacramento():
     """Lista todas as Preparações do Sacramento com contagem de candidatos."""
+    return _public_response("get_preparacoes_sacramento", _SACRAMENTO_DOCTYPES, _preparacoes_sacramento)
+
+
+def _preparacoes_sacramento():
     preparacoes = frappe.db.sql("""
         SELECT
             p.name,
@@ -259,6 +259,14 @@ def get_preparacoes_sacramento():
 @frappe.whitelist(allow_guest=True)
 def get_preparacao_sacramento(nome):
     """Detalhe de uma Preparação do Sacramento com candidatos."""
+    return conditional.respond(
+        "get_preparacao_sacramento", _SACRAMENTO_DOCTYPES,
+        lambda: _preparacao_sacramento(nome),
+        vary=nome,
+    )
+
+
+def _preparacao_sacramento(nome):
     preparacao = frappe.db.get_value(
         "Preparacao do Sacramento",
         nome,
@@ -367,6 +375,8 @@ def atualizar_candidato_sacramento(
         if cat_updates:
             try:
                 frappe.db.set_value("Catecumeno", row.catecumeno, cat_updates)
+                if "encarregado" in cat_updates:
+                    search.reindex_catecumeno(row.catecumeno)
             except Exception:
                 pass  # Catecumeno may not exist; non-critical
 
@@ -374,9 +384,65 @@ def atualizar_candidato_sacramento(
     return {"success": True}
 
 
+CATECUMENOS_PAGE_SIZE = 50
+CATECUMENOS_MAX_PAGE_SIZE = 200
+
+
+@frappe.whitelist(allow_guest=True)
+def get_catecumenos_publicos(cursor=None, page_size=None, fase=None, turma=None, q=None):
+    """
+    Lista pública de catecúmenos activos com info da turma.
+
+    Sem page_size devolve a lista completa (comportamento original).
+    Com page_size devolve uma página ordenada por nome, paginada por cursor
+    (keyset em c.name): {"rows": [...], "next_cursor": <nome> | None}.
+    O cursor é o next_cursor da página anterior. fase/turma filtram a lista;
+    q filtra por prefixo das palavras do nome ou dos catequistas da turma
+    (ver portal.search.prefix_conditions).
+    O total é devolvido à parte por get_total_catecumenos_publicos.
+    """
+    if not page_size:
+        return _public_response("get_catecumenos_publicos", _CATECUMENO_DOCTYPES, _catecumenos_publicos)
+
+    page_size = min(max(cint(page_size), 1), CATECUMENOS_MAX_PAGE_SIZE)
+    return _public_response(
+        "get_catecumenos_publicos_pagina", _CATECUMENO_DOCTYPES, _catecumenos_publicos_pagina,
+        cursor=cursor or "", page_size=page_size, fase=fase or "", turma=turma or "",
+        q=_normalizar_q(q),
+    )
+
+
 @frappe.whitelist(allow_guest=True)
-def get_catecumenos_publicos():
-    """Lista pública de catecúmenos activos com info da turma."""
+def get_total_catecumenos_publicos(fase=None, turma=None, q=None):
+    """Total de catecúmenos activos para os mesmos filtros da lista paginada."""
+    return _public_response(
+        "get_total_catecumenos_publicos", _CATECUMENO_DOCTYPES, _total_catecumenos_publicos,
+        fase=fase or "", turma=turma or "", q=_normalizar_q(q),
+    )
+
+
+def _normalizar_q(q):
+    """Texto de pesquisa dobrado ("Dércio" → "dercio"), para partilhar a cache entre grafias."""
+    return " ".join(search.fold_words(q or "")[:search.MAX_QUERY_WORDS])
+
+
+def _catecumenos_publicos_conditions(fase, turma, q=""):
+    conditions = ["c.status = 'Activo'"]
+    params = {}
+    if fase:
+        conditions.append("c.fase = %(fase)s")
+        params["fase"] = fase
+    if turma:
+        conditions.append("c.turma = %(turma)s")
+        params["turma"] = turma
+    if q:
+        q_conditions, q_params = search.prefix_conditions(q)
+        conditions.extend(q_conditions)
+        params.update(q_params)
+    return conditions, params
+
+
+def _catecumenos_publicos():
     catecumenos = frappe.db.sql("""
         SELECT
             c.name,
@@ -396,6 +462,49 @@ def get_catecumenos_publicos():
     return catecumenos
 
 
+def _catecumenos_publicos_pagina(cursor, page_size, fase, turma, q=""):
+    conditions, params = _catecumenos_publicos_conditions(fase, turma, q)
+    if cursor:
+        conditions.append("c.name > %(cursor)s")
+        params["cursor"] = cursor
+    # Fetch one extra row to know whether another page exists
+    params["limit"] = page_size + 1
+
+    rows = frappe.db.sql(f"""
+        SELECT
+            c.name,
+            c.fase,
+            c.turma,
+            c.sexo,
+            t.local,
+            t.dia,
+            t.hora,
+            t.catequista,
+            t.catequista_adj
+        FROM `tabCatecumeno` c
+        LEFT JOIN `tabTurma` t ON c.turma = t.name
+        WHERE {" AND ".join(conditions)}
+        ORDER BY c.name ASC
+        LIMIT %(limit)s
+    """, params, as_dict=True)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "rows":        rows,
+        "next_cursor": rows[-1].name if has_more else None,
+    }
+
+
+def _total_catecumenos_publicos(fase, turma, q=""):
+    conditions, params = _catecumenos_publicos_conditions(fase, turma, q)
+    return frappe.db.sql(f"""
+        SELECT COUNT(*)
+        FROM `tabCatecumeno` c
+        WHERE {" AND ".join(conditions)}
+    """, params)[0][0]
+
+
 # ─── Portal do Catequista (autenticado) ───────────────────────────────────────
 
 def _default_field_config():
@@ -415,8 +524,8 @@ def _default_field_config():
         {"fieldname": "contacto_padrinhos",   "label": "Contacto Padrinhos",   "fieldtype": "Data",       "options": "",     "show_in_table": False, "show_in_panel": True,  "editable": True,  "column_width": "sm", "panel_section": "Padrinhos / Madrinhas",   "source": "catecumeno",        "col_span": "2"},
         {"fieldname": "obs",                  "label": "Observações",          "fieldtype": "Small Text", "options": "",     "show_in_table": False, "show_in_panel": True,  "editable": True,  "column_width": "lg", "panel_section": "Observações",             "source": "catecumeno",        "col_span": "2"},
         # ── Turma Catecumenos (lista_catecumenos child table) ──────────────────
-        {"fieldname": "total_presencas",      "label": "Presenças",            "fieldtype": "Int",        "options": "",     "show_in_table": True,  "show_in_panel": True,  "editable": True,  "column_width": "xs", "panel_section": "Presenças",               "source": "turma_catecumenos", "col_span": "1"},
-        {"fieldname": "total_faltas",         "label": "Faltas",               "fieldtype": "Int",        "options": "",     "show_in_table": True,  "show_in_panel": True,  "editable": True,  "column_width": "xs", "panel_section": "Presenças",               "source": "turma_catecumenos", "col_span": "1"},
+        {"fieldname": "total_presencas",      "label": "Presenças",            "fieldtype": "Int",        "options": "",     "show_in_table": True,  "show_in_panel": True,  "editable": False, "column_width": "xs", "panel_section": "Presenças",               "source": "turma_catecumenos", "col_span": "1"},
+        {"fieldname": "total_faltas",         "label": "Faltas",               "fieldtype": "Int",        "options": "",     "show_in_table": True,  "show_in_panel": True,  "editable": False, "column_width": "xs", "panel_section": "Presenças",               "source": "turma_catecumenos", "col_span": "1"},
         # ── Turma ─────────────────────────────────────────────────────────────
         # show_in_header = shown in TurmaHeader banner
         # show_in_panel  = shown in catecumeno side panel (read-only)
@@ -440,17 +549,12 @@ def _default_section_config():
     ]
 
 
-def _load_section_config():
-    """Load section config from Settings doc, falling back to defaults.
-    Result is cached for the lifetime of the request via frappe.local."""
-    cached = getattr(frappe.local, "_portal_section_config", None)
-    if cached is not None:
-        return cached
-
+def _read_section_config():
+    """Read section config from the Settings doc, falling back to defaults."""
     if frappe.db.exists("Catequista Portal Settings", "Catequista Portal Settings"):
         doc = frappe.get_doc("Catequista Portal Settings")
         if doc.get("sections"):
-            result = [
+            return [
                 {
                     "section_key": row.section_key,
                     "label":       row.label,
@@ -458,25 +562,16 @@ def _load_section_config():
                 }
                 for row in doc.sections
             ]
-            frappe.local._portal_section_config = result
-            return result
-
-    result = _default_section_config()
-    frappe.local._portal_section_config = result
-    return result
 
+    return _default_section_config()
 
-def _load_field_config():
-    """Load field config from Settings doc, falling back to defaults.
-    Result is cached for the lifetime of the request via frappe.local."""
-    cached = getattr(frappe.local, "_portal_field_config", None)
-    if cached is not None:
-        return cached
 
+def _read_field_config():
+    """Read field config from the Settings doc, falling back to defaults."""
     if frappe.db.exists("Catequista Portal Settings", "Catequista Portal Settings"):
         doc = frappe.get_doc("Catequista Portal Settings")
         if doc.field_config:
-            result = [
+            return [
                 {
                     "fieldname": row.fieldname,
                     "label": row.label,
@@ -493,14 +588,156 @@ def _load_field_config():
                 }
                 for row in doc.field_config
             ]
-            frappe.local._portal_field_config = result
-            return result
 
-    result = _default_field_config()
-    frappe.local._portal_field_config = result
-    return result
+    return _default_field_config()
+
+
+# ── Compiled field projection (cross-request cache) ───────────────────────────
+# The field config and the doctype meta only change when an admin edits
+# Catequista Portal Settings or customizes Turma / Catecumeno / Turma Catecumenos.
+# Everything derived from them (SQL column lists, alias map, editable-field
+# maps) is compiled once and kept in Redis until one of those changes
+# (see clear_portal_config_cache and the doc_events in hooks.py).
+
+PROJECTION_CACHE_KEY = "portal:field_projection"
+_PROJECTION_DOCTYPES = ("Turma", "Catecumeno", "Turma Catecumenos")
+
+# Always-needed turma fields
+_TURMA_ALWAYS = ("name", "fase", "ano_lectivo", "local", "dia", "hora",
+                 "catequista", "catequista_adj", "status")
+
+# Presencas/faltas are exposed under stable aliases whatever the actual TC field is
+_TC_ALIAS_CANDIDATES = {
+    "total_presencas": ["total_presencas"],
+    "total_faltas":    ["total_faltas", "nr_de_faltas"],
+}
+
+
+def _compile_projection():
+    """Build the field projection from the Settings doc and doctype meta."""
+    # Presencas/faltas totals are maintained by registar_presencas (portal/presencas.py)
+    # and never written from the client, whatever the Settings doc says
+    config = [
+        dict(entry, editable=False) if entry["fieldname"] in _TC_ALIAS_CANDIDATES else entry
+        for entry in _read_field_config()
+    ]
+
+    turma_fields = {f.fieldname for f in frappe.get_meta("Turma").fields}
+    cat_fields   = {f.fieldname: f.fieldtype for f in frappe.get_meta("Catecumeno").fields}
+    tc_fields    = {f.fieldname: f.fieldtype for f in frappe.get_meta("Turma Catecumenos").fields}
+
+    # Turma — extra fields from config (source='turma')
+    turma_extra = [
+        entry["fieldname"]
+        for entry in config
+        if entry["source"] == "turma"
+        and entry["fieldname"] not in _TURMA_ALWAYS
+        and entry["fieldname"] in turma_fields
+    ]
+
+    # Catecumeno — config fields, skip 'name' (always selected)
+    wanted_cat = [
+        entry["fieldname"]
+        for entry in config
+        if entry["source"] == "catecumeno" and entry["fieldname"] != "name"
+    ]
+    # Always include status and fase (needed by the UI even if not in config)
+    for always in ("fase", "status"):
+        if always not in wanted_cat:
+            wanted_cat.append(always)
+    cat_cols = [f for f in wanted_cat if f in cat_fields]
+
+    # Turma Catecumenos — alias → actual fieldname (None when the doctype lacks it)
+    tc_alias = {
+        alias: next((c for c in candidates if c in tc_fields), None)
+        for alias, candidates in _TC_ALIAS_CANDIDATES.items()
+    }
+    tc_extra = [
+        entry["fieldname"]
+        for entry in config
+        if entry["source"] == "turma_catecumenos"
+        and entry["fieldname"] not in _TC_ALIAS_CANDIDATES
+        and entry["fieldname"] in tc_fields
+    ]
+
+    tc_alias_sql = [
+        f"COALESCE(tc.`{actual}`, 0) AS {alias}" if actual else f"0 AS {alias}"
+        for alias, actual in tc_alias.items()
+    ]
+
+    return {
+        "fields":   config,
+        "sections": _read_section_config(),
+
+        "turma_select": ", ".join(
+            [f"`{f}`" for f in _TURMA_ALWAYS] + [f"`{f}`" for f in turma_extra]
+        ),
+        "catecumeno_select": ",\n            ".join(
+            ["c.name"]
+            + [f"c.`{f}`" for f in cat_cols]
+            + ["tc.name AS row_name"]
+            + tc_alias_sql
+            + [f"tc.`{f}`" for f in tc_extra]
+        ),
+
+        # Editable fields → fieldtype, used to validate and coerce submitted values
+        "editable_cat": {
+            entry["fieldname"]: cat_fields[entry["fieldname"]]
+            for entry in config
+            if entry["editable"] and entry["source"] == "catecumeno"
+            and entry["fieldname"] in cat_fields
+        },
+        "tc_alias": {alias: actual for alias, actual in tc_alias.items() if actual},
+        "editable_tc": {
+            entry["fieldname"]: tc_fields[entry["fieldname"]]
+            for entry in config
+            if entry["source"] == "turma_catecumenos"
+            and entry["editable"]
+            and entry["fieldname"] not in _TC_ALIAS_CANDIDATES   # aliases handled separately
+            and entry["fieldname"] in tc_fields
+        },
+    }
+
+
+def _get_projection():
+    """Compiled projection — request-local, then Redis, then compiled."""
+    cached = getattr(frappe.local, "_portal_projection", None)
+    if cached is not None:
+        return cached
+
+    projection = frappe.cache().get_value(PROJECTION_CACHE_KEY)
+    if projection is None:
+        projection = _compile_projection()
+        frappe.cache().set_value(PROJECTION_CACHE_KEY, projection)
+
+    frappe.local._portal_projection = projection
+    return projection
+
+
+def clear_portal_config_cache(doc=None, method=None):
+    """
+    doc_events handler — drops the compiled projection when Catequista Portal
+    Settings is saved or when Turma / Catecumeno / Turma Catecumenos meta changes
+    (DocType, Custom Field, Property Setter).
+    """
+    if doc is not None and doc.doctype in ("DocType", "Custom Field", "Property Setter"):
+        target = doc.get("dt") or doc.get("doc_type") or doc.name
+        if target not in _PROJECTION_DOCTYPES:
+            return
+
+    frappe.cache().delete_value(PROJECTION_CACHE_KEY)
+    frappe.local._portal_projection = None
 
 
+def _load_section_config():
+    """Section config (cached, see _get_projection)."""
+    return _get_projection()["sections"]
+
+
+def _load_field_config():
+    """Field config (cached, see _get_projection)."""
+    return _get_projection()["fields"]
+
 
 def _assert_catequista():
     """
@@ -512,7 +749,7 @@ def _assert_catequista():
     if user == "Guest":
         frappe.throw(_("Não autenticado"), frappe.AuthenticationError)
 
-    cat = frappe.db.get_value("Catequista", {"user": user}, "name")
+    cat = get_catequista_name(user)
     if not cat:
         frappe.throw(_("Utilizador não é catequista"), frappe.PermissionError)
 
@@ -523,10 +760,13 @@ def _assert_catequista():
 def get_catecumeno_field_config():
     """Returns field config and section config for the catequista portal."""
     _assert_catequista()
-    return {
-        "fields":   _load_field_config(),
-        "sections": _load_section_config(),
-    }
+    return conditional.respond(
+        "get_catecumeno_field_config", _PORTAL_CONFIG_DOCTYPES,
+        lambda: {
+            "fields":   _load_field_config(),
+            "sections": _load_section_config(),
+        },
+    )
 
 
 @frappe.whitelist()
@@ -652,7 +892,7 @@ def sync_catecumeno_fields():
                 "options": "",
                 "show_in_table": 1,
                 "show_in_panel": 1,
-                "editable": 1,
+                "editable": 0,   # totals come from registar_presencas only
                 "column_width": "xs",
                 "panel_section": section,
                 "source": "turma_catecumenos",
@@ -736,6 +976,10 @@ def get_catequista_session_info():
         "catequista": cat,
         "user": frappe.session.user,
         "csrf_token": frappe.session.data.csrf_token,
+        # socket.io namespace for realtime avisos (per-site from Frappe v15)
+        "realtime_namespace": (
+            f"/{frappe.local.site}" if cint(frappe.__version__.split(".")[0]) >= 15 else "/"
+        ),
     }
 
 
@@ -747,103 +991,66 @@ def get_minha_turma():
     pela configuração em Catequista Portal Settings.
     """
     cat_name = _assert_catequista()
+    return conditional.respond(
+        "get_minha_turma",
+        _TURMA_DOCTYPES + ("Catecumeno", "Programa da Fase") + _PORTAL_CONFIG_DOCTYPES,
+        lambda: _minha_turma(cat_name),
+        vary=cat_name,
+    )
+
+
+def _minha_turma(cat_name):
     e = frappe.db.escape(cat_name)
 
-    # Load field config once — used for both turma and catecumeno column selection
-    config = _load_field_config()
-
-    # Always-needed turma fields
-    TURMA_ALWAYS = {"name", "fase", "ano_lectivo", "local", "dia", "hora",
-                    "catequista", "catequista_adj", "status"}
-    # Add extra turma fields from config (source='turma')
-    turma_meta_obj = frappe.get_meta("Turma")
-    turma_meta_fields = {f.fieldname for f in turma_meta_obj.fields}
-    extra_turma_cols = "".join(
-        f",\n               `{entry['fieldname']}`"
-        for entry in config
-        if entry["source"] == "turma"
-        and entry["fieldname"] not in TURMA_ALWAYS
-        and entry["fieldname"] in turma_meta_fields
-    )
+    # Column lists come pre-compiled from the field config
+    projection = _get_projection()
 
     turmas = frappe.db.sql(f"""
-        SELECT name, fase, ano_lectivo, local, dia, hora,
-               catequista, catequista_adj, status{extra_turma_cols}
+        SELECT {projection["turma_select"]}
         FROM `tabTurma`
         WHERE (catequista = {e} OR catequista_adj = {e})
           AND status = 'Activo'
         ORDER BY fase ASC, name ASC
     """, as_dict=True)
 
-    # Build SELECT cols from field config — only catecumeno source, skip 'name' (always selected)
-    wanted_cat = [
-        entry["fieldname"]
-        for entry in config
-        if entry["source"] == "catecumeno" and entry["fieldname"] != "name"
-    ]
-    # Always include status and fase (needed by the UI even if not in config)
-    for always in ("fase", "status"):
-        if always not in wanted_cat:
-            wanted_cat.append(always)
-
-    cat_meta = {f.fieldname for f in frappe.get_meta("Catecumeno").fields}
-    extra_cols = "".join(
-        f",\n                c.`{f}`" for f in wanted_cat if f in cat_meta
-    )
-
-    # Turma Catecumenos — presencas/faltas with stable aliases, plus other TC fields
-    tc_meta_obj = frappe.get_meta("Turma Catecumenos")
-    tc_meta = {f.fieldname for f in tc_meta_obj.fields}
-
-    def _tc_col(candidates, alias):
-        actual = next((c for c in candidates if c in tc_meta), None)
-        return f"COALESCE(tc.`{actual}`, 0) AS {alias}" if actual else f"0 AS {alias}"
-
-    presencas_col = _tc_col(["total_presencas"], "total_presencas")
-    faltas_col    = _tc_col(["total_faltas", "nr_de_faltas"], "total_faltas")
+    if not turmas:
+        return []
 
-    # Additional TC fields from config (direct select, no alias needed)
-    ALIASED_TC = {"total_presencas", "total_faltas"}
-    extra_tc_cols = "".join(
-        f",\n                tc.`{entry['fieldname']}`"
-        for entry in config
-        if entry["source"] == "turma_catecumenos"
-        and entry["fieldname"] not in ALIASED_TC
-        and entry["fieldname"] in tc_meta
-    )
+    # All catecúmenos of all turmas in one query, grouped per turma below
+    turma_names = [t.name for t in turmas]
+    rows = frappe.db.sql(f"""
+        SELECT
+            {projection["catecumeno_select"]},
+            tc.parent AS _turma
+        FROM `tabTurma Catecumenos` tc
+        JOIN `tabCatecumeno` c ON c.name = tc.catecumeno
+        WHERE tc.parent IN %(turmas)s
+          AND tc.parentfield = 'lista_catecumenos'
+        ORDER BY c.name ASC
+    """, {"turmas": turma_names}, as_dict=True)
+
+    by_turma = {name: [] for name in turma_names}
+    for row in rows:
+        by_turma[row.pop("_turma")].append(row)
+
+    # Programa da Fase for every (fase, ano_lectivo) pair in one query
+    fases = {t.fase for t in turmas if t.get("fase") and t.get("ano_lectivo")}
+    anos  = {t.ano_lectivo for t in turmas if t.get("fase") and t.get("ano_lectivo")}
+    programas = {}
+    if fases:
+        for p in frappe.db.sql("""
+            SELECT fase, ano_lectivo, titulo, ficheiro
+            FROM `tabPrograma da Fase`
+            WHERE fase IN %(fases)s AND ano_lectivo IN %(anos)s
+        """, {"fases": list(fases), "anos": list(anos)}, as_dict=True):
+            programas[(p.fase, p.ano_lectivo)] = frappe._dict(titulo=p.titulo, ficheiro=p.ficheiro)
 
-    result = []
     for turma in turmas:
-        catecumenos = frappe.db.sql(f"""
-            SELECT
-                c.name{extra_cols},
-                tc.name  AS row_name,
-                {presencas_col},
-                {faltas_col}{extra_tc_cols}
-            FROM `tabTurma Catecumenos` tc
-            JOIN `tabCatecumeno` c ON c.name = tc.catecumeno
-            WHERE tc.parent = %s
-              AND tc.parentfield = 'lista_catecumenos'
-            ORDER BY c.name ASC
-        """, (turma.name,), as_dict=True)
-
-        turma["catecumenos"] = catecumenos
-        turma["total_catecumenos"] = len(catecumenos)
-
-        # Fetch the programa da fase for this turma's fase + ano_lectivo
-        programa = None
-        if turma.get("fase") and turma.get("ano_lectivo"):
-            programa = frappe.db.get_value(
-                "Programa da Fase",
-                {"fase": turma["fase"], "ano_lectivo": turma["ano_lectivo"]},
-                ["titulo", "ficheiro"],
-                as_dict=True,
-            )
-        turma["programa"] = programa or None
+        turma["catecumenos"] = by_turma[turma.name]
+        turma["total_catecumenos"] = len(turma["catecumenos"])
+        turma["programa"] = programas.get((turma.get("fase"), turma.get("ano_lectivo")))
 
-        result.append(turma)
-
-    return result
+    return turmas
 
 
 @frappe.whitelist()
@@ -872,78 +1079,209 @@ def atualizar_catecumeno(catecumeno_nome, row_name=None):
     SKIP_KEYS = {"catecumeno_nome", "row_name", "cmd", "csrf_token", "type"}
     submitted = {k: v for k, v in frappe.form_dict.items() if k not in SKIP_KEYS}
 
-    # Load config and meta once — reused for both catecumeno and TC field handling
-    config      = _load_field_config()
-    cat_meta_obj = frappe.get_meta("Catecumeno")
-    cat_meta_map = {f.fieldname: f for f in cat_meta_obj.fields}
+    cat_updates, row_updates = _parse_edits(_get_projection(), submitted)
+
+    if cat_updates:
+        frappe.db.set_value("Catecumeno", catecumeno_nome, cat_updates)
+        # set_value bypasses doc_events — keep the search index in sync here
+        if "encarregado" in cat_updates:
+            search.reindex_catecumeno(catecumeno_nome)
+
+    if row_name and row_updates:
+        frappe.db.set_value("Turma Catecumenos", row_name, row_updates)
+
+    # frappe.db.set_value bypasses doc_events — invalidate the public cache here
+    # (applied on commit)
+    if cat_updates:
+        public_cache.bump_version()
+
+    frappe.db.commit()
+    return {"success": True}
 
+
+def _parse_edits(projection, submitted):
+    """
+    Split submitted values into (catecumeno_updates, turma_catecumenos_updates),
+    keeping only fields marked editable in the field config and coercing
+    numeric fields.
+    """
     # ── Catecumeno fields ──────────────────────────────────────────────────────
-    editable_cat = {
-        entry["fieldname"]
-        for entry in config
-        if entry["editable"] and entry["source"] == "catecumeno"
-    } & set(cat_meta_map)
+    editable_cat = projection["editable_cat"]
 
     cat_updates = {}
     for field, value in submitted.items():
         if field not in editable_cat:
             continue
-        meta_field = cat_meta_map.get(field)
-        if meta_field and meta_field.fieldtype in ("Int", "Float"):
+        if editable_cat[field] in ("Int", "Float"):
             cat_updates[field] = cint(value) if value not in (None, "") else None
         else:
             cat_updates[field] = value if value != "" else None
 
-    if cat_updates:
-        frappe.db.set_value("Catecumeno", catecumeno_nome, cat_updates)
-
     # ── Turma Catecumenos fields ───────────────────────────────────────────────
-    if row_name:
-        tc_meta_obj = frappe.get_meta("Turma Catecumenos")
-        tc_meta     = {f.fieldname for f in tc_meta_obj.fields}
-
-        # Map alias → actual fieldname for presencas/faltas
-        def _tc_actual(candidates):
-            return next((c for c in candidates if c in tc_meta), None)
-
-        pf = _tc_actual(["total_presencas"])
-        ff = _tc_actual(["total_faltas", "nr_de_faltas"])
-        alias_map = {}
-        if pf: alias_map["total_presencas"] = pf
-        if ff: alias_map["total_faltas"]    = ff
-
-        # Editable TC fields from config (direct fieldnames, not aliases) — reuse config
-        editable_tc_direct = {
-            entry["fieldname"]
-            for entry in config
-            if entry["source"] == "turma_catecumenos"
-            and entry["editable"]
-            and entry["fieldname"] not in alias_map          # handled separately
-            and entry["fieldname"] in tc_meta
-        }
+    # Presencas/faltas (the aliased fields) are not accepted here: they only
+    # change through registar_presencas, by increment from the session log.
+    row_updates = {}
 
-        row_updates = {}
+    for field, fieldtype in projection["editable_tc"].items():
+        if field not in submitted or submitted[field] in (None, ""):
+            continue
+        if fieldtype in ("Int", "Float"):
+            row_updates[field] = cint(submitted[field])
+        else:
+            row_updates[field] = submitted[field]
 
-        # Aliased fields (presencas / faltas)
-        for alias, actual in alias_map.items():
-            if alias in submitted and submitted[alias] not in (None, ""):
-                row_updates[actual] = max(0, cint(submitted[alias]))
+    return cat_updates, row_updates
+
+
+def _assert_turma_owner(turma, cat_name):
+    """Throws unless cat_name is the titular or adjunto of this turma."""
+    owners = frappe.db.get_value(
+        "Turma", turma, ["catequista", "catequista_adj"], as_dict=True,
+    )
+    if not owners:
+        frappe.throw(_("Turma não encontrada"), frappe.DoesNotExistError)
+    if owners.catequista != cat_name and owners.catequista_adj != cat_name:
+        frappe.throw(_("Sem permissão para editar esta turma"), frappe.PermissionError)
+
+
+def _rows_in_turma(turma):
+    """catecumeno → Turma Catecumenos row name for every child row of this turma."""
+    return dict(frappe.db.sql("""
+        SELECT catecumeno, name
+        FROM `tabTurma Catecumenos`
+        WHERE parent = %(turma)s
+          AND parenttype = 'Turma'
+          AND parentfield = 'lista_catecumenos'
+    """, {"turma": turma}))
 
-        # Direct TC fields
-        for field in editable_tc_direct:
-            if field not in submitted or submitted[field] in (None, ""):
-                continue
-            fobj = next((f for f in tc_meta_obj.fields if f.fieldname == field), None)
-            if fobj and fobj.fieldtype in ("Int", "Float"):
-                row_updates[field] = cint(submitted[field])
-            else:
-                row_updates[field] = submitted[field]
 
+@frappe.whitelist()
+def atualizar_catecumenos_em_lote(turma, edits):
+    """
+    Actualiza vários catecúmenos de uma turma num só pedido (ex.: presenças
+    de uma sessão inteira).
+
+    edits: lista JSON de {"catecumeno": ..., "row_name": ..., "fields": {...}}.
+    A posse da turma é verificada uma vez; todas as alterações são aplicadas
+    numa única transacção, com um UPDATE por doctype.
+
+    Devolve {"success": True, "results": [{"catecumeno", "success", "error"?}]}.
+    """
+    _assert_turma_owner(turma, _assert_catequista())
+
+    edits = json.loads(edits) if isinstance(edits, str) else edits
+    if not isinstance(edits, list):
+        frappe.throw(_("Formato de dados inválido"))
+
+    rows_in_turma = _rows_in_turma(turma)
+
+    projection = _get_projection()
+    cat_batch, row_batch, results = {}, {}, []
+
+    for edit in edits:
+        # Malformed entries fail on their own row instead of the whole request
+        catecumeno = edit.get("catecumeno") if isinstance(edit, dict) else None
+        fields     = (edit.get("fields") or {}) if isinstance(edit, dict) else None
+        if not isinstance(catecumeno, str) or not isinstance(fields, dict):
+            results.append({
+                "catecumeno": catecumeno if isinstance(catecumeno, str) else None,
+                "success":    False,
+                "error":      _("Formato de dados inválido"),
+            })
+            continue
+
+        row_name = edit.get("row_name") or rows_in_turma.get(catecumeno)
+        if catecumeno not in rows_in_turma or rows_in_turma[catecumeno] != row_name:
+            results.append({
+                "catecumeno": catecumeno,
+                "success":    False,
+                "error":      _("Catecúmeno não pertence a esta turma"),
+            })
+            continue
+
+        cat_updates, row_updates = _parse_edits(projection, fields)
+        if cat_updates:
+            cat_batch.setdefault(catecumeno, {}).update(cat_updates)
         if row_updates:
-            frappe.db.set_value("Turma Catecumenos", row_name, row_updates)
+            row_batch.setdefault(row_name, {}).update(row_updates)
+        results.append({"catecumeno": catecumeno, "success": True})
+
+    bulk.set_values("Catecumeno", cat_batch)
+    bulk.set_values("Turma Catecumenos", row_batch)
+
+    # Bulk UPDATEs bypass doc_events — keep the search index and public cache in sync
+    for catecumeno, cat_updates in cat_batch.items():
+        if "encarregado" in cat_updates:
+            search.reindex_catecumeno(catecumeno)
+    if cat_batch:
+        public_cache.bump_version()
 
     frappe.db.commit()
-    return {"success": True}
+    return {"success": True, "results": results}
+
+
+@frappe.whitelist()
+def registar_presencas(turma, data, presencas):
+    """
+    Regista as presenças de uma sessão da turma.
+
+    presencas: lista JSON de {"catecumeno": ..., "presente": 0/1}.
+    Cada sessão fica guardada em Registo de Presenca; os totais de presenças e
+    faltas são actualizados por incremento atómico (ver portal/presencas.py),
+    pelo que voltar a gravar a mesma sessão corrige os totais em vez de os somar.
+
+    Devolve {"success": True, "results": [{"catecumeno", "success", "error"?}],
+    "totais": {catecumeno: {"total_presencas", "total_faltas"}}}.
+    """
+    _assert_turma_owner(turma, _assert_catequista())
+
+    data = frappe.utils.getdate(data)
+    if data > date.today():
+        frappe.throw(_("Não é possível registar presenças numa data futura"))
+
+    presencas = json.loads(presencas) if isinstance(presencas, str) else presencas
+    if not isinstance(presencas, list):
+        frappe.throw(_("Formato de dados inválido"))
+
+    rows_in_turma = _rows_in_turma(turma)
+    session, results = {}, []
+    for entry in presencas:
+        catecumeno = entry.get("catecumeno") if isinstance(entry, dict) else None
+        if not isinstance(catecumeno, str):
+            results.append({
+                "catecumeno": None,
+                "success":    False,
+                "error":      _("Formato de dados inválido"),
+            })
+            continue
+        if catecumeno not in rows_in_turma:
+            results.append({
+                "catecumeno": catecumeno,
+                "success":    False,
+                "error":      _("Catecúmeno não pertence a esta turma"),
+            })
+            continue
+        session[catecumeno] = 1 if cint(entry.get("presente")) else 0
+        results.append({"catecumeno": catecumeno, "success": True})
+
+    presencas_log.registar_sessao(turma, data, session, rows_in_turma)
+
+    frappe.db.commit()
+    return {
+        "success": True,
+        "results": results,
+        "totais":  presencas_log.totais(turma, list(session)),
+    }
+
+
+@frappe.whitelist()
+def get_presencas_sessao(turma, data):
+    """
+    Presenças já registadas numa sessão da turma: {catecumeno: 0/1}.
+    Usado para reabrir e corrigir uma sessão em vez de a registar de novo.
+    """
+    _assert_turma_owner(turma, _assert_catequista())
+    return presencas_log.sessao(turma, frappe.utils.getdate(data))
 
 
 @frappe.whitelist()
@@ -974,68 +1312,51 @@ def get_avisos_ativos():
         frappe.throw(_("Não autenticado"), frappe.AuthenticationError)
 
     # Resolve o nome do catequista ligado a este user
-    catequista_name = frappe.db.get_value("Catequista", {"user": user}, "name")
+    catequista_name = get_catequista_name(user)
     if not catequista_name:
         return []
 
     today = date.today().isoformat()
 
-    # Pre-fetch catequista's active turmas (needed for fase/turma targeting)
-    cat_turmas = frappe.db.sql("""
-        SELECT name, fase FROM `tabTurma`
-        WHERE (catequista = %s OR catequista_adj = %s) AND status = 'Activo'
-    """, (catequista_name, catequista_name), as_dict=True)
-    cat_fases       = {t.fase for t in cat_turmas}
-    cat_turma_names = {t.name for t in cat_turmas}
-
+    # Targeting and view-count filtering in one query: the catequista's active
+    # turmas drive fase/turma targeting, the destinatário table the individual
+    # targeting, and the LEFT JOIN to the log yields the views so far.
     avisos = frappe.db.sql("""
-        SELECT name, titulo, mensagem, prioridade, modo_exibicao, nr_exibicoes,
-               tipo_destinatario, fase_destino, turma_destino,
-               anexo, anexo_label, creation, data_fim
-        FROM `tabCatequista Aviso`
-        WHERE ativo = 1
-          AND (data_fim IS NULL OR data_fim >= %s)
+        SELECT a.name, a.titulo, a.mensagem, a.prioridade, a.modo_exibicao,
+               a.anexo, a.anexo_label, a.creation, a.data_fim
+        FROM `tabCatequista Aviso` a
+        LEFT JOIN `tabCatequista Aviso Log` l
+               ON l.aviso = a.name AND l.catequista = %(cat)s
+        WHERE a.ativo = 1
+          AND (a.data_fim IS NULL OR a.data_fim >= %(today)s)
+          AND (
+                IFNULL(a.tipo_destinatario, '') NOT IN ('Por Fase', 'Por Turma', 'Individuais')
+             OR (a.tipo_destinatario = 'Por Fase' AND a.fase_destino IN (
+                    SELECT fase FROM `tabTurma`
+                    WHERE (catequista = %(cat)s OR catequista_adj = %(cat)s)
+                      AND status = 'Activo'))
+             OR (a.tipo_destinatario = 'Por Turma' AND a.turma_destino IN (
+                    SELECT name FROM `tabTurma`
+                    WHERE (catequista = %(cat)s OR catequista_adj = %(cat)s)
+                      AND status = 'Activo'))
+             OR (a.tipo_destinatario = 'Individuais' AND EXISTS (
+                    SELECT 1 FROM `tabCatequista Aviso Destinatario` d
+                    WHERE d.parent = a.name
+                      AND d.parenttype = 'Catequista Aviso'
+                      AND d.catequista = %(cat)s))
+          )
+          AND NOT (a.modo_exibicao = 'Uma vez' AND IFNULL(l.visualizacoes, 0) >= 1)
+          AND NOT (a.modo_exibicao = 'N vezes'
+                   AND IFNULL(l.visualizacoes, 0) >= IFNULL(NULLIF(a.nr_exibicoes, 0), 1))
         ORDER BY
-            CASE prioridade WHEN 'Urgente' THEN 0 ELSE 1 END ASC,
-            modified DESC
-    """, (today,), as_dict=True)
+            CASE a.prioridade WHEN 'Urgente' THEN 0 ELSE 1 END ASC,
+            a.modified DESC
+    """, {"cat": catequista_name, "today": today}, as_dict=True)
 
     resultado = []
     for aviso in avisos:
-        # ── Targeting filter ──────────────────────────────────────────────────
-        tipo = aviso.get("tipo_destinatario") or "Todos"
-
-        if tipo == "Por Fase":
-            if aviso.fase_destino not in cat_fases:
-                continue
-
-        elif tipo == "Por Turma":
-            if aviso.turma_destino not in cat_turma_names:
-                continue
-
-        elif tipo == "Individuais":
-            is_target = frappe.db.exists(
-                "Catequista Aviso Destinatario",
-                {"parent": aviso.name, "catequista": catequista_name},
-            )
-            if not is_target:
-                continue
-
-        # ── View-count filter ─────────────────────────────────────────────────
-        log = frappe.db.get_value(
-            "Catequista Aviso Log",
-            {"aviso": aviso.name, "catequista": catequista_name},
-            ["name", "visualizacoes"],
-            as_dict=True,
-        )
-        views = log.visualizacoes if log else 0
         modo = aviso.modo_exibicao
 
-        if modo == "Uma vez" and views >= 1:
-            continue
-        if modo == "N vezes" and views >= cint(aviso.nr_exibicoes or 1):
-            continue
-
         # "Cada login" — apply hard cap when data_fim is not set
         if modo == "Cada login" and not aviso.get("data_fim"):
             creation_date = (
@@ -1067,7 +1388,7 @@ def marcar_aviso_visto(aviso_name):
     if user == "Guest":
         frappe.throw(_("Não autenticado"), frappe.AuthenticationError)
 
-    catequista_name = frappe.db.get_value("Catequista", {"user": user}, "name")
+    catequista_name = get_catequista_name(user)
     if not catequista_name:
         frappe.throw(_("Catequista não encontrado"))
 
@@ -1075,98 +1396,142 @@ def marcar_aviso_visto(aviso_name):
     if not frappe.db.exists("Catequista Aviso", aviso_name):
         frappe.throw(_("Aviso não encontrado"))
 
-    log_name = frappe.db.get_value(
-        "Catequista Aviso Log",
-        {"aviso": aviso_name, "catequista": catequista_name},
-        "name",
-    )
-
-    now = frappe.utils.now()
-    if log_name:
-        frappe.db.set_value(
-            "Catequista Aviso Log",
-            log_name,
-            {
-                "visualizacoes": frappe.db.get_value("Catequista Aviso Log", log_name, "visualizacoes") + 1,
-                "ultima_visualizacao": now,
-            },
-        )
-    else:
-        doc = frappe.get_doc({
-            "doctype": "Catequista Aviso Log",
-            "aviso": aviso_name,
-            "catequista": catequista_name,
-            "visualizacoes": 1,
-            "ultima_visualizacao": now,
-        })
-        doc.insert(ignore_permissions=True)
+    _registar_visualizacoes(catequista_name, [aviso_name])
 
     frappe.db.commit()
     return {"success": True}
 
 
 @frappe.whitelist()
-def get_aviso_stats(aviso_name):
+def marcar_avisos_vistos(avisos):
     """
-    Devolve, para um dado aviso, quem já viu e quem ainda não viu.
-    Usado pelo painel de estatísticas no formulário de Catequista Aviso.
+    Versão em lote de marcar_aviso_visto — regista vários avisos dispensados
+    de uma vez. avisos: lista JSON de nomes de Catequista Aviso.
+    Nomes inexistentes são ignorados.
+    """
+    user = frappe.session.user
+    if user == "Guest":
+        frappe.throw(_("Não autenticado"), frappe.AuthenticationError)
+
+    catequista_name = get_catequista_name(user)
+    if not catequista_name:
+        frappe.throw(_("Catequista não encontrado"))
+
+    avisos = json.loads(avisos) if isinstance(avisos, str) else avisos
+    if not isinstance(avisos, list):
+        frappe.throw(_("Formato de dados inválido"))
+
+    existentes = frappe.db.sql_list(
+        "SELECT name FROM `tabCatequista Aviso` WHERE name IN %(names)s",
+        {"names": list(set(avisos))},
+    ) if avisos else []
+
+    _registar_visualizacoes(catequista_name, existentes)
+
+    frappe.db.commit()
+    return {"success": True, "marcados": existentes}
+
+
+def _registar_visualizacoes(catequista_name, avisos):
     """
-    aviso = frappe.get_doc("Catequista Aviso", aviso_name)
+    One INSERT ... ON DUPLICATE KEY UPDATE for all avisos: creates the log row
+    on first view, otherwise increments visualizacoes atomically. Relies on the
+    unique (aviso, catequista) key of Catequista Aviso Log.
+    """
+    if not avisos:
+        return
 
-    # ── Quem já viu ──────────────────────────────────────────────────────────
-    leram = frappe.db.sql("""
-        SELECT catequista, visualizacoes, ultima_visualizacao
-        FROM `tabCatequista Aviso Log`
-        WHERE aviso = %s
-        ORDER BY ultima_visualizacao DESC
-    """, aviso_name, as_dict=True)
+    params = {
+        "cat":  catequista_name,
+        "now":  frappe.utils.now(),
+        "user": frappe.session.user,
+    }
+    values = []
+    for i, aviso in enumerate(avisos):
+        params[f"a{i}"] = aviso
+        values.append(f"(%(now)s, %(now)s, %(user)s, %(user)s, 0, %(a{i})s, %(cat)s, 1, %(now)s)")
 
-    leram_set = {row.catequista for row in leram}
+    frappe.db.sql(f"""
+        INSERT INTO `tabCatequista Aviso Log`
+            (creation, modified, modified_by, owner, docstatus,
+             aviso, catequista, visualizacoes, ultima_visualizacao)
+        VALUES {", ".join(values)}
+        ON DUPLICATE KEY UPDATE
+            visualizacoes       = visualizacoes + 1,
+            ultima_visualizacao = VALUES(ultima_visualizacao),
+            modified            = VALUES(modified),
+            modified_by         = VALUES(modified_by)
+    """, params)
 
-    # ── Audiência alvo ───────────────────────────────────────────────────────
-    tipo = aviso.tipo_destinatario or "Todos"
+    aviso_counters.registar_visualizacao(avisos, params["now"])
 
-    if tipo == "Todos":
-        rows = frappe.db.sql(
-            "SELECT name FROM `tabCatequista` WHERE status = 'Activo' ORDER BY name",
-            as_dict=True,
-        )
-        audiencia = {r.name for r in rows}
 
-    elif tipo == "Por Fase":
-        rows = frappe.db.sql(
-            "SELECT catequista, catequista_adj FROM `tabTurma` WHERE fase = %s AND status = 'Activo'",
-            aviso.fase_destino,
-            as_dict=True,
-        )
-        audiencia = set()
-        for t in rows:
-            if t.catequista:     audiencia.add(t.catequista)
-            if t.catequista_adj: audiencia.add(t.catequista_adj)
-
-    elif tipo == "Por Turma":
-        t = frappe.db.get_value(
-            "Turma", aviso.turma_destino, ["catequista", "catequista_adj"], as_dict=True
-        )
-        audiencia = set()
-        if t:
-            if t.catequista:     audiencia.add(t.catequista)
-            if t.catequista_adj: audiencia.add(t.catequista_adj)
+# Page size of the "leram" / "nao_leram" lists in get_aviso_stats
+AVISO_STATS_PAGE_SIZE = 50
 
-    elif tipo == "Individuais":
-        audiencia = {row.catequista for row in aviso.get("destinatarios", [])}
 
-    else:
-        audiencia = set()
+@frappe.whitelist()
+def get_aviso_stats(aviso_name, lista=None, start=0, page_length=AVISO_STATS_PAGE_SIZE):
+    """
+    Devolve, para um dado aviso, quem já viu e quem ainda não viu.
+    Usado pelo painel de estatísticas no formulário de Catequista Aviso.
 
-    nao_leram = sorted(audiencia - leram_set)
+    Os totais vêm dos contadores materializados no aviso (portal/avisos.py);
+    as listas são paginadas (start / page_length). lista = "leram" ou
+    "nao_leram" devolve só essa lista (para "carregar mais").
+    """
+    frappe.has_permission("Catequista Aviso", "read", aviso_name, throw=True)
 
-    return {
-        "leram":           [dict(r) for r in leram],
-        "nao_leram":       nao_leram,
-        "total_audiencia": len(audiencia),
+    aviso = frappe.db.get_value(
+        "Catequista Aviso", aviso_name,
+        ["audiencia_total", "total_vistos", "total_visualizacoes", "ultima_visualizacao"],
+        as_dict=True,
+    )
+    if not aviso:
+        frappe.throw(_("Aviso não encontrado"), frappe.DoesNotExistError)
+
+    start       = max(0, cint(start))
+    page_length = min(max(1, cint(page_length)), 500)
+    params      = {"aviso": aviso_name, "start": start, "page_length": page_length}
+    result      = {
+        "total_audiencia":     cint(aviso.audiencia_total),
+        "total_leram":         cint(aviso.total_vistos),
+        "total_visualizacoes": cint(aviso.total_visualizacoes),
+        "ultima_visualizacao": aviso.ultima_visualizacao,
+        "start":               start,
+        "page_length":         page_length,
     }
 
+    # ── Quem já viu — (aviso, catequista) key of the log ─────────────────────
+    if lista in (None, "leram"):
+        result["leram"] = frappe.db.sql("""
+            SELECT catequista, visualizacoes, ultima_visualizacao
+            FROM `tabCatequista Aviso Log`
+            WHERE aviso = %(aviso)s
+            ORDER BY ultima_visualizacao DESC, catequista ASC
+            LIMIT %(page_length)s OFFSET %(start)s
+        """, params, as_dict=True)
+
+    # ── Audiência que ainda não viu ──────────────────────────────────────────
+    if lista in (None, "nao_leram"):
+        nao_leram_from = f"""
+            FROM `tabCatequista Aviso` a
+            JOIN `tabCatequista` c ON {aviso_counters.AUDIENCIA_COND}
+            LEFT JOIN `tabCatequista Aviso Log` l
+                   ON l.aviso = a.name AND l.catequista = c.name
+            WHERE a.name = %(aviso)s AND l.name IS NULL
+        """
+        result["nao_leram"] = frappe.db.sql_list(f"""
+            SELECT c.name {nao_leram_from}
+            ORDER BY c.name ASC
+            LIMIT %(page_length)s OFFSET %(start)s
+        """, params)
+        result["total_nao_leram"] = frappe.db.sql(
+            f"SELECT COUNT(*) {nao_leram_from}", params
+        )[0][0]
+
+    return result
+
 
 # ── Quotas ─────────────────────────────────────────────────────────────────────
 
@@ -1308,7 +1673,14 @@ def get_proximos_retiros():
     catequista's fases only (estado = Planeado, data >= today).
     """
     cat_name = _assert_catequista()
+    return conditional.respond(
+        "get_proximos_retiros", ("Plano de Retiro", "Turma"),
+        lambda: _proximos_retiros(cat_name),
+        vary=[cat_name, frappe.utils.today()],
+    )
 
+
+def _proximos_retiros(cat_name):
     turma_fases = frappe.db.sql("""
         SELECT DISTINCT fase FROM `tabTurma`
         WHERE (catequista = %s OR catequista_adj = %s)
@@ -1349,6 +1721,15 @@ def get_quotas_resumo(ano=""):
     if not ano:
         ano = str(frappe.utils.now_datetime().year)
 
+    return conditional.respond(
+        "get_quotas_resumo", ("Quota Catequista", "Catequista"),
+        lambda: _quotas_resumo(ano),
+        vary=ano,
+    )
+
+
+def _quotas_resumo(ano):
+
     catequistas = frappe.db.sql(
         "SELECT name FROM `tabCatequista` WHERE status = 'Activo' ORDER BY name ASC", as_dict=True
     )
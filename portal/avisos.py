@@ -0,0 +1,239 @@
+"""
+Portal de Catequese — Read-receipt counters of Catequista Aviso.
+
+How it works:
+  - Each aviso carries materialized counters (audiencia_total, total_vistos,
+    total_visualizacoes, ultima_visualizacao), so the stats panel of the
+    Catequista Aviso form does not rescan the log or recompute the audience.
+  - marcar_aviso_visto bumps the counters of the avisos it logs
+    (registar_visualizacao); saving an aviso recomputes its counters
+    (atualizar_contadores).
+  - Audience-changing events on Catequista and Turma (atualizar_audiencias,
+    wired in hooks.py) only note which fases/turmas/catequistas changed. One
+    UPDATE per transaction, run just before commit, then recomputes
+    audiencia_total of the active avisos targeting them. During Data Import
+    nothing is recomputed per row: each row only stamps a "pending since"
+    time, and the scheduler (atualizar_audiencias_pendentes) refreshes every
+    active aviso once no row has been imported for IMPORT_QUIET_SECONDS —
+    i.e. once, after the import has finished.
+  - The audience of an aviso is a single SQL predicate over `tabCatequista c`
+    and `tabCatequista Aviso a` (AUDIENCIA_COND), shared by the counters and by
+    the paginated "nao_leram" list.
+  - Counters can be rebuilt at any time:
+        bench execute portal.avisos.atualizar_contadores
+  - When an aviso is activated, edited or deactivated, publicar_aviso resolves
+    its audience to user ids once and pushes a REALTIME_EVENT to each of them
+    over Frappe's socket.io; the catequista portal then refetches
+    get_avisos_ativos instead of polling.
+"""
+
+import frappe
+
+REALTIME_EVENT = "portal_aviso"
+
+# Catequista `c` belongs to the audience of aviso `a`
+AUDIENCIA_COND = """
+    CASE IFNULL(a.tipo_destinatario, '')
+        WHEN 'Por Fase' THEN EXISTS (
+            SELECT 1 FROM `tabTurma` t
+            WHERE t.fase = a.fase_destino
+              AND t.status = 'Activo'
+              AND (t.catequista = c.name OR t.catequista_adj = c.name))
+        WHEN 'Por Turma' THEN EXISTS (
+            SELECT 1 FROM `tabTurma` t
+            WHERE t.name = a.turma_destino
+              AND (t.catequista = c.name OR t.catequista_adj = c.name))
+        WHEN 'Individuais' THEN EXISTS (
+            SELECT 1 FROM `tabCatequista Aviso Destinatario` d
+            WHERE d.parent = a.name
+              AND d.parenttype = 'Catequista Aviso'
+              AND d.catequista = c.name)
+        ELSE c.status = 'Activo'
+    END
+"""
+
+
+def registar_visualizacao(avisos, now):
+    """Counters after marcar_aviso_visto logged one more view of each aviso."""
+    if not avisos:
+        return
+    frappe.db.sql("""
+        UPDATE `tabCatequista Aviso` a
+        SET a.total_visualizacoes = IFNULL(a.total_visualizacoes, 0) + 1,
+            a.total_vistos = (
+                SELECT COUNT(*) FROM `tabCatequista Aviso Log` l WHERE l.aviso = a.name),
+            a.ultima_visualizacao = %(now)s
+        WHERE a.name IN %(avisos)s
+    """, {"avisos": list(avisos), "now": now})
+
+
+def atualizar_contadores(avisos=None):
+    """
+    Recompute every counter of the given avisos (all when None) from the
+    audience and the log, in one UPDATE.
+    """
+    cond = "WHERE a.name IN %(avisos)s" if avisos else ""
+    frappe.db.sql(f"""
+        UPDATE `tabCatequista Aviso` a
+        SET a.audiencia_total = (
+                SELECT COUNT(*) FROM `tabCatequista` c WHERE {AUDIENCIA_COND}),
+            a.total_vistos = (
+                SELECT COUNT(*) FROM `tabCatequista Aviso Log` l WHERE l.aviso = a.name),
+            a.total_visualizacoes = (
+                SELECT IFNULL(SUM(l.visualizacoes), 0)
+                FROM `tabCatequista Aviso Log` l WHERE l.aviso = a.name),
+            a.ultima_visualizacao = (
+                SELECT MAX(l.ultima_visualizacao)
+                FROM `tabCatequista Aviso Log` l WHERE l.aviso = a.name)
+        {cond}
+    """, {"avisos": list(avisos or [])})
+
+
+# ── Audience refresh on Catequista / Turma changes ────────────────────────────
+
+_PENDENTE_KEY = "portal:aviso_audiencias_pendentes"
+IMPORT_QUIET_SECONDS = 120
+
+# Turma fields that decide who is in a 'Por Fase' / 'Por Turma' audience
+_TURMA_AUDIENCE_FIELDS = ("fase", "status", "catequista", "catequista_adj")
+
+# Active avisos whose audience involves the changed catequistas/turmas/fases
+_ALVO_COND = """
+    a.ativo = 1 AND (
+        (%(todos)s AND IFNULL(a.tipo_destinatario, '')
+            NOT IN ('Por Fase', 'Por Turma', 'Individuais'))
+        OR (a.tipo_destinatario = 'Por Fase' AND (
+            a.fase_destino IN %(fases)s
+            OR a.fase_destino IN (
+                SELECT t.fase FROM `tabTurma` t
+                WHERE t.catequista IN %(catequistas)s OR t.catequista_adj IN %(catequistas)s)))
+        OR (a.tipo_destinatario = 'Por Turma' AND (
+            a.turma_destino IN %(turmas)s
+            OR a.turma_destino IN (
+                SELECT t.name FROM `tabTurma` t
+                WHERE t.catequista IN %(catequistas)s OR t.catequista_adj IN %(catequistas)s)))
+        OR (a.tipo_destinatario = 'Individuais' AND EXISTS (
+            SELECT 1 FROM `tabCatequista Aviso Destinatario` d
+            WHERE d.parent = a.name
+              AND d.parenttype = 'Catequista Aviso'
+              AND d.catequista IN %(catequistas)s))
+    )
+"""
+
+
+def atualizar_audiencias(doc=None, method=None):
+    """
+    doc_events handler for Catequista and Turma — a status, fase or catequista
+    change may move people in or out of an aviso's audience. Only records
+    what changed; _recalcular_alvos() does the work once per transaction.
+    """
+    if frappe.flags.in_import:
+        frappe.cache().set_value(_PENDENTE_KEY, frappe.utils.now())
+        return
+
+    deleted = method == "after_delete"
+    alvos, deferred = _alvos_pendentes()
+
+    if doc.doctype == "Catequista":
+        # Status only counts for the 'Todos' audience; the targeted ones
+        # change only when the record itself goes away
+        if deleted:
+            alvos["catequistas"].add(doc.name)
+        elif not doc.has_value_changed("status"):
+            return
+        alvos["todos"] = True
+
+    elif doc.doctype == "Turma":
+        if not deleted and not any(doc.has_value_changed(f) for f in _TURMA_AUDIENCE_FIELDS):
+            return
+        previous = None if deleted else doc.get_doc_before_save()
+        alvos["turmas"].add(doc.name)
+        alvos["fases"].update(
+            f for f in (doc.get("fase"), previous and previous.get("fase")) if f
+        )
+
+    if not deferred:
+        _recalcular_alvos()
+
+
+def _alvos_pendentes():
+    """
+    (targets collected in this transaction, deferred). The pre-commit refresh
+    is registered once per transaction (and the targets dropped on rollback);
+    without frappe.db.before_commit (Frappe < 15) deferred is False and the
+    caller refreshes right away.
+    """
+    before_commit = getattr(frappe.db, "before_commit", None)
+    alvos = frappe.flags.get("portal_aviso_alvos")
+    if alvos is None:
+        alvos = frappe.flags.portal_aviso_alvos = {
+            "todos": False, "catequistas": set(), "turmas": set(), "fases": set(),
+        }
+        if before_commit is not None:
+            before_commit.add(_recalcular_alvos)
+            frappe.db.after_rollback.add(lambda: frappe.flags.pop("portal_aviso_alvos", None))
+    return alvos, before_commit is not None
+
+
+def _recalcular_alvos():
+    """One UPDATE of audiencia_total for the avisos targeted in this transaction."""
+    alvos = frappe.flags.pop("portal_aviso_alvos", None)
+    if not alvos:
+        return
+    if not (alvos["todos"] or alvos["catequistas"] or alvos["turmas"] or alvos["fases"]):
+        return
+
+    # IN () is invalid SQL — an empty set becomes a value no row has
+    params = {
+        "todos": 1 if alvos["todos"] else 0,
+        **{k: list(alvos[k]) or [""] for k in ("catequistas", "turmas", "fases")},
+    }
+    frappe.db.sql(f"""
+        UPDATE `tabCatequista Aviso` a
+        SET a.audiencia_total = (
+            SELECT COUNT(*) FROM `tabCatequista` c WHERE {AUDIENCIA_COND})
+        WHERE {_ALVO_COND}
+    """, params)
+
+
+def atualizar_audiencias_pendentes():
+    """
+    Scheduler job: after a Data Import of Catequista or Turma, recompute the
+    audience of every active aviso once, as soon as no import is running.
+    """
+    since = frappe.cache().get_value(_PENDENTE_KEY)
+    if not since:
+        return
+    # Rows are still arriving — wait for the import to go quiet
+    if frappe.utils.time_diff_in_seconds(frappe.utils.now(), since) < IMPORT_QUIET_SECONDS:
+        return
+
+    frappe.cache().delete_value(_PENDENTE_KEY)
+    frappe.db.sql(f"""
+        UPDATE `tabCatequista Aviso` a
+        SET a.audiencia_total = (
+            SELECT COUNT(*) FROM `tabCatequista` c WHERE {AUDIENCIA_COND})
+        WHERE a.ativo = 1
+    """)
+    frappe.db.commit()
+
+
+def publicar_aviso(doc):
+    """
+    Notify the audience of `doc` (a Catequista Aviso just saved) over realtime.
+    Sent after commit, so clients refetching get_avisos_ativos see the change.
+    """
+    if not doc.ativo and not doc.has_value_changed("ativo"):
+        return
+
+    users = frappe.db.sql_list(f"""
+        SELECT DISTINCT c.user
+        FROM `tabCatequista Aviso` a
+        JOIN `tabCatequista` c ON {AUDIENCIA_COND}
+        WHERE a.name = %(aviso)s
+          AND IFNULL(c.user, '') != ''
+    """, {"aviso": doc.name})
+
+    message = {"aviso": doc.name, "ativo": bool(doc.ativo)}
+    for user in users:
+        frappe.publish_realtime(REALTIME_EVENT, message, user=user, after_commit=True)
@@ -0,0 +1,218 @@
+"""
+Portal de Catequese — Set-based writes over many rows of one doctype.
+
+How it works:
+  - set_values() applies per-row values with one UPDATE:
+        SET f = CASE name WHEN ... THEN ... ELSE f END, ...
+    Like frappe.db.set_value it bypasses doc_events and stamps
+    modified/modified_by.
+  - reserve_names() + insert_rows() are a bulk new_doc().insert() for
+    doctypes without controller hooks: names are reserved for the whole
+    batch at once (one update of `tabSeries` for naming series, one NEXTVAL
+    over the id sequence for autoincrement doctypes), and rows are written
+    with one multi-row INSERT per chunk. Child rows are inserted the same
+    way, with parent/parenttype/parentfield/idx set.
+  - delete_rows() is the matching bulk frappe.delete_doc: one check that no other document links
+    to the rows (LinkExistsError otherwise, nothing is deleted), one
+    bulk insert of their Deleted Document backups, one DELETE per
+    dependent doctype (Comment, Version, ToDo, DocShare) and one DELETE of
+    the rows. Attached Files go through File's own delete so the files
+    leave the disk too.
+    Limitation: no controller code runs. Doctypes whose controller or
+    doc_events define on_trash/after_delete are deleted one by one with
+    frappe.delete_doc instead; site-wide ("*") doc_events are not run.
+"""
+
+import frappe
+from frappe import _
+
+# Rows that frappe.delete_doc removes along with a document:
+# doctype → (reference doctype field, reference name field)
+_DEPENDENT_ROWS = {
+    "Comment":  ("reference_doctype", "reference_name"),
+    "Version":  ("ref_doctype", "docname"),
+    "ToDo":     ("reference_type", "reference_name"),
+    "DocShare": ("share_doctype", "share_name"),
+}
+
+_DELETE_METHODS = ("on_trash", "after_delete")
+
+
+def set_values(doctype, updates):
+    """Apply {name: {field: value}} to many rows of `doctype` with one UPDATE."""
+    if not updates:
+        return
+
+    fields = sorted({f for values in updates.values() for f in values})
+    params = {
+        "names":       list(updates),
+        "modified":    frappe.utils.now(),
+        "modified_by": frappe.session.user,
+    }
+
+    assignments = []
+    for i, field in enumerate(fields):
+        whens = []
+        for j, (name, values) in enumerate(updates.items()):
+            if field not in values:
+                continue
+            params[f"n{i}_{j}"] = name
+            params[f"v{i}_{j}"] = values[field]
+            whens.append(f"WHEN %(n{i}_{j})s THEN %(v{i}_{j})s")
+        assignments.append(f"`{field}` = CASE name {' '.join(whens)} ELSE `{field}` END")
+
+    frappe.db.sql(f"""
+        UPDATE `tab{doctype}`
+        SET {", ".join(assignments)},
+            modified = %(modified)s,
+            modified_by = %(modified_by)s
+        WHERE name IN %(names)s
+    """, params)
+
+
+def reserve_names(doctype, count):
+    """
+    `count` new names for `doctype`, in order. Naming-series autonames
+    ("ACT.-.YY.-.##") reserve a block of the series, autoincrement doctypes
+    draw from their `<doctype>_id_seq` sequence; anything else gets hashes.
+    """
+    autoname = frappe.get_meta(doctype).autoname or ""
+    if not count:
+        return []
+    if autoname == "autoincrement":
+        # seq_1_to_N is MariaDB's built-in Sequence engine: one NEXTVAL per row
+        return frappe.db.sql_list(
+            f"SELECT NEXTVAL(`{frappe.scrub(doctype)}_id_seq`) FROM seq_1_to_{int(count)}"
+        )
+    if "." not in autoname or not autoname.endswith("#"):
+        return [frappe.generate_hash(length=10) for _i in range(count)]
+
+    from frappe.model.naming import parse_naming_series
+
+    series, hashes = autoname.rsplit(".", 1)
+    prefix = parse_naming_series(series)
+
+    frappe.db.sql("""
+        INSERT INTO `tabSeries` (name, current) VALUES (%(prefix)s, 0)
+        ON DUPLICATE KEY UPDATE name = name
+    """, {"prefix": prefix})
+    current = frappe.db.sql(
+        "SELECT current FROM `tabSeries` WHERE name = %(prefix)s FOR UPDATE", {"prefix": prefix},
+    )[0][0]
+    frappe.db.sql(
+        "UPDATE `tabSeries` SET current = current + %(count)s WHERE name = %(prefix)s",
+        {"prefix": prefix, "count": count},
+    )
+    return [f"{prefix}{str(current + i).zfill(len(hashes))}" for i in range(1, count + 1)]
+
+
+def insert_rows(doctype, rows, chunk_size=500, on_chunk=None):
+    """
+    Insert `rows` (dicts with the same keys, "name" included) — see the
+    module docstring. on_chunk(done, total) is called after each chunk.
+    """
+    if not rows:
+        return
+
+    now    = frappe.utils.now()
+    user   = frappe.session.user
+    keys   = [k for k in rows[0] if k not in ("name", "idx")]
+    fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx"] + keys
+
+    total = len(rows)
+    for start in range(0, total, chunk_size):
+        chunk = rows[start:start + chunk_size]
+        frappe.db.bulk_insert(doctype, fields, [
+            (r["name"], now, now, user, user, 0, r.get("idx", 0)) + tuple(r.get(k) for k in keys)
+            for r in chunk
+        ])
+        if on_chunk:
+            on_chunk(start + len(chunk), total)
+
+
+def _assert_not_linked(doctype, names):
+    """Throw LinkExistsError if any document links to one of `names`."""
+    link_fields = frappe.db.sql("""
+        SELECT parent AS doctype, fieldname FROM `tabDocField`
+        WHERE fieldtype = 'Link' AND options = %(doctype)s AND parent != %(doctype)s
+        UNION
+        SELECT dt AS doctype, fieldname FROM `tabCustom Field`
+        WHERE fieldtype = 'Link' AND options = %(doctype)s AND dt != %(doctype)s
+    """, {"doctype": doctype}, as_dict=True)
+
+    for lf in link_fields:
+        if frappe.get_meta(lf.doctype).issingle:
+            continue
+        linked = frappe.db.sql(f"""
+            SELECT name, `{lf.fieldname}` AS target FROM `tab{lf.doctype}`
+            WHERE `{lf.fieldname}` IN %(names)s
+            LIMIT 1
+        """, {"names": list(names)}, as_dict=True)
+        if linked:
+            frappe.throw(
+                _("Não é possível eliminar {0} {1}: está ligado a {2} {3}").format(
+                    _(doctype), linked[0].target, _(lf.doctype), linked[0].name),
+                frappe.LinkExistsError,
+            )
+
+
+def _has_delete_hooks(doctype):
+    """True if deleting `doctype` runs code: controller methods or its own doc_events."""
+    from frappe.model.base_document import get_controller
+    from frappe.model.document import Document
+
+    controller = get_controller(doctype)
+    if any(getattr(controller, m, None) is not getattr(Document, m, None) for m in _DELETE_METHODS):
+        return True
+    events = frappe.get_hooks("doc_events").get(doctype) or {}
+    return any(events.get(m) for m in _DELETE_METHODS)
+
+
+def _delete_dependents(doctype, names):
+    """Comments, Versions, ToDos, shares and attached Files of the deleted rows."""
+    params = {"doctype": doctype, "names": names}
+    for dependent, (dt_field, name_field) in _DEPENDENT_ROWS.items():
+        frappe.db.sql(f"""
+            DELETE FROM `tab{dependent}`
+            WHERE `{dt_field}` = %(doctype)s AND `{name_field}` IN %(names)s
+        """, params)
+
+    for file_name in frappe.db.sql_list("""
+        SELECT name FROM `tabFile`
+        WHERE attached_to_doctype = %(doctype)s AND attached_to_name IN %(names)s
+    """, params):
+        frappe.delete_doc("File", file_name, ignore_permissions=True)
+
+
+def delete_rows(doctype, rows):
+    """
+    Delete `rows` (full rows of `doctype`, as dicts) — see the module
+    docstring. Returns the number of rows deleted.
+    """
+    if not rows:
+        return 0
+
+    names = [r["name"] for r in rows]
+    if _has_delete_hooks(doctype):
+        for name in names:
+            frappe.delete_doc(doctype, name)
+        return len(names)
+
+    _assert_not_linked(doctype, names)
+
+    now  = frappe.utils.now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Deleted Document",
+        ["name", "creation", "modified", "owner", "modified_by",
+         "deleted_name", "deleted_doctype", "data"],
+        [
+            (frappe.generate_hash(length=10), now, now, user, user,
+             r["name"], doctype, frappe.as_json(dict(r, doctype=doctype)))
+            for r in rows
+        ],
+    )
+
+    _delete_dependents(doctype, names)
+    frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name IN %(names)s", {"names": names})
+    return len(names)
@@ -0,0 +1,79 @@
+"""
+Portal de Catequese — Server-side cache for the public (guest) endpoints.
+
+How it works:
+  - Results of the public read endpoints in portal/api.py are stored in Redis
+    (frappe.cache) under a key built from the endpoint name, its arguments and
+    a site-wide data version counter.
+  - The version counter is bumped from doc_events on the doctypes the public
+    endpoints read from (see hooks.py). Bumping it makes every existing entry
+    unreachable at once, so guests never see stale data and no TTL guess is
+    needed.
+  - Entries still carry a generous expiry so that keys belonging to old
+    versions are eventually evicted by Redis.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.utils import cint
+
+VERSION_KEY = "portal:public:version"
+KEY_PREFIX = "portal:public"
+
+# Only used to garbage-collect entries of superseded versions.
+ENTRY_TTL = 24 * 60 * 60
+
+
+def get_version():
+    """Current data version for the public endpoints (0 when never bumped)."""
+    cache = frappe.cache()
+    raw = cache.get(cache.make_key(VERSION_KEY))
+    if raw is None:
+        return 0
+    return cint(raw.decode() if isinstance(raw, bytes) else raw)
+
+
+def bump_version(doc=None, method=None):
+    """
+    Invalidate every cached public response.
+    Signature matches doc_events so it can be wired directly in hooks.py.
+
+    The bump is deferred until the transaction commits; bumping earlier would
+    let a concurrent guest request re-cache the pre-commit data under the new
+    version.
+    """
+    after_commit = getattr(frappe.db, "after_commit", None)
+    if after_commit is None:
+        _incr_version()
+        return
+    after_commit.add(_incr_version)
+
+
+def _incr_version():
+    cache = frappe.cache()
+    cache.incr(cache.make_key(VERSION_KEY))
+
+
+def _entry_key(endpoint, version, kwargs):
+    args = json.dumps(kwargs or {}, sort_keys=True, default=str)
+    digest = hashlib.md5(args.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{endpoint}:{version}:{digest}"
+
+
+def get_or_build(endpoint, build, **kwargs):
+    """
+    Return the cached result of `build(**kwargs)` for this endpoint + arguments,
+    computing and storing it on a miss.
+    """
+    cache = frappe.cache()
+    key = _entry_key(endpoint, get_version(), kwargs)
+
+    hit = cache.get_value(key)
+    if hit is not None:
+        return hit
+
+    result = build(**kwargs)
+    cache.set_value(key, result, expires_in_sec=ENTRY_TTL)
+    return result
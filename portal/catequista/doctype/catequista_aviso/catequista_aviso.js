@@ -38,17 +38,49 @@ function load_aviso_stats(frm) {
 		method: 'portal.api.get_aviso_stats',
 		args: { aviso_name: frm.doc.name },
 		callback(r) {
-			const html = build_stats_html(r.message || {});
-			frm.set_df_property('stats_html', 'options', html);
-			frm.refresh_field('stats_html');
+			frm._aviso_stats = r.message || {};
+			render_aviso_stats(frm);
 		},
 	});
 }
 
+function render_aviso_stats(frm) {
+	frm.set_df_property('stats_html', 'options', build_stats_html(frm._aviso_stats));
+	frm.refresh_field('stats_html');
+
+	// "Carregar mais" — fetch the next page of one list and append it
+	frm.fields_dict.stats_html.$wrapper.find('[data-aviso-stats-more]').on('click', function () {
+		const lista = $(this).attr('data-aviso-stats-more');
+		const data  = frm._aviso_stats;
+		$(this).prop('disabled', true).text(__('A carregar…'));
+
+		frappe.call({
+			method: 'portal.api.get_aviso_stats',
+			args: { aviso_name: frm.doc.name, lista, start: (data[lista] || []).length },
+			callback(r) {
+				data[lista] = (data[lista] || []).concat((r.message || {})[lista] || []);
+				render_aviso_stats(frm);
+			},
+		});
+	});
+}
+
+function load_more_button(lista, shown, total) {
+	if (shown >= total) return '';
+	return `
+		<div style="text-align:center;margin:8px 0 16px;">
+			<button class="btn btn-xs btn-default" data-aviso-stats-more="${lista}">
+				${__('Carregar mais')} (${shown} / ${total})
+			</button>
+		</div>`;
+}
+
 function build_stats_html(data) {
 	const leram          = data.leram      || [];
 	const naoLeram       = data.nao_leram  || [];
 	const totalAudiencia = data.total_audiencia || 0;
+	const totalLeram     = data.total_leram || 0;
+	const totalNaoLeram  = data.total_nao_leram || 0;
 
 	/* ── Full empty state (no logs, no known audience) ── */
 	if (!leram.length && !totalAudiencia) {
@@ -62,17 +94,16 @@ function build_stats_html(data) {
 	}
 
 	/* ── Summary badges ── */
-	const totalViews  = leram.reduce((s, r) => s + (r.visualizacoes || 0), 0);
-	const leramCount  = leram.length;
-	const ratio       = totalAudiencia ? `${leramCount} / ${totalAudiencia}` : String(leramCount);
+	const totalViews  = data.total_visualizacoes || 0;
+	const ratio       = totalAudiencia ? `${totalLeram} / ${totalAudiencia}` : String(totalLeram);
 
-	const pendenteBadge = naoLeram.length ? `
+	const pendenteBadge = totalNaoLeram ? `
 		<div style="padding:10px 16px;background:#fff7ed;border:1px solid #fed7aa;
 			border-radius:8px;display:flex;align-items:center;gap:8px;">
 			<span style="font-size:18px;line-height:1;">⏳</span>
 			<div>
 				<div style="font-size:20px;font-weight:700;color:#c2410c;line-height:1.1;">
-					${naoLeram.length}
+					${totalNaoLeram}
 				</div>
 				<div style="font-size:10px;color:#fb923c;text-transform:uppercase;
 					letter-spacing:0.06em;margin-top:1px;">
@@ -143,7 +174,7 @@ function build_stats_html(data) {
 		return `
 			<p style="font-size:10px;font-weight:700;color:#94a3b8;text-transform:uppercase;
 				letter-spacing:0.08em;margin:0 0 8px;">Leram</p>
-			<div style="border:1px solid #e2e8f0;border-radius:8px;overflow:hidden;margin-bottom:20px;">
+			<div style="border:1px solid #e2e8f0;border-radius:8px;overflow:hidden;margin-bottom:${leram.length < totalLeram ? 0 : 20}px;">
 				<table style="width:100%;border-collapse:collapse;">
 					<thead>
 						<tr style="background:#f8fafc;border-bottom:2px solid #e2e8f0;">
@@ -157,14 +188,15 @@ function build_stats_html(data) {
 					</thead>
 					<tbody>${rows}</tbody>
 				</table>
-			</div>`;
+			</div>
+			${load_more_button('leram', leram.length, totalLeram)}`;
 	})() : '';
 
 	/* ── "Ainda não viram" section ── */
 	const naoLeramSection = (() => {
 		if (!totalAudiencia) return ''; // audience unknown — nothing to show
 
-		if (!naoLeram.length) {
+		if (!totalNaoLeram) {
 			return `
 				<div style="display:flex;align-items:center;gap:8px;padding:10px 14px;
 					background:#f0fdf4;border:1px solid #bbf7d0;border-radius:8px;">
@@ -187,7 +219,8 @@ function build_stats_html(data) {
 				letter-spacing:0.08em;margin:0 0 8px;">Ainda não viram</p>
 			<div style="display:flex;flex-wrap:wrap;gap:6px;">
 				${chips}
-			</div>`;
+			</div>
+			${load_more_button('nao_leram', naoLeram.length, totalNaoLeram)}`;
 	})();
 
 	return `<div style="padding:4px 0 10px;">${badges}${leramTable}${naoLeramSection}</div>`;
@@ -1,6 +1,12 @@
 import frappe
 from frappe.model.document import Document
 
+from portal.avisos import atualizar_contadores, publicar_aviso
+
 
 class CatequistaAviso(Document):
-    pass
+    def on_update(self):
+        # Audience may have changed (tipo, fase, turma, destinatários) and the
+        # form writes back whatever counters it loaded — recompute them.
+        atualizar_contadores([self.name])
+        publicar_aviso(self)
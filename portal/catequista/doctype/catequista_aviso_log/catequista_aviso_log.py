@@ -4,3 +4,11 @@ from frappe.model.document import Document
 
 class CatequistaAvisoLog(Document):
     pass
+
+
+def on_doctype_update():
+    # One row per (aviso, catequista) — marcar_aviso_visto upserts against it
+    frappe.db.add_unique(
+        "Catequista Aviso Log", ["aviso", "catequista"],
+        constraint_name="unique_aviso_catequista",
+    )
@@ -1,26 +1,38 @@
 import frappe
+from frappe import _
 from frappe.utils import getdate
 
 ROMAN = ["I", "II", "III", "IV"]
 
 
+def base_name(fase_1, fase_2, data):
+    ano = getdate(data).year if data else "N/A"
+    if fase_1 and fase_2:
+        return f"Retiro-{fase_1} e {fase_2}-{ano}"
+    elif fase_1:
+        return f"Retiro-{fase_1}-{ano}"
+    return f"Retiro-{ano}"
+
+
+def next_name(base, exists):
+    """
+    (name, titulo) of the next retiro under `base`; exists(name) → bool.
+    A base holds at most len(ROMAN) retiros.
+    """
+    if not exists(base):
+        return base, f"{base} {ROMAN[0]}"
+
+    counter = 2
+    while counter <= len(ROMAN) and exists(f"{base}-{counter}"):
+        counter += 1
+    if counter > len(ROMAN):
+        frappe.throw(_("Já existem {0} retiros {1}; não é possível criar mais").format(len(ROMAN), base))
+    return f"{base}-{counter}", f"{base} {ROMAN[counter - 1]}"
+
+
 class PlanodeRetiro(frappe.model.document.Document):
     def autoname(self):
-        ano = getdate(self.data).year if self.data else "N/A"
-        if self.fase_1 and self.fase_2:
-            base = f"Retiro-{self.fase_1} e {self.fase_2}-{ano}"
-        elif self.fase_1:
-            base = f"Retiro-{self.fase_1}-{ano}"
-        else:
-            base = f"Retiro-{ano}"
-
-        if not frappe.db.exists("Plano de Retiro", base):
-            self.name = base
-            self.titulo = f"{base} {ROMAN[0]}"
-            return
-
-        counter = 2
-        while counter <= 4 and frappe.db.exists("Plano de Retiro", f"{base}-{counter}"):
-            counter += 1
-        self.name = f"{base}-{counter}"
-        self.titulo = f"{base} {ROMAN[counter - 1]}"
+        self.name, self.titulo = next_name(
+            base_name(self.fase_1, self.fase_2, self.data),
+            lambda name: frappe.db.exists("Plano de Retiro", name),
+        )
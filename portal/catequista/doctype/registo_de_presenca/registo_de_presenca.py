@@ -0,0 +1,14 @@
+import frappe
+from frappe.model.document import Document
+
+
+class RegistodePresenca(Document):
+    pass
+
+
+def on_doctype_update():
+    # One record per catecúmeno per session — lets portal.presencas upsert
+    frappe.db.add_unique(
+        "Registo de Presenca", ["turma", "data", "catecumeno"],
+        constraint_name="unique_turma_data_catecumeno",
+    )
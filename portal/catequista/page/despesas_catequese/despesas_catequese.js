@@ -68,6 +68,8 @@ function api(method, args) {
   });
 }
 
+const PAGE_SIZE = 100;   // expenses per get_despesas page
+
 const EMPTY_FORM = () => ({
   name: null, descricao: '', fonte: 'Quotas', ano_lectivo: '',
   data: '', valor: '', categoria: '', actividade: '', notas: '',
@@ -91,7 +93,7 @@ function formatDate(d) {
 // App
 // ─────────────────────────────────────────────────────────────────────────────
 function createDespesasApp() {
-  const { createApp, ref, computed, reactive, nextTick, onMounted, onUnmounted } = Vue;
+  const { createApp, ref, computed, reactive, nextTick, watch, onMounted, onUnmounted } = Vue;
 
   return createApp({
     template: `
@@ -277,7 +279,7 @@ function createDespesasApp() {
           </tr>
           <tr class="de-total-row">
             <td colspan="5" class="de-total-label">
-              {{ filteredDespesas.length }} despesa{{ filteredDespesas.length !== 1 ? 's' : '' }}
+              {{ despesasTotais.count }} despesa{{ despesasTotais.count !== 1 ? 's' : '' }}
               <span v-if="hasFilters" style="color:#a3a3a3"> (filtradas)</span>
             </td>
             <td class="de-total-valor">{{ fmt(filteredTotal) }}</td>
@@ -285,6 +287,11 @@ function createDespesasApp() {
           </tr>
         </tbody>
       </table>
+      <div v-if="hasMoreDespesas" class="de-load-more">
+        <button class="de-btn de-btn-secondary de-btn-sm" @click="loadMoreDespesas" :disabled="loadingMore">
+          {{ loadingMore ? 'A carregar…' : 'Carregar mais' }}
+        </button>
+      </div>
     </div>
 
     <!-- ── Receitas table ─────────────────────────────────────────────── -->
@@ -501,6 +508,9 @@ function createDespesasApp() {
       const anos                  = ref([]);
       const selectedAno           = ref('');
       const despesas              = ref([]);
+      const despesasTotais        = ref({ count: 0, total: 0 });
+      const hasMoreDespesas       = ref(false);
+      const loadingMore           = ref(false);
       const receitas              = ref([]);
       const resumo                = ref({});
       const actividadesOpts       = ref([]);
@@ -539,36 +549,36 @@ function createDespesasApp() {
         filterFonte.value || filterCategoria.value || filterReceitaFonte.value || search.value.trim()
       );
 
-      const filteredDespesas = computed(() => {
-        let items = despesas.value;
-        const q = search.value.toLowerCase().trim();
-        if (q) items = items.filter(d =>
-          (d.descricao  || '').toLowerCase().includes(q) ||
-          (d.actividade || '').toLowerCase().includes(q) ||
-          (d.notas      || '').toLowerCase().includes(q)
-        );
-        if (filterFonte.value)
-          items = items.filter(d => d.fonte === filterFonte.value);
-        if (filterCategoria.value)
-          items = items.filter(d => d.categoria === filterCategoria.value);
-        return items;
-      });
-
-      const filteredTotal = computed(() =>
-        filteredDespesas.value.reduce((s, d) => s + (d.valor || 0), 0)
-      );
-
-      const filteredReceitas = computed(() => {
-        let items = receitas.value;
-        const q = search.value.toLowerCase().trim();
-        if (q) items = items.filter(r =>
-          (r.descricao || '').toLowerCase().includes(q) ||
-          (r.notas     || '').toLowerCase().includes(q)
-        );
-        if (filterReceitaFonte.value)
-          items = items.filter(r => r.fonte === filterReceitaFonte.value);
-        return items;
-      });
+      // Filter state as portal.filters specs — applied by the server
+      const despesaSpec = computed(() => ({
+        fonte:     filterFonte.value,
+        categoria: filterCategoria.value,
+        search:    search.value.trim(),
+      }));
+      const receitaSpec = computed(() => ({
+        fonte:  filterReceitaFonte.value,
+        search: search.value.trim(),
+      }));
+
+      // Rows arrive already filtered by get_despesas / get_receitas
+      const filteredDespesas = computed(() => despesas.value);
+
+      // A row created or edited here may no longer match the filters. Same
+      // rules as DESPESA_FILTER_FIELDS / RECEITA_FILTER_FIELDS, applied only
+      // to the row just saved.
+      function _fold(v) {
+        return String(v || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+      }
+      function _matches(row, spec, searchFields) {
+        for (const key of ['fonte', 'categoria']) {
+          if (spec[key] && row[key] !== spec[key]) return false;
+        }
+        if (!spec.search) return true;
+        const q = _fold(spec.search);
+        return searchFields.some(f => _fold(row[f]).includes(q));
+      }
+      const filteredTotal    = computed(() => despesasTotais.value.total);
+      const filteredReceitas = computed(() => receitas.value);
 
       const receitaTotal = computed(() =>
         filteredReceitas.value.reduce((s, r) => s + (r.valor || 0), 0)
@@ -709,6 +719,8 @@ function createDespesasApp() {
             saved = await api('create_despesa', { data_json: JSON.stringify(payload) });
             despesas.value.unshift(saved);
           }
+          if (!_matches(saved, despesaSpec.value, ['descricao', 'notas', 'fonte']))
+            despesas.value = despesas.value.filter(d => d.name !== saved.name);
           await loadResumo();
           toast(form.name ? 'Despesa actualizada' : 'Despesa criada', 'success');
           closePanel();
@@ -775,6 +787,8 @@ function createDespesasApp() {
             saved = await api('create_receita', { data_json: JSON.stringify(payload) });
             receitas.value.unshift(saved);
           }
+          if (!_matches(saved, receitaSpec.value, ['descricao', 'notas']))
+            receitas.value = receitas.value.filter(r => r.name !== saved.name);
           await loadResumo();
           toast(receitaForm.name ? 'Receita actualizada' : 'Receita criada', 'success');
           closePanel();
@@ -825,10 +839,47 @@ function createDespesasApp() {
       }
 
       // ── Data loading ──────────────────────────────────────────────────
+      function _despesasArgs(after) {
+        return {
+          ano_lectivo:  selectedAno.value,
+          filters_json: JSON.stringify(despesaSpec.value),
+          after:        after ? JSON.stringify(after) : '',
+          page_length:  PAGE_SIZE,
+        };
+      }
+
+      // Last despesa received from the server ({data, name}). Pages continue
+      // after it (keyset), so local creates/deletes never shift or repeat a page.
+      let _cursor = null;
+
+      function _appendDespesas(rows, reset) {
+        if (reset) { despesas.value = []; _cursor = null; }
+        if (rows.length) {
+          const last = rows[rows.length - 1];
+          _cursor = { data: last.data || null, name: last.name };
+        }
+        const loaded = new Set(despesas.value.map(d => d.name));
+        despesas.value.push(...rows.filter(r => !loaded.has(r.name)));
+        hasMoreDespesas.value = rows.length === PAGE_SIZE;
+      }
+
+      function _receitasArgs() {
+        return { ano_lectivo: selectedAno.value, filters_json: JSON.stringify(receitaSpec.value) };
+      }
+
+      function _totaisArgs() {
+        return { ano_lectivo: selectedAno.value, filters_json: JSON.stringify(despesaSpec.value) };
+      }
+
       async function loadResumo() {
         if (!selectedAno.value) return;
         try {
-          resumo.value = await api('get_resumo_financeiro', { ano_lectivo: selectedAno.value }) || {};
+          const [res, tot] = await Promise.all([
+            api('get_resumo_financeiro', { ano_lectivo: selectedAno.value }),
+            api('get_despesas_totais',   _totaisArgs()),
+          ]);
+          resumo.value         = res || {};
+          despesasTotais.value = tot || { count: 0, total: 0 };
         } catch (_) { /* non-fatal */ }
       }
 
@@ -836,15 +887,17 @@ function createDespesasApp() {
         if (!selectedAno.value) return;
         loading.value = true;
         try {
-          const [desp, rec, res, acts] = await Promise.all([
-            api('get_despesas',          { ano_lectivo: selectedAno.value }),
-            api('get_receitas',          { ano_lectivo: selectedAno.value }),
+          const [desp, rec, res, tot, acts] = await Promise.all([
+            api('get_despesas',          _despesasArgs(null)),
+            api('get_receitas',          _receitasArgs()),
             api('get_resumo_financeiro', { ano_lectivo: selectedAno.value }),
+            api('get_despesas_totais',   _totaisArgs()),
             api('get_actividades_nomes', { ano_lectivo: selectedAno.value }),
           ]);
-          despesas.value        = desp || [];
+          _appendDespesas(desp || [], true);
           receitas.value        = rec  || [];
           resumo.value          = res  || {};
+          despesasTotais.value  = tot  || { count: 0, total: 0 };
           actividadesOpts.value = acts || [];
         } catch (e) {
           toast('Erro ao carregar: ' + e.message, 'error');
@@ -853,6 +906,42 @@ function createDespesasApp() {
         }
       }
 
+      // Filter changes reload only the lists (search is debounced)
+      async function loadFiltered() {
+        if (!selectedAno.value) return;
+        try {
+          const [desp, rec, tot] = await Promise.all([
+            api('get_despesas',        _despesasArgs(null)),
+            api('get_receitas',        _receitasArgs()),
+            api('get_despesas_totais', _totaisArgs()),
+          ]);
+          _appendDespesas(desp || [], true);
+          receitas.value        = rec  || [];
+          despesasTotais.value  = tot  || { count: 0, total: 0 };
+        } catch (e) {
+          toast('Erro ao carregar: ' + e.message, 'error');
+        }
+      }
+
+      async function loadMoreDespesas() {
+        if (!hasMoreDespesas.value || loadingMore.value) return;
+        loadingMore.value = true;
+        try {
+          const rows = await api('get_despesas', _despesasArgs(_cursor)) || [];
+          _appendDespesas(rows, false);
+        } catch (e) {
+          toast('Erro ao carregar: ' + e.message, 'error');
+        } finally {
+          loadingMore.value = false;
+        }
+      }
+
+      let _filterTimer = null;
+      watch([despesaSpec, receitaSpec], () => {
+        clearTimeout(_filterTimer);
+        _filterTimer = setTimeout(loadFiltered, 250);
+      });
+
       async function init() {
         loading.value = true;
         try {
@@ -908,6 +997,7 @@ function createDespesasApp() {
         search, filterFonte, filterCategoria, filterReceitaFonte, activeTab, porFundoOpen,
         inputDescricao, inputReceitaDescricao,
         hasFilters, filteredDespesas, filteredTotal, filteredReceitas, receitaTotal,
+        despesasTotais, hasMoreDespesas, loadingMore, loadMoreDespesas,
         receitasDetalhes,
         loadAll, openNew, openEdit, openNewReceita, openEditReceita, closePanel,
         startDelete, cancelDelete, clearSearch, confirmAndDelete, confirmAndDeleteReceita,
@@ -2,6 +2,8 @@ import frappe
 from frappe import _
 import json
 
+from portal.filters import compile_filters, keyset_clause, limit_clause, parse_spec
+
 
 def _assert_coordenador():
     user = frappe.session.user
@@ -56,20 +58,61 @@ def get_actividades_nomes(ano_lectivo):
     return [{"name": r.name, "actividade": r.actividade} for r in rows]
 
 
+# Spec keys understood by get_despesas (see portal.filters)
+DESPESA_FILTER_FIELDS = {
+    "categoria":  "categoria",
+    "fonte":      "fonte",
+    "actividade": "actividade",
+    "data":       "data",
+    "search":     ("descricao", "notas", "fonte"),
+}
+
+
+# Spec keys understood by get_receitas
+RECEITA_FILTER_FIELDS = {
+    "fonte":  "fonte",
+    "data":   "data",
+    "search": ("descricao", "notas"),
+}
+
+
 # ── Expense CRUD ───────────────────────────────────────────────────────────────
 
 @frappe.whitelist()
-def get_despesas(ano_lectivo):
+def get_despesas(ano_lectivo, filters_json="", start=0, page_length=0, after=""):
+    """
+    Expenses of ano_lectivo, newest first, optionally narrowed by a
+    portal.filters spec and paginated (page_length > 0), each page starting
+    after the row `after` ({"data", "name"}) or at offset `start`.
+    """
     _assert_coordenador()
-    rows = frappe.db.sql("""
+    where, params = compile_filters(parse_spec(filters_json), DESPESA_FILTER_FIELDS)
+    keyset, keyset_params = keyset_clause(after, "data", "name", descending=True)
+    params.update(keyset_params, ano_lectivo=ano_lectivo)
+    rows = frappe.db.sql(f"""
         SELECT name, descricao, fonte, data, valor, categoria, actividade, notas, ano_lectivo
         FROM `tabDespesa Catequese`
-        WHERE ano_lectivo = %s
-        ORDER BY data DESC, name DESC
-    """, (ano_lectivo,), as_dict=True)
+        WHERE ano_lectivo = %(ano_lectivo)s AND {where} AND {keyset}
+        ORDER BY data IS NULL ASC, data DESC, name DESC
+        {limit_clause(start, page_length)}
+    """, params, as_dict=True)
     return rows
 
 
+@frappe.whitelist()
+def get_despesas_totais(ano_lectivo, filters_json=""):
+    """{"count", "total"} of the expenses matching filters_json — the footer of a paginated list."""
+    _assert_coordenador()
+    where, params = compile_filters(parse_spec(filters_json), DESPESA_FILTER_FIELDS)
+    params["ano_lectivo"] = ano_lectivo
+    count, total = frappe.db.sql(f"""
+        SELECT COUNT(*), COALESCE(SUM(valor), 0)
+        FROM `tabDespesa Catequese`
+        WHERE ano_lectivo = %(ano_lectivo)s AND {where}
+    """, params)[0]
+    return {"count": count, "total": total}
+
+
 @frappe.whitelist()
 def create_despesa(data_json):
     _assert_coordenador()
@@ -110,14 +153,18 @@ def delete_despesa(name):
 # ── Income CRUD ────────────────────────────────────────────────────────────────
 
 @frappe.whitelist()
-def get_receitas(ano_lectivo):
+def get_receitas(ano_lectivo, filters_json="", start=0, page_length=0):
+    """Income of ano_lectivo, newest first; filters and pagination as in get_despesas."""
     _assert_coordenador()
-    rows = frappe.db.sql("""
+    where, params = compile_filters(parse_spec(filters_json), RECEITA_FILTER_FIELDS)
+    params["ano_lectivo"] = ano_lectivo
+    rows = frappe.db.sql(f"""
         SELECT name, descricao, fonte, data, valor, notas, ano_lectivo
         FROM `tabReceita Catequese`
-        WHERE ano_lectivo = %s
+        WHERE ano_lectivo = %(ano_lectivo)s AND {where}
         ORDER BY data DESC, name DESC
-    """, (ano_lectivo,), as_dict=True)
+        {limit_clause(start, page_length)}
+    """, params, as_dict=True)
     return rows
 
 
@@ -98,6 +98,8 @@ function api(method, args) {
     });
   });
 }
+const PAGE_SIZE = 200;   // rows per get_timeline page in the card/list views
+
 const EMPTY_FORM = () => ({
   name: null, actividade: '', tipologia: '', estado: 'Pendente',
   ano_lectivo: '', data: '', data_fim: '', orador: '', local: '', orcamento: '', notas_execucao: '',
@@ -768,6 +770,12 @@ function createPlanoAnualApp() {
       </div>
 
     </template>
+
+    <div v-if="hasMore && viewMode !== 'cal'" class="pa-load-more" data-no-print>
+      <button class="pa-btn pa-btn-ghost pa-btn-sm" @click="loadMore" :disabled="loadingMore">
+        {{ loadingMore ? 'A carregar…' : 'Carregar mais' }}
+      </button>
+    </div>
   </div>
 
   <!-- Overlay (shared between slide-over panel and modal) -->
@@ -1194,9 +1202,17 @@ function createPlanoAnualApp() {
               <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><polyline points="6 9 6 2 18 2 18 9"/><path d="M6 18H4a2 2 0 0 1-2-2v-5a2 2 0 0 1 2-2h16a2 2 0 0 1 2 2v5a2 2 0 0 1-2 2h-2"/><rect x="6" y="14" width="12" height="8"/></svg>
               Imprimir / PDF
             </button>
-            <button class="pa-export-action-btn pa-export-excel" @click="exportExcel" :disabled="exporting">
+            <button class="pa-export-action-btn pa-export-excel" @click="exportData('xlsx')" :disabled="exporting">
               <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
-              {{ exporting ? 'A exportar...' : 'Excel (.xlsx)' }}
+              {{ exporting === 'xlsx' ? 'A exportar...' : 'Excel (.xlsx)' }}
+            </button>
+            <button class="pa-export-action-btn pa-export-excel" @click="exportData('csv')" :disabled="exporting">
+              <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
+              {{ exporting === 'csv' ? 'A exportar...' : 'CSV (.csv)' }}
+            </button>
+            <button class="pa-export-action-btn pa-export-excel" @click="exportData('ods')" :disabled="exporting">
+              <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
+              {{ exporting === 'ods' ? 'A exportar...' : 'ODS (.ods)' }}
             </button>
           </div>
           <div class="pa-export-note">
@@ -1231,8 +1247,11 @@ function createPlanoAnualApp() {
       const anos         = ref([]);
       const selectedAno  = ref('');
       const searchRaw    = ref('');   // bound to input (v-model)
-      const search       = ref('');   // debounced — used by filteredActividades
+      const search       = ref('');   // debounced — sent to the server in filterSpec
       let   _searchTimer = null;
+      const resumo       = ref({ total: 0, estados: {}, meses: [] });
+      const hasMore      = ref(false);
+      const loadingMore  = ref(false);
       const viewMode     = ref('list');
       const panelOpen    = ref(false);
       const form         = reactive(EMPTY_FORM());
@@ -1371,18 +1390,25 @@ function createPlanoAnualApp() {
         return m;
       });
 
+      // Year-wide counters come from get_timeline_resumo — the list is paginated
       const stats = computed(() => {
         const s = { total: 0 };
-        ALL_ESTADOS.forEach(e => { s[e] = 0; });
-        actividades.value.forEach(a => { s.total++; if (s[a.estado] !== undefined) s[a.estado]++; });
+        ALL_ESTADOS.forEach(e => { s[e] = resumo.value.estados[e] || 0; });
+        s.total = Object.values(resumo.value.estados).reduce((n, c) => n + c, 0);
         return s;
       });
 
-      const availableMonths = computed(() => {
-        const keys = new Set();
-        actividades.value.forEach(a => { if (a.data) keys.add(monthKey(a.data)); });
-        return Array.from(keys).sort().map(k => ({ key: k, label: monthLabel(k) }));
-      });
+      const availableMonths = computed(() =>
+        (resumo.value.meses || []).map(k => ({ key: k, label: monthLabel(k) }))
+      );
+
+      // Filter state as a portal.filters spec — applied by the server
+      const filterSpec = computed(() => ({
+        estado:     filterStatus.value,
+        tipologias: filterTipologias.value,
+        month:      filterMonth.value,
+        search:     search.value.trim(),
+      }));
 
       const hasFilters = computed(() =>
         filterStatus.value || filterTipologias.value.length || filterMonth.value || searchRaw.value.trim()
@@ -1394,24 +1420,8 @@ function createPlanoAnualApp() {
         return tipologias.value.filter(t => t.name.toLowerCase().includes(q));
       });
 
-      const filteredActividades = computed(() => {
-        let items = actividades.value;
-        if (!showRetiros.value) items = items.filter(a => !a._is_retiro);
-        const q = search.value.toLowerCase().trim();
-        if (q) items = items.filter(a =>
-          (a.actividade||'').toLowerCase().includes(q) ||
-          (a.orador    ||'').toLowerCase().includes(q) ||
-          (a.local     ||'').toLowerCase().includes(q) ||
-          (a.tipologia ||'').toLowerCase().includes(q)
-        );
-        if (filterStatus.value)
-          items = items.filter(a => a.estado === filterStatus.value);
-        if (filterTipologias.value.length)
-          items = items.filter(a => filterTipologias.value.includes(a.tipologia || ''));
-        if (filterMonth.value)
-          items = items.filter(a => monthKey(a.data) === filterMonth.value);
-        return items;
-      });
+      // Rows arrive already filtered by get_timeline (see filterSpec)
+      const filteredActividades = computed(() => actividades.value);
 
       const filteredGroups = computed(() => {
         const map = {};
@@ -1544,13 +1554,21 @@ function createPlanoAnualApp() {
         }
       }
 
+      // Background exports (preparar_export_actividades) finished
+      function _onExportPronto(data) {
+        toast(`${data.subject} — a descarregar`, 'success');
+        window.open(data.file_url, '_blank');
+      }
+
       onMounted(() => {
         document.addEventListener('mousedown', _onDocClick);
         document.addEventListener('keydown',   _onKeyDown);
+        frappe.realtime.on('portal_export_pronto', _onExportPronto);
       });
       onUnmounted(() => {
         document.removeEventListener('mousedown', _onDocClick);
         document.removeEventListener('keydown',   _onKeyDown);
+        frappe.realtime.off('portal_export_pronto', _onExportPronto);
       });
 
       // Auto-focus search when dropdown opens
@@ -1559,7 +1577,7 @@ function createPlanoAnualApp() {
         else tipSearch.value = '';
       });
 
-      // Debounce raw search input → search (used by filteredActividades)
+      // Debounce raw search input → search (sent in filterSpec)
       watch(searchRaw, (val) => {
         clearTimeout(_searchTimer);
         _searchTimer = setTimeout(() => { search.value = val; }, 150);
@@ -1594,17 +1612,82 @@ function createPlanoAnualApp() {
         }
       }
 
+      function _timelineArgs(after, pageLength) {
+        return {
+          ano_lectivo:  selectedAno.value,
+          filters_json: JSON.stringify(filterSpec.value),
+          show_retiros: showRetiros.value ? '1' : '0',
+          after:        after ? JSON.stringify(after) : '',
+          page_length:  pageLength,
+        };
+      }
+
+      // Last row received from the server ({data, name}). Pages continue after
+      // it (keyset), so local creates/deletes never shift or repeat a page.
+      let _cursor = null;
+
+      function _appendPage(rows) {
+        if (rows.length) {
+          const last = rows[rows.length - 1];
+          _cursor = { data: last.data || null, name: last.name };
+        }
+        const loaded = new Set(actividades.value.map(a => a.name));
+        _resumoFresh = true;
+        actividades.value.push(...rows.filter(r => !loaded.has(r.name)));
+      }
+
+      // Rows are filtered by the server; a row created or edited here may no
+      // longer match filterSpec. Same rules as TIMELINE_FILTER_FIELDS, applied
+      // only to the rows just changed.
+      function _fold(v) {
+        return String(v || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+      }
+      function _matchesFilters(a) {
+        const f = filterSpec.value;
+        if (f.estado && a.estado !== f.estado) return false;
+        if (f.tipologias.length && !f.tipologias.includes(a.tipologia || '')) return false;
+        if (f.month && monthKey(a.data) !== f.month) return false;
+        if (f.search) {
+          const q = _fold(f.search);
+          if (![a.actividade, a.orador, a.local, a.tipologia].some(v => _fold(v).includes(q))) return false;
+        }
+        return true;
+      }
+      function _dropUnmatched(names) {
+        const changed = new Set(names);
+        const drop = actividades.value.filter(a => changed.has(a.name) && !_matchesFilters(a));
+        if (!drop.length) return;
+        const gone = new Set(drop.map(a => a.name));
+        actividades.value = actividades.value.filter(a => !gone.has(a.name));
+      }
+
+      async function loadResumo() {
+        if (!selectedAno.value) return;
+        try {
+          resumo.value = await api('get_timeline_resumo', {
+            ano_lectivo:  selectedAno.value,
+            filters_json: JSON.stringify(filterSpec.value),
+            show_retiros: showRetiros.value ? '1' : '0',
+          }) || { total: 0, estados: {}, meses: [] };
+        } catch (_) { /* non-fatal */ }
+      }
+
+      // First page of activities and retiros; the calendar needs every row
       async function loadActividades() {
         if (!selectedAno.value) return;
         loading.value = true;
         clearSelection();
         cancelQuickAdd();
+        const pageLength = viewMode.value === 'cal' ? 0 : PAGE_SIZE;
         try {
-          const [acts, retiros] = await Promise.all([
-            api('get_actividades',            { ano_lectivo: selectedAno.value }),
-            api('get_retiros_as_actividades', { ano_lectivo: selectedAno.value }),
+          const [rows] = await Promise.all([
+            api('get_timeline', _timelineArgs(null, pageLength)),
+            loadResumo(),
           ]);
-          actividades.value = [...(acts || []), ...(retiros || [])];
+          actividades.value = [];
+          _cursor = null;
+          _appendPage(rows || []);
+          hasMore.value = pageLength > 0 && actividades.value.length === pageLength;
           nextTick(autoCollapsePast);
         } catch (e) {
           toast('Erro ao carregar actividades', 'error');
@@ -1613,6 +1696,50 @@ function createPlanoAnualApp() {
         }
       }
 
+      async function loadMore() {
+        if (!hasMore.value || loadingMore.value) return;
+        loadingMore.value = true;
+        try {
+          const rows = await api('get_timeline', _timelineArgs(_cursor, PAGE_SIZE)) || [];
+          _appendPage(rows);
+          hasMore.value = rows.length === PAGE_SIZE;
+        } catch (e) {
+          toast('Erro ao carregar actividades', 'error');
+        } finally {
+          loadingMore.value = false;
+        }
+      }
+
+      // Fetch the remaining pages (calendar view, printing)
+      async function loadRemaining() {
+        if (!hasMore.value) return;
+        try {
+          const rows = await api('get_timeline', _timelineArgs(_cursor, 0)) || [];
+          _appendPage(rows);
+          hasMore.value = false;
+        } catch (e) {
+          toast('Erro ao carregar actividades', 'error');
+        }
+      }
+
+      let _filterTimer = null;
+      watch([filterSpec, showRetiros], () => {
+        clearTimeout(_filterTimer);
+        _filterTimer = setTimeout(loadActividades, 50);
+      }, { deep: true });
+
+      watch(viewMode, (val) => { if (val === 'cal') loadRemaining(); });
+
+      // Local edits (save, delete, bulk actions) change the counters; pages
+      // fetched by the loaders above do not
+      let _resumoTimer = null;
+      let _resumoFresh = false;
+      watch(actividades, () => {
+        if (_resumoFresh) { _resumoFresh = false; return; }
+        clearTimeout(_resumoTimer);
+        _resumoTimer = setTimeout(loadResumo, 400);
+      }, { deep: true });
+
       // ── Panel ─────────────────────────────────────────────────────────────
       function _resetPanelScroll() {
         const body = document.querySelector('.pa-panel-body');
@@ -1673,6 +1800,7 @@ function createPlanoAnualApp() {
             saved = await api('create_actividade', { data_json: JSON.stringify(payload) });
             actividades.value.push(saved);
           }
+          _dropUnmatched([saved.name]);
           toast(form.name ? 'Actualizado' : 'Criado', 'success');
           closePanel();
         } catch (e) {
@@ -1750,6 +1878,7 @@ function createPlanoAnualApp() {
           };
           const saved = await api('create_actividade', { data_json: JSON.stringify(payload) });
           actividades.value.push(saved);
+          _dropUnmatched([saved.name]);
           toast('Actividade adicionada', 'success');
           // Stay open for rapid entry — clear name, keep date
           quickAdd.name = '';
@@ -1863,6 +1992,7 @@ function createPlanoAnualApp() {
         });
         try {
           await api('bulk_update_estado', { names_json: JSON.stringify(names), estado });
+          _dropUnmatched(names);
           toast(`${names.length} actividade${names.length !== 1 ? 's' : ''} marcada${names.length !== 1 ? 's' : ''} como "${estado}"`, 'success');
           clearSelection();
         } catch (e) {
@@ -1937,6 +2067,7 @@ function createPlanoAnualApp() {
               }
             });
           }
+          _dropUnmatched(names);
           toast(`${names.length} actividade${names.length !== 1 ? 's' : ''} movida${names.length !== 1 ? 's' : ''} para ${monthLabel(target)}`, 'success');
           clearSelection();
         } catch (e) {
@@ -1983,6 +2114,7 @@ function createPlanoAnualApp() {
           const result = await api('copy_from_previous_year', { target_ano_lectivo: selectedAno.value });
           if (result.rows && result.rows.length) {
             result.rows.forEach(r => actividades.value.push(r));
+            _dropUnmatched(result.rows.map(r => r.name));
             nextTick(autoCollapsePast);
           }
           const n = result.copied;
@@ -2014,6 +2146,7 @@ function createPlanoAnualApp() {
           };
           const created = await api('create_actividade', { data_json: JSON.stringify(payload) });
           actividades.value.push(created);
+          _dropUnmatched([created.name]);
           toast('Actividade duplicada', 'success');
           // Switch panel to editing the new copy
           openEdit(created);
@@ -2039,6 +2172,7 @@ function createPlanoAnualApp() {
           if (undone) return;
           try {
             await api('update_estado', { name: act.name, estado: next });
+            _dropUnmatched([act.name]);
           } catch (e) {
             act.estado = prev;
             toast('Erro ao alterar estado', 'error');
@@ -2114,6 +2248,7 @@ function createPlanoAnualApp() {
         markJustMoved(act.name);
         try {
           await api('update_actividade', { name: act.name, data_json: JSON.stringify({ ...act, data: newDate }) });
+          _dropUnmatched([act.name]);
           toast('Actividade movida para ' + monthLabel(groupKey), 'info');
         } catch (e) {
           act.data = oldDate;
@@ -2171,6 +2306,7 @@ function createPlanoAnualApp() {
         markJustMoved(act.name);
         try {
           await api('update_actividade', { name: act.name, data_json: JSON.stringify({ ...act, data: dateStr }) });
+          _dropUnmatched([act.name]);
           toast('Movido para ' + formatDate(dateStr), 'info');
         } catch(e) {
           act.data = oldDate;
@@ -2206,6 +2342,7 @@ function createPlanoAnualApp() {
           markJustMoved(act.name);
           try {
             await api('update_actividade', { name: act.name, data_json: JSON.stringify({ ...act, data: newDate }) });
+            _dropUnmatched([act.name]);
             toast('Movido para ' + monthLabel(groupKey), 'info');
           } catch(e) {
             act.data = oldDate;
@@ -2239,12 +2376,12 @@ function createPlanoAnualApp() {
         return `${d.getDate()} ${MESES_PT[d.getMonth()]} ${d.getFullYear()}`;
       });
 
-      const paExportTotal = computed(() =>
-        filteredGroups.value.reduce((s, g) => s + g.items.length, 0)
-      );
+      const paExportTotal = computed(() => resumo.value.total);
 
-      function printView() {
+      async function printView() {
         showExportPanel.value = false;
+        await loadRemaining();
+        await nextTick();
         let style = document.getElementById('pa-page-style');
         if (!style) {
           style = document.createElement('style');
@@ -2255,22 +2392,28 @@ function createPlanoAnualApp() {
         setTimeout(() => window.print(), 80);
       }
 
-      const exporting = ref(false);
+      const exporting = ref(false);   // format being exported, false when idle
+      const EXPORT_FORMAT_LABELS = { xlsx: 'Excel', csv: 'CSV', ods: 'ODS' };
 
-      async function exportExcel() {
+      async function exportData(format) {
         if (exporting.value) return;
-        exporting.value = true;
+        exporting.value = format;
         try {
-          const params = new URLSearchParams({
-            ano_lectivo:    selectedAno.value,
-            estado:         filterStatus.value  || '',
-            tipologias_json: JSON.stringify(filterTipologias.value),
-            month:          filterMonth.value   || '',
-            search:         search.value        || '',
-            show_retiros:   showRetiros.value ? '1' : '0',
-            fields_json:    JSON.stringify(exportFields.value),
-            csrf_token:     frappe.csrf_token,
-          });
+          const filters = {
+            ano_lectivo:  selectedAno.value,
+            filters_json: JSON.stringify(filterSpec.value),
+            show_retiros: showRetiros.value ? '1' : '0',
+            fields_json:  JSON.stringify(exportFields.value),
+            format,
+          };
+          const label = EXPORT_FORMAT_LABELS[format];
+          // Large plans are built in the background — notified via portal_export_pronto
+          const plan = await api('preparar_export_actividades', filters);
+          if (plan.modo === 'async') {
+            toast(`A preparar ${label} (${plan.total} linhas) — será notificado quando estiver pronto`, 'info');
+            return;
+          }
+          const params = new URLSearchParams({ ...filters, csrf_token: frappe.csrf_token });
           const url = `/api/method/portal.catequista.page.plano_anual.plano_anual.export_actividades?${params}`;
           const a = document.createElement('a');
           a.href = url;
@@ -2278,7 +2421,7 @@ function createPlanoAnualApp() {
           document.body.appendChild(a);
           a.click();
           document.body.removeChild(a);
-          toast('A descarregar Excel...', 'success');
+          toast(`A descarregar ${label}...`, 'success');
         } catch (e) {
           toast('Erro ao exportar: ' + e.message, 'error');
         } finally {
@@ -2364,12 +2507,12 @@ function createPlanoAnualApp() {
         dragOverCell, dragOverRow,
         onCalCellDragOver, onCalCellDragLeave, onCalCellDrop,
         onRowDragOver, onRowDragLeave, onRowDrop,
-        loadActividades, openNewActivity, openEdit, closePanel,
+        loadActividades, hasMore, loadingMore, loadMore, openNewActivity, openEdit, closePanel,
         saveActivity, deleteActivity, duplicating, duplicateActivity,
         cycleStatus, flashingRow, removeTipFilter,
         onDragStart, onDragEnd, onDragOver, onDragLeave, onDrop, justMovedCard,
         clearSearch,
-        printView, exporting, exportExcel,
+        printView, exporting, exportData,
         showExportPanel, exportFields, printDate, paExportTotal, EXPORT_FIELD_LABELS_PA,
         printOrientation, letterHeads, selectedLetterHead, selectedLetterHeadObj,
         cardStyle, tipologiaChipStyle, tipologiaColor, calActStyle,
@@ -1,7 +1,13 @@
 import frappe
 from frappe import _
+from frappe.utils import getdate
 import json
 
+from portal import bulk
+from portal.filters import compile_filters, keyset_clause, limit_clause, parse_list, parse_spec
+from portal.export_formats import build_ods, csv_response, set_download, validate_format
+from portal.xlsx_report import assert_xlsx_available, build_xlsx
+
 
 def _assert_coordenador():
     user = frappe.session.user
@@ -13,24 +19,146 @@ def _assert_coordenador():
 
 
 @frappe.whitelist()
-def get_actividades(ano_lectivo):
+def get_actividades(ano_lectivo, filters_json="", start=0, page_length=0):
     _assert_coordenador()
+    return _timeline_rows(
+        ano_lectivo, parse_spec(filters_json), show_retiros="0",
+        start=start, page_length=page_length,
+    )
 
-    rows = frappe.db.sql("""
+
+@frappe.whitelist()
+def get_timeline(ano_lectivo, estado="", tipologias_json="", month="", search="", show_retiros="1",
+                 filters_json="", start=0, page_length=0, after=""):
+    """
+    Activities and retiros of ano_lectivo in one list (see _timeline_rows).
+    Filters come as a portal.filters spec (filters_json) or the individual
+    estado/tipologias_json/month/search params; page_length > 0 returns one
+    page of the result, starting after the row `after` ({"data", "name"},
+    see portal.filters.keyset_clause) or at offset `start`.
+    """
+    _assert_coordenador()
+    spec = _filter_spec(filters_json, estado, tipologias_json, month, search)
+    return _timeline_rows(ano_lectivo, spec, show_retiros, start, page_length, after)
+
+
+# Spec keys understood by the timeline query (see portal.filters)
+TIMELINE_FILTER_FIELDS = {
+    "estado":     "tl.estado",
+    "tipologias": "IFNULL(tl.tipologia, '')",
+    "data":       "tl.data",
+    "search":     ("tl.actividade", "tl.orador", "tl.local", "tl.tipologia"),
+}
+
+
+def _filter_spec(filters_json="", estado="", tipologias_json="", month="", search=""):
+    """filters_json with the individual filter params of the endpoints merged in."""
+    return parse_spec(
+        filters_json,
+        estado=estado,
+        tipologias=parse_list(tipologias_json),
+        month=month,
+        search=search,
+    )
+
+
+def _timeline_union(show_retiros="1"):
+    """
+    Actividade do Plano UNION ALL Plano de Retiro (when show_retiros == "1")
+    for %(ano_lectivo)s, retiros shaped like activities — tipologia
+    "Retiro", estado mapped to the activity states, _is_retiro = 1 — with the
+    tipologia colour/icon joined in.
+    """
+    branches = ["""
         SELECT
             a.name, a.actividade, a.data, a.data_fim, a.data_original,
             a.orador, a.local, a.orcamento,
             a.tipologia, a.estado, a.notas_execucao,
             a.ano_lectivo,
             t.cor AS tipologia_cor,
-            t.icone AS tipologia_icone
+            t.icone AS tipologia_icone,
+            0 AS `_is_retiro`,
+            NULL AS `_retiro_name`
         FROM `tabActividade do Plano` a
         LEFT JOIN `tabTipologia Actividade` t ON t.name = a.tipologia
-        WHERE a.ano_lectivo = %s
-        ORDER BY a.data IS NULL ASC, a.data ASC, a.name ASC
-    """, (ano_lectivo,), as_dict=True)
+        WHERE a.ano_lectivo = %(ano_lectivo)s
+    """]
+    if show_retiros == "1":
+        branches.append("""
+        SELECT
+            r.name, r.titulo, r.data, NULL, NULL,
+            NULLIF(r.orador, ''), NULLIF(r.local, ''), NULLIF(r.valor_de_contribuicao, 0),
+            'Retiro',
+            CASE r.estado
+                WHEN 'Realizado' THEN 'Realizada'
+                WHEN 'Cancelado' THEN 'Cancelada'
+                ELSE 'Pendente'
+            END,
+            NULLIF(r.notas, ''),
+            r.ano_lectivo,
+            COALESCE(NULLIF(t.cor, ''), '#8b5cf6'),
+            COALESCE(NULLIF(t.icone, ''), '⛺'),
+            1,
+            r.name
+        FROM `tabPlano de Retiro` r
+        LEFT JOIN `tabTipologia Actividade` t ON t.name = 'Retiro'
+        WHERE r.ano_lectivo = %(ano_lectivo)s
+        """)
+    return " UNION ALL ".join(branches)
+
+
+def _timeline_rows(ano_lectivo, spec=None, show_retiros="1", start=0, page_length=0, after=None):
+    """One query over _timeline_union() with the filter spec applied in SQL."""
+    where, params = compile_filters(spec or {}, TIMELINE_FILTER_FIELDS)
+    keyset, keyset_params = keyset_clause(after, "tl.data", "tl.name")
+    params.update(keyset_params, ano_lectivo=ano_lectivo)
+    return frappe.db.sql(f"""
+        SELECT tl.*
+        FROM ({_timeline_union(show_retiros)}) tl
+        WHERE {where} AND {keyset}
+        ORDER BY tl.data IS NULL ASC, tl.data ASC, tl.name ASC
+        {limit_clause(start, page_length)}
+    """, params, as_dict=True)
 
-    return rows
+
+def _timeline_count(ano_lectivo, spec=None, show_retiros="1"):
+    """Number of rows _timeline_rows() would return, without fetching them."""
+    where, params = compile_filters(spec or {}, TIMELINE_FILTER_FIELDS)
+    params["ano_lectivo"] = ano_lectivo
+    return frappe.db.sql(f"""
+        SELECT COUNT(*)
+        FROM ({_timeline_union(show_retiros)}) tl
+        WHERE {where}
+    """, params)[0][0]
+
+
+@frappe.whitelist()
+def get_timeline_resumo(ano_lectivo, filters_json="", show_retiros="1"):
+    """
+    Counters for the page header while the list itself is paginated:
+      total   — rows matching filters_json
+      estados — {estado: count} over the whole year
+      meses   — YYYY-MM values with at least one dated row
+    """
+    _assert_coordenador()
+    params = {"ano_lectivo": ano_lectivo}
+    union = _timeline_union(show_retiros)
+    estados = frappe.db.sql(f"""
+        SELECT tl.estado, COUNT(*)
+        FROM ({union}) tl
+        GROUP BY tl.estado
+    """, params)
+    meses = frappe.db.sql_list(f"""
+        SELECT DISTINCT DATE_FORMAT(tl.data, '%%Y-%%m') AS mes
+        FROM ({union}) tl
+        WHERE tl.data IS NOT NULL
+        ORDER BY mes
+    """, params)
+    return {
+        "total":   _timeline_count(ano_lectivo, parse_spec(filters_json), show_retiros),
+        "estados": {estado or "": count for estado, count in estados},
+        "meses":   meses,
+    }
 
 
 @frappe.whitelist()
@@ -204,316 +332,213 @@ def update_estado(name, estado):
     return {"success": True, "estado": estado}
 
 
+# Above this many rows the export is built by a background worker
+EXPORT_SYNC_MAX_ROWS = 1000
+
+_MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
+          "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
+
+_EXPORT_FIELD_META = [
+    ("actividade",    "Actividade",          42, "text"),
+    ("tipologia",     "Tipologia",           18, "text"),
+    ("data",          "Data",                12, "date"),
+    ("data_original", "Data Original",       14, "date"),
+    ("orador",        "Orador / Responsável", 24, "text"),
+    ("local",         "Local",               26, "wrap"),
+    ("orcamento",     "Orçamento (MZN)",     14, "currency"),
+    ("estado",        "Estado",              14, "status"),
+    ("notas_execucao","Notas de Execução",   38, "notes"),
+]
+
+# Look of the export — see portal.xlsx_report
+EXPORT_THEME = {
+    "name":   "pa",
+    "fonts": {
+        "title":  {"bold": True, "size": 14, "color": "FFFFFF"},
+        "meta":   {"size": 8, "color": "7A5A18", "italic": True},
+        "header": {"bold": True, "size": 9, "color": "7A5A18"},
+        "body":   {"size": 9, "color": "1F2937"},
+        "muted":  {"size": 8, "color": "9CA3AF", "italic": True},
+        "note":   {"size": 8, "color": "6B7280", "italic": True},
+    },
+    "accent":             {"rule": "D4A843", "light": "E8C464"},
+    "title_fill":         "9A7020",
+    "meta_fill":          "FEF9EC",
+    "header_fill":        "F5DFA0",
+    "group_current_fill": "E8C464",
+    "alt_fill":           "FFFDF5",
+    "status": {
+        "Pendente":     ("F3F4F6", "6B7280", False),
+        "Em Progresso": ("DBEAFE", "1D4ED8", False),
+        "Realizada":    ("DCFCE7", "166534", False),
+        "Cancelada":    ("FEE2E2", "991B1B", False),
+        "Adiada":       ("FEF3C7", "92400E", False),
+    },
+    "status_fallback": ("F3F4F6", "6B7280", False),
+    "heights":    {"title": 32, "meta": 16, "header": 20, "group": 18, "row": 15},
+    "n_width":    4,
+    "freeze_col": "B",
+}
+
+
 @frappe.whitelist()
-def export_actividades(ano_lectivo, estado="", tipologias_json="", month="", search="", show_retiros="1", fields_json=""):
+def export_actividades(ano_lectivo, estado="", tipologias_json="", month="", search="", show_retiros="1", fields_json="", format="xlsx", filters_json=""):
     """
-    Exports the activities plan to a styled .xlsx file.
+    Exports the activities plan — a styled .xlsx file, or plain .csv
+    (streamed) / .ods (see portal.export_formats).
     Respects the same filters the UI has active.
     """
     _assert_coordenador()
+    format = validate_format(format)
+
+    safe_ano  = ano_lectivo.replace("/", "-")
+    file_name = f"Plano_Anual_{safe_ano}.{format}"
+
+    spec = _filter_spec(filters_json, estado, tipologias_json, month, search)
+    if format == "csv":
+        rows = _timeline_rows(ano_lectivo, spec, show_retiros)
+        return csv_response(file_name, _export_columns(fields_json), map(_export_values, rows))
+
+    content = _build_export(format, ano_lectivo, spec, show_retiros, fields_json)
+    set_download(file_name, content)
+
+
+@frappe.whitelist()
+def preparar_export_actividades(ano_lectivo, estado="", tipologias_json="", month="", search="", show_retiros="1", fields_json="", format="xlsx", filters_json=""):
+    """
+    Decides how to export: small plans (and every CSV, which is streamed)
+    are downloaded directly through export_actividades ({"modo": "sync"});
+    larger ones are built by a background worker, saved as a private File
+    and the coordinator is notified when ready ({"modo": "async"}).
+    """
+    _assert_coordenador()
+    format = validate_format(format)
+    if format == "xlsx":
+        assert_xlsx_available()
+
+    spec  = _filter_spec(filters_json, estado, tipologias_json, month, search)
+    total = _timeline_count(ano_lectivo, spec, show_retiros)
+    if format == "csv" or total <= EXPORT_SYNC_MAX_ROWS:
+        return {"modo": "sync", "total": total}
+
+    frappe.enqueue(
+        "portal.catequista.page.plano_anual.plano_anual.export_actividades_job",
+        queue="long",
+        timeout=1800,
+        ano_lectivo=ano_lectivo, spec=spec, show_retiros=show_retiros,
+        fields_json=fields_json, format=format,
+    )
+    return {"modo": "async", "total": total}
+
+
+def export_actividades_job(ano_lectivo, format="xlsx", spec=None, show_retiros="1", fields_json=""):
+    """Background half of preparar_export_actividades."""
+    content = _build_export(format, ano_lectivo, spec, show_retiros, fields_json)
+    safe_ano = ano_lectivo.replace("/", "-")
+    _notify_export_ready(f"Plano_Anual_{safe_ano}.{format}", content,
+                         f"Exportação do Plano Anual {ano_lectivo} pronta")
+
+
+def _build_export(format, ano_lectivo, spec=None, show_retiros="1", fields_json=""):
+    """Bytes of an xlsx or ods export."""
+    if format == "xlsx":
+        return _build_actividades_xlsx(ano_lectivo, spec, show_retiros, fields_json)
+    rows = _timeline_rows(ano_lectivo, spec, show_retiros)
+    return build_ods("Plano Anual", _export_columns(fields_json), map(_export_values, rows))
 
+
+def _export_columns(fields_json):
+    """_EXPORT_FIELD_META restricted to the fields selected in the export panel."""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils import get_column_letter
-        import io
-        from collections import OrderedDict
-        from datetime import date as _date
-    except ImportError:
-        frappe.throw(_("openpyxl não está instalado. Execute: pip install openpyxl"))
-
-    # ── Build query filters ────────────────────────────────────────────────
-    conditions = ["a.ano_lectivo = %s"]
-    params     = [ano_lectivo]
-
-    if estado:
-        conditions.append("a.estado = %s")
-        params.append(estado)
-
-    tip_list = json.loads(tipologias_json) if tipologias_json else []
-    if tip_list:
-        placeholders = ",".join(["%s"] * len(tip_list))
-        conditions.append(f"a.tipologia IN ({placeholders})")
-        params.extend(tip_list)
-
-    if month:
-        conditions.append("DATE_FORMAT(a.data, '%%Y-%%m') = %s")
-        params.append(month)
-
-    search = (search or "").strip()
-    if search:
-        sq = f"%{search}%"
-        conditions.append(
-            "(a.actividade LIKE %s OR a.orador LIKE %s OR a.local LIKE %s OR a.tipologia LIKE %s)"
-        )
-        params.extend([sq, sq, sq, sq])
+        fields = json.loads(fields_json) if fields_json else {}
+    except Exception:
+        fields = {}
+    return [col for col in _EXPORT_FIELD_META if fields.get(col[0], True)]
 
-    where = " AND ".join(conditions)
 
-    rows = frappe.db.sql(f"""
-        SELECT
-            a.name, a.actividade, a.data, a.data_original,
-            a.orador, a.local, a.orcamento,
-            a.tipologia, a.estado, a.notas_execucao
-        FROM `tabActividade do Plano` a
-        WHERE {where}
-        ORDER BY a.data IS NULL ASC, a.data ASC, a.name ASC
-    """, params, as_dict=True)
+def _export_values(row):
+    """Cell values of one _timeline_rows row, keyed like _EXPORT_FIELD_META."""
+    return {
+        "actividade":     row.actividade,
+        "tipologia":      row.tipologia,
+        "data":           str(row.data)[:10] if row.data else "",
+        "data_original":  str(row.data_original)[:10] if row.data_original else "",
+        "orador":         row.orador,
+        "local":          row.local,
+        "orcamento":      float(row.orcamento) if row.orcamento else None,
+        "estado":         row.estado or "Pendente",
+        "notas_execucao": row.notas_execucao,
+    }
 
-    # ── Merge retiros ──────────────────────────────────────────────────────
-    if show_retiros == "1":
-        _estado_map = {"Planeado": "Pendente", "Realizado": "Realizada", "Cancelado": "Cancelada"}
-        retiro_rows = frappe.db.sql("""
-            SELECT name, titulo, data, local, orador, estado, valor_de_contribuicao, notas
-            FROM `tabPlano de Retiro`
-            WHERE ano_lectivo = %s
-        """, (ano_lectivo,), as_dict=True)
-
-        for r in retiro_rows:
-            mapped_estado = _estado_map.get(r.estado, "Pendente")
-            if estado and mapped_estado != estado:
-                continue
-            if tip_list and "Retiro" not in tip_list:
-                continue
-            r_month = str(r.data)[:7] if r.data else None
-            if month and r_month != month:
-                continue
-            if search:
-                haystack = " ".join(filter(None, [r.titulo, r.orador, r.local, "Retiro"])).lower()
-                if search.lower() not in haystack:
-                    continue
-            rows.append(frappe._dict({
-                "name":          r.name,
-                "actividade":    r.titulo,
-                "data":          str(r.data)[:10] if r.data else None,
-                "data_original": None,
-                "orador":        r.orador or None,
-                "local":         r.local  or None,
-                "orcamento":     str(r.valor_de_contribuicao) if r.valor_de_contribuicao else None,
-                "tipologia":     "Retiro",
-                "estado":        mapped_estado,
-                "notas_execucao": r.notas or None,
-            }))
-
-        rows.sort(key=lambda x: (x.data is None, x.data or "", x.name or ""))
+
+def _notify_export_ready(file_name, content, subject):
+    """Save `content` as a private File owned by the requester and notify them."""
+    file_doc = frappe.get_doc({
+        "doctype":    "File",
+        "file_name":  file_name,
+        "is_private": 1,
+        "content":    content,
+    }).insert(ignore_permissions=True)
+
+    frappe.get_doc({
+        "doctype":       "Notification Log",
+        "for_user":      frappe.session.user,
+        "type":          "Alert",
+        "subject":       subject,
+        "document_type": "File",
+        "document_name": file_doc.name,
+    }).insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    frappe.publish_realtime(
+        "portal_export_pronto",
+        {"file_url": file_doc.file_url, "file_name": file_name, "subject": subject},
+        user=frappe.session.user,
+    )
+
+
+def _build_actividades_xlsx(ano_lectivo, spec=None, show_retiros="1", fields_json=""):
+    """Build the styled workbook (portal.xlsx_report, one group per month) and return its bytes."""
+    from datetime import date as _date
+
+    spec = spec or {}
+    rows = _timeline_rows(ano_lectivo, spec, show_retiros)
 
     # ── Month grouping ─────────────────────────────────────────────────────
-    MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-             "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
     TODAY_KEY = _date.today().strftime("%Y-%m")
 
     def month_label(key):
         if key == "__nodate__":
             return "Sem Data Definida"
         y, m = key.split("-")
-        return f"{MESES[int(m)-1]} {y}"
+        return f"{_MESES[int(m)-1]} {y}"
 
-    groups = OrderedDict()
+    by_month = {}
     for row in rows:
         key = str(row.data)[:7] if row.data else "__nodate__"
-        groups.setdefault(key, []).append(row)
-
-    sorted_keys = sorted(groups.keys(),
-                         key=lambda k: ("\xff" if k == "__nodate__" else k))
-
-    # ── Styles ─────────────────────────────────────────────────────────────
-    def _fill(hex_color):
-        return PatternFill("solid", fgColor=hex_color)
-
-    def _side(style="thin", color="D1D5DB"):
-        return Side(style=style, color=color)
-
-    def _border(all="thin"):
-        s = _side(all)
-        return Border(left=s, right=s, top=s, bottom=s)
-
-    def _border_bottom(color="E5E7EB"):
-        return Border(bottom=_side("thin", color))
-
-    TITLE_FONT   = Font(name="Calibri", bold=True, size=14, color="FFFFFF")
-    BODY_FONT    = Font(name="Calibri", size=9,    color="1F2937")
-    MUTED_FONT   = Font(name="Calibri", size=8,    color="9CA3AF", italic=True)
-    NOTE_FONT    = Font(name="Calibri", size=8,    color="6B7280", italic=True)
-
-    TITLE_FILL   = _fill("9A7020")
-    META_FILL    = _fill("FEF9EC")
-    HEADER_FILL  = _fill("F5DFA0")
-    MONTH_FILL   = _fill("F5DFA0")
-    MONTH_CURR   = _fill("E8C464")
-    ROW_ALT_FILL = _fill("FFFDF5")
-
-    STATUS_FILLS = {
-        "Pendente":     (_fill("F3F4F6"), Font(name="Calibri", size=9, color="6B7280")),
-        "Em Progresso": (_fill("DBEAFE"), Font(name="Calibri", size=9, color="1D4ED8")),
-        "Realizada":    (_fill("DCFCE7"), Font(name="Calibri", size=9, color="166534")),
-        "Cancelada":    (_fill("FEE2E2"), Font(name="Calibri", size=9, color="991B1B")),
-        "Adiada":       (_fill("FEF3C7"), Font(name="Calibri", size=9, color="92400E")),
-    }
-
-    center   = Alignment(horizontal="center", vertical="center", wrap_text=False)
-    left_mid = Alignment(horizontal="left",   vertical="center", wrap_text=False)
-
-    # ── Parse selected fields ──────────────────────────────────────────────
-    try:
-        fields = json.loads(fields_json) if fields_json else {}
-    except Exception:
-        fields = {}
+        by_month.setdefault(key, []).append(_export_values(row))
+
+    groups = []
+    for key in sorted(by_month, key=lambda k: ("\xff" if k == "__nodate__" else k)):
+        n = len(by_month[key])
+        groups.append({
+            "label":   f"  {month_label(key)}  ·  {n} actividade{'s' if n != 1 else ''}",
+            "current": key == TODAY_KEY,
+            "rows":    by_month[key],
+        })
 
-    FIELD_META = [
-        ("actividade",    "Actividade",          42, "text"),
-        ("tipologia",     "Tipologia",           18, "text"),
-        ("data",          "Data",                12, "date"),
-        ("data_original", "Data Original",       14, "date_orig"),
-        ("orador",        "Orador / Responsável", 24, "text"),
-        ("local",         "Local",               26, "wrap"),
-        ("orcamento",     "Orçamento (MZN)",     14, "currency"),
-        ("estado",        "Estado",              14, "status"),
-        ("notas_execucao","Notas de Execução",   38, "notes"),
-    ]
-    active_cols = [(k, h, w, ct) for k, h, w, ct in FIELD_META if fields.get(k, True)]
-    nc = 1 + len(active_cols)   # +1 for N column
-
-    # ── Workbook ───────────────────────────────────────────────────────────
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Plano Anual"
-    ws.sheet_view.showGridLines = False
-
-    ws.column_dimensions["A"].width = 4
-    for ci, (_, _, w, _) in enumerate(active_cols, 2):
-        ws.column_dimensions[get_column_letter(ci)].width = w
-
-    last_col = get_column_letter(nc)
-
-    # ── Title row ──────────────────────────────────────────────────────────
-    ws.row_dimensions[1].height = 32
-    ws.merge_cells(f"A1:{last_col}1")
-    tc = ws["A1"]
-    tc.value     = f"Plano Anual da Catequese — {ano_lectivo}"
-    tc.font      = TITLE_FONT
-    tc.fill      = TITLE_FILL
-    tc.alignment = Alignment(horizontal="left", vertical="center", indent=1)
-
-    # ── Meta row ──────────────────────────────────────────────────────────
-    ws.row_dimensions[2].height = 16
-    ws.merge_cells(f"A2:{last_col}2")
     meta_parts = [f"Exportado em {_date.today().strftime('%d/%m/%Y')}"]
-    if estado:   meta_parts.append(f"Estado: {estado}")
-    if tip_list: meta_parts.append(f"Tipologia: {', '.join(tip_list)}")
-    if month:    meta_parts.append(f"Mês: {month_label(month)}")
-    mc = ws["A2"]
-    mc.value     = "   ".join(meta_parts)
-    mc.font      = Font(name="Calibri", size=8, color="7A5A18", italic=True)
-    mc.fill      = META_FILL
-    mc.alignment = Alignment(horizontal="left", vertical="center", indent=1)
-
-    # ── Column headers ─────────────────────────────────────────────────────
-    ws.row_dimensions[3].height = 20
-    header_font = Font(name="Calibri", bold=True, size=9, color="7A5A18")
-    headers = ["#"] + [h for _, h, _, _ in active_cols]
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(row=3, column=col, value=h)
-        c.font      = header_font
-        c.fill      = HEADER_FILL
-        c.alignment = center if col == 1 else left_mid
-        c.border    = Border(bottom=_side("medium", "D4A843"),
-                             top=_side("thin",   "E8C464"))
-
-    # ── Data rows ──────────────────────────────────────────────────────────
-    current_row = 4
-
-    for key in sorted_keys:
-        group_rows = groups[key]
-        is_curr    = (key == TODAY_KEY)
-        label      = month_label(key)
-
-        # Month separator
-        ws.row_dimensions[current_row].height = 18
-        ws.merge_cells(f"A{current_row}:{last_col}{current_row}")
-        mc = ws[f"A{current_row}"]
-        mc.value     = f"  {label}  ·  {len(group_rows)} actividade{'s' if len(group_rows) != 1 else ''}"
-        mc.font      = Font(name="Calibri", bold=True, size=9,
-                            color="7A5A18" if is_curr else "7A5A18")
-        mc.fill      = MONTH_CURR if is_curr else MONTH_FILL
-        mc.alignment = Alignment(horizontal="left", vertical="center", indent=1)
-        for col in range(1, nc + 1):
-            ws.cell(current_row, col).border = Border(
-                top=_side("medium", "D4A843"),
-                bottom=_side("thin", "E8C464"),
-            )
-        current_row += 1
-
-        # Activity rows
-        for idx, row in enumerate(group_rows):
-            ws.row_dimensions[current_row].height = 15
-            fill = ROW_ALT_FILL if idx % 2 else None
-
-            def _cell(col, value, font=BODY_FONT, align=left_mid, num_fmt=None):
-                c = ws.cell(row=current_row, column=col, value=value)
-                c.font = font
-                c.alignment = align
-                if fill: c.fill = fill
-                c.border = _border_bottom()
-                if num_fmt: c.number_format = num_fmt
-                return c
-
-            _cell(1, idx + 1, font=MUTED_FONT, align=center)
-
-            for ci, (key2, _, _, ctype) in enumerate(active_cols, 2):
-                if ctype == "text":
-                    _cell(ci, getattr(row, key2) or "")
-                elif ctype == "wrap":
-                    _cell(ci, getattr(row, key2) or "",
-                          align=Alignment(horizontal="left", vertical="top", wrap_text=True))
-                elif ctype == "date":
-                    _cell(ci, str(row.data)[:10] if row.data else "",
-                          align=Alignment(horizontal="center", vertical="center"))
-                elif ctype == "date_orig":
-                    _cell(ci, str(row.data_original)[:10] if row.data_original else "",
-                          align=Alignment(horizontal="center", vertical="center"))
-                elif ctype == "currency":
-                    if row.orcamento:
-                        c = _cell(ci, float(row.orcamento),
-                                  align=Alignment(horizontal="right", vertical="center"))
-                        c.number_format = '#,##0.00 "MZN"'
-                    else:
-                        _cell(ci, "")
-                elif ctype == "status":
-                    st_fill, st_font = STATUS_FILLS.get(row.estado or "Pendente",
-                                                        STATUS_FILLS["Pendente"])
-                    sc = ws.cell(row=current_row, column=ci, value=row.estado or "Pendente")
-                    sc.font = st_font; sc.fill = st_fill
-                    sc.alignment = center; sc.border = _border_bottom()
-                elif ctype == "notes":
-                    _cell(ci, row.notas_execucao or "", font=NOTE_FONT,
-                          align=Alignment(horizontal="left", vertical="top", wrap_text=True))
-
-            current_row += 1
-
-    # Freeze panes
-    ws.freeze_panes = "B4"
-
-    # ── Totals footer ──────────────────────────────────────────────────────
-    current_row += 1
-    ws.row_dimensions[current_row].height = 15
-    ws.merge_cells(f"A{current_row}:{last_col}{current_row}")
-    fc = ws[f"A{current_row}"]
-    fc.value     = f"Total: {len(rows)} actividade{'s' if len(rows) != 1 else ''}"
-    fc.font      = Font(name="Calibri", bold=True, size=9, color="7A5A18")
-    fc.alignment = Alignment(horizontal="right", vertical="center")
-    fc.border    = Border(top=_side("medium", "D4A843"))
-    for col in range(2, nc + 1):
-        ws.cell(current_row, col).border = Border(top=_side("medium", "D4A843"))
-
-    # ── Serialize ──────────────────────────────────────────────────────────
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-
-    safe_ano = ano_lectivo.replace("/", "-")
-    frappe.response["filename"]    = f"Plano_Anual_{safe_ano}.xlsx"
-    frappe.response["filecontent"] = buf.read()
-    frappe.response["type"]        = "download"
+    if spec.get("estado"):     meta_parts.append(f"Estado: {spec['estado']}")
+    if spec.get("tipologias"): meta_parts.append(f"Tipologia: {', '.join(spec['tipologias'])}")
+    if spec.get("month"):      meta_parts.append(f"Mês: {month_label(spec['month'])}")
+
+    return build_xlsx(
+        "Plano Anual",
+        f"Plano Anual da Catequese — {ano_lectivo}",
+        "   ".join(meta_parts),
+        _export_columns(fields_json), groups, EXPORT_THEME,
+        footer=f"Total: {len(rows)} actividade{'s' if len(rows) != 1 else ''}",
+    )
 
 
 @frappe.whitelist()
@@ -543,8 +568,6 @@ def copy_from_previous_year(target_ano_lectivo):
     Returns the newly created rows (with tipologia details) for immediate UI update.
     """
     _assert_coordenador()
-    import calendar as _cal
-    from datetime import date as _date
 
     years = _sorted_anos()
     if target_ano_lectivo not in years:
@@ -554,64 +577,18 @@ def copy_from_previous_year(target_ano_lectivo):
         frappe.throw(_("Não existe ano lectivo anterior para copiar"))
     prev_year = years[idx - 1]
 
-    src_rows = frappe.db.sql("""
-        SELECT actividade, tipologia, data, data_fim, orador, local, orcamento
-        FROM `tabActividade do Plano`
-        WHERE ano_lectivo = %s
-        ORDER BY data IS NULL ASC, data ASC, name ASC
-    """, (prev_year,), as_dict=True)
-
+    src_rows = _rollover_source(prev_year)
     if not src_rows:
         frappe.throw(_("O ano anterior ({0}) não tem actividades para copiar").format(prev_year))
 
-    def _shift(d):
-        if not d:
-            return None
-        # d may come back as a datetime.date or string
-        if not hasattr(d, "year"):
-            try:
-                from datetime import datetime
-                d = datetime.strptime(str(d)[:10], "%Y-%m-%d").date()
-            except Exception:
-                return None
-        new_year = d.year + 1
-        last_day = _cal.monthrange(new_year, d.month)[1]
-        return str(_date(new_year, d.month, min(d.day, last_day)))
-
-    created_names = []
-    for row in src_rows:
-        doc = frappe.new_doc("Actividade do Plano")
-        doc.actividade     = row.actividade
-        doc.tipologia      = row.tipologia or None
-        doc.estado         = "Pendente"
-        doc.ano_lectivo    = target_ano_lectivo
-        doc.data           = _shift(row.data)
-        doc.data_fim       = _shift(row.data_fim)
-        doc.orador         = row.orador or None
-        doc.local          = row.local or None
-        doc.orcamento      = row.orcamento or None
-        doc.notas_execucao = None
-        doc.insert(ignore_permissions=True)
-        created_names.append(doc.name)
-
+    new_rows = [
+        _rollover_row(row, target_ano_lectivo, keep_orador=True, preserve_weekend=False)
+        for row in src_rows
+    ]
+    _insert_actividades(new_rows)
     frappe.db.commit()
 
-    if not created_names:
-        return {"copied": 0, "prev_year": prev_year, "rows": []}
-
-    placeholders = ",".join(["%s"] * len(created_names))
-    rows = frappe.db.sql(f"""
-        SELECT a.name, a.actividade, a.data, a.data_fim, a.data_original,
-               a.orador, a.local, a.orcamento,
-               a.tipologia, a.estado, a.notas_execucao, a.ano_lectivo,
-               t.cor AS tipologia_cor, t.icone AS tipologia_icone
-        FROM `tabActividade do Plano` a
-        LEFT JOIN `tabTipologia Actividade` t ON t.name = a.tipologia
-        WHERE a.name IN ({placeholders})
-        ORDER BY a.data IS NULL ASC, a.data ASC, a.name ASC
-    """, created_names, as_dict=True)
-
-    return {"copied": len(created_names), "prev_year": prev_year, "rows": rows}
+    return {"copied": len(new_rows), "prev_year": prev_year, "rows": _with_tipologia(new_rows)}
 
 
 def _sorted_anos():
@@ -622,45 +599,6 @@ def _sorted_anos():
     return [r.name for r in rows]
 
 
-@frappe.whitelist()
-def get_retiros_as_actividades(ano_lectivo):
-    """Return Plano de Retiro records shaped like Actividade do Plano rows."""
-    _assert_coordenador()
-
-    tip = frappe.db.get_value(
-        "Tipologia Actividade", "Retiro",
-        ["cor", "icone"], as_dict=True,
-    ) or {}
-
-    rows = frappe.db.sql("""
-        SELECT name, titulo, data, local, orador, estado, valor_de_contribuicao, notas
-        FROM `tabPlano de Retiro`
-        WHERE ano_lectivo = %s
-        ORDER BY data IS NULL ASC, data ASC
-    """, (ano_lectivo,), as_dict=True)
-
-    estado_map = {"Planeado": "Pendente", "Realizado": "Realizada", "Cancelado": "Cancelada"}
-
-    return [{
-        "name":            row.name,
-        "actividade":      row.titulo,
-        "data":            str(row.data)[:10] if row.data else None,
-        "data_fim":        None,
-        "data_original":   None,
-        "local":           row.local  or None,
-        "orador":          row.orador or None,
-        "estado":          estado_map.get(row.estado, "Pendente"),
-        "orcamento":       str(row.valor_de_contribuicao) if row.valor_de_contribuicao else None,
-        "ano_lectivo":     ano_lectivo,
-        "tipologia":       "Retiro",
-        "tipologia_cor":   tip.get("cor")   or "#8b5cf6",
-        "tipologia_icone": tip.get("icone") or "⛺",
-        "notas_execucao":  row.notas or None,
-        "_is_retiro":      True,
-        "_retiro_name":    row.name,
-    } for row in rows]
-
-
 @frappe.whitelist()
 def get_field_suggestions(fieldname, query):
     _assert_coordenador()
@@ -677,18 +615,33 @@ def get_field_suggestions(fieldname, query):
     return [r[0] for r in rows if r[0]]
 
 
+def _selected_names(names_json):
+    names = json.loads(names_json) if isinstance(names_json, str) else names_json
+    if not names:
+        frappe.throw(_("Nenhuma actividade seleccionada"))
+    return list(dict.fromkeys(names))
+
+
+def _existing_actividades(names, fields="name"):
+    """The rows among `names` that exist — one SELECT for the whole selection."""
+    return frappe.db.sql(f"""
+        SELECT {fields} FROM `tabActividade do Plano` WHERE name IN %(names)s
+    """, {"names": names}, as_dict=True)
+
+
 @frappe.whitelist()
 def bulk_update_estado(names_json, estado):
     _assert_coordenador()
     allowed = {"Pendente", "Em Progresso", "Realizada", "Cancelada", "Adiada"}
     if estado not in allowed:
         frappe.throw(_("Estado inválido"))
-    names = json.loads(names_json) if isinstance(names_json, str) else names_json
-    if not names:
-        frappe.throw(_("Nenhuma actividade seleccionada"))
-    for name in names:
-        if frappe.db.exists("Actividade do Plano", name):
-            frappe.db.set_value("Actividade do Plano", name, "estado", estado)
+    names = _selected_names(names_json)
+    frappe.db.sql("""
+        UPDATE `tabActividade do Plano`
+        SET estado = %(estado)s, modified = %(now)s, modified_by = %(user)s
+        WHERE name IN %(names)s
+    """, {"estado": estado, "names": names,
+          "now": frappe.utils.now(), "user": frappe.session.user})
     frappe.db.commit()
     return {"updated": len(names)}
 
@@ -696,14 +649,8 @@ def bulk_update_estado(names_json, estado):
 @frappe.whitelist()
 def bulk_delete(names_json):
     _assert_coordenador()
-    names = json.loads(names_json) if isinstance(names_json, str) else names_json
-    if not names:
-        frappe.throw(_("Nenhuma actividade seleccionada"))
-    deleted = 0
-    for name in names:
-        if frappe.db.exists("Actividade do Plano", name):
-            frappe.delete_doc("Actividade do Plano", name, ignore_permissions=True)
-            deleted += 1
+    names = _selected_names(names_json)
+    deleted = bulk.delete_rows("Actividade do Plano", _existing_actividades(names, "*"))
     frappe.db.commit()
     return {"deleted": deleted}
 
@@ -719,35 +666,28 @@ def bulk_move_month(names_json, new_month):
     from datetime import date as _date
     if not re.match(r'^\d{4}-\d{2}$', new_month):
         frappe.throw(_("Formato de mês inválido"))
-    names = json.loads(names_json) if isinstance(names_json, str) else names_json
-    if not names:
-        frappe.throw(_("Nenhuma actividade seleccionada"))
+    names = _selected_names(names_json)
 
     ny, nm = map(int, new_month.split('-'))
     last_day = calendar.monthrange(ny, nm)[1]
-    updated_rows = []
+
+    def _in_new_month(d):
+        return str(_date(ny, nm, min(d.day, last_day)))
+
+    existing = {r.name: r for r in _existing_actividades(names, "name, data, data_fim, data_original")}
+    updates, updated_rows = {}, []
 
     for name in names:
-        row = frappe.db.get_value(
-            "Actividade do Plano", name,
-            ["data", "data_fim", "data_original"], as_dict=True
-        )
+        row = existing.get(name)
         if not row:
             continue
-        if row.data:
-            old_day = row.data.day if hasattr(row.data, 'day') else int(str(row.data)[8:10])
-            new_day  = min(old_day, last_day)
-            new_date = _date(ny, nm, new_day)
-        else:
-            new_date = _date(ny, nm, 1)
-
-        update_vals = {"data": str(new_date)}
+        new_date = _in_new_month(getdate(row.data)) if row.data else str(_date(ny, nm, 1))
+        update_vals = {"data": new_date}
 
         # Shift data_fim by the same month change, preserving the duration
         new_data_fim = None
         if row.data_fim:
-            fim_day = row.data_fim.day if hasattr(row.data_fim, 'day') else int(str(row.data_fim)[8:10])
-            new_data_fim = str(_date(ny, nm, min(fim_day, last_day)))
+            new_data_fim = _in_new_month(getdate(row.data_fim))
             update_vals["data_fim"] = new_data_fim
 
         new_data_original = None
@@ -755,14 +695,15 @@ def bulk_move_month(names_json, new_month):
             update_vals["data_original"] = str(row.data)
             new_data_original = str(row.data)
 
-        frappe.db.set_value("Actividade do Plano", name, update_vals)
+        updates[name] = update_vals
         updated_rows.append({
             "name": name,
-            "data": str(new_date),
+            "data": new_date,
             "data_fim": new_data_fim,
             "data_original": new_data_original or (str(row.data_original) if row.data_original else None),
         })
 
+    bulk.set_values("Actividade do Plano", updates)
     frappe.db.commit()
     return {"updated": len(updated_rows), "rows": updated_rows}
 
@@ -805,142 +746,221 @@ def _shift_date_rollover(d, preserve_weekend=True):
     return str(shifted)
 
 
-@frappe.whitelist()
-def preview_rollover(ano_origem, ano_destino, manter_orador="1", ajustar_datas="1"):
-    """
-    Returns a preview of what a rollover would create/skip.
-    Duplicate detection is by exact actividade name within the target year.
-    """
-    _assert_coordenador()
+# Above this many new activities executar_rollover runs in a background job
+ROLLOVER_SYNC_MAX_ROWS = 500
 
-    if ano_origem == ano_destino:
-        frappe.throw(_("O ano de origem e o ano de destino não podem ser iguais"))
+# preview_rollover keeps its plan this long for executar_rollover to reuse
+ROLLOVER_PLAN_TTL = 15 * 60
+
+_ROLLOVER_PLAN_KEY = "portal:rollover_plan:{}"
 
-    preserve_weekend = frappe.utils.cint(ajustar_datas) == 1
 
-    src_rows = frappe.db.sql("""
+def _rollover_source(ano_lectivo):
+    return frappe.db.sql("""
         SELECT actividade, tipologia, data, data_fim, orador, local, orcamento
         FROM `tabActividade do Plano`
         WHERE ano_lectivo = %s
         ORDER BY data IS NULL ASC, data ASC, name ASC
-    """, (ano_origem,), as_dict=True)
+    """, (ano_lectivo,), as_dict=True)
 
-    if not src_rows:
-        frappe.throw(_("O ano de origem ({0}) não tem actividades").format(ano_origem))
 
-    # Names already in the target year — used for duplicate detection
-    existing = {
-        r.actividade
-        for r in frappe.db.sql(
-            "SELECT actividade FROM `tabActividade do Plano` WHERE ano_lectivo = %s",
-            (ano_destino,), as_dict=True,
-        )
+def _existing_actividades_in(ano_lectivo):
+    """Actividade titles already in ano_lectivo — used for duplicate detection."""
+    return set(frappe.db.sql_list(
+        "SELECT actividade FROM `tabActividade do Plano` WHERE ano_lectivo = %s",
+        (ano_lectivo,),
+    ))
+
+
+def _rollover_row(row, ano_destino, keep_orador, preserve_weekend):
+    """The Actividade do Plano to create in ano_destino from source `row`."""
+    return {
+        "actividade":  row.actividade,
+        "tipologia":   row.tipologia or None,
+        "estado":      "Pendente",
+        "ano_lectivo": ano_destino,
+        "data":        _shift_date_rollover(row.data, preserve_weekend),
+        "data_fim":    _shift_date_rollover(row.data_fim, preserve_weekend),
+        "orador":      (row.orador or None) if keep_orador else None,
+        "local":       row.local or None,
+        "orcamento":   row.orcamento or None,
     }
 
-    to_create = []
-    to_skip   = []
 
+def _plan_rollover(ano_origem, ano_destino, keep_orador, preserve_weekend):
+    """
+    Compute the rollover in one pass: {"create": [new rows], "skip": [source
+    rows whose actividade already exists in ano_destino]}. Both lists carry
+    data_origem for display; it is not a field of the doctype.
+    """
+    src_rows = _rollover_source(ano_origem)
+    if not src_rows:
+        frappe.throw(_("O ano de origem ({0}) não tem actividades").format(ano_origem))
+
+    existing = _existing_actividades_in(ano_destino)
+    plan = {"create": [], "skip": []}
     for row in src_rows:
-        shifted = _shift_date_rollover(row.data, preserve_weekend) if ajustar_datas else None
-        entry = {
-            "actividade":  row.actividade,
-            "tipologia":   row.tipologia or "",
-            "data_origem": str(row.data)[:10] if row.data else None,
-            "data_destino": shifted,
-            "orador":      row.orador if frappe.utils.cint(manter_orador) else None,
-            "local":       row.local  or "",
-        }
+        data_origem = str(row.data)[:10] if row.data else None
         if row.actividade in existing:
-            to_skip.append(entry)
+            plan["skip"].append({"actividade": row.actividade, "tipologia": row.tipologia or "",
+                                 "data_origem": data_origem})
         else:
-            to_create.append(entry)
+            new_row = _rollover_row(row, ano_destino, keep_orador, preserve_weekend)
+            new_row["data_origem"] = data_origem
+            plan["create"].append(new_row)
+    return plan
 
+
+def _rollover_params(ano_origem, ano_destino, manter_orador, ajustar_datas):
+    if ano_origem == ano_destino:
+        frappe.throw(_("O ano de origem e o ano de destino não podem ser iguais"))
     return {
         "ano_origem":  ano_origem,
         "ano_destino": ano_destino,
-        "to_create":   to_create,
-        "to_skip":     to_skip,
+        "keep_orador": frappe.utils.cint(manter_orador) == 1,
+        "preserve_weekend": frappe.utils.cint(ajustar_datas) == 1,
     }
 
 
 @frappe.whitelist()
-def executar_rollover(ano_origem, ano_destino, manter_orador="1", ajustar_datas="1"):
+def preview_rollover(ano_origem, ano_destino, manter_orador="1", ajustar_datas="1"):
+    """
+    Returns a preview of what a rollover would create/skip.
+    Duplicate detection is by exact actividade name within the target year.
+    The plan is kept for ROLLOVER_PLAN_TTL seconds under the returned
+    plan_token, so executar_rollover creates exactly what was shown.
+    """
+    _assert_coordenador()
+    params = _rollover_params(ano_origem, ano_destino, manter_orador, ajustar_datas)
+    plan   = _plan_rollover(**params)
+
+    plan_token = frappe.generate_hash(length=20)
+    frappe.cache().set_value(
+        _ROLLOVER_PLAN_KEY.format(plan_token),
+        {"user": frappe.session.user, "params": params, "plan": plan},
+        expires_in_sec=ROLLOVER_PLAN_TTL,
+    )
+
+    return {
+        "ano_origem":  ano_origem,
+        "ano_destino": ano_destino,
+        "plan_token":  plan_token,
+        "to_create": [{
+            "actividade":   r["actividade"],
+            "tipologia":    r["tipologia"] or "",
+            "data_origem":  r["data_origem"],
+            "data_destino": r["data"],
+            "orador":       r["orador"],
+            "local":        r["local"] or "",
+        } for r in plan["create"]],
+        "to_skip": plan["skip"],
+    }
+
+
+@frappe.whitelist()
+def executar_rollover(ano_origem, ano_destino, manter_orador="1", ajustar_datas="1", plan_token=""):
     """
     Performs the rollover: creates activities from ano_origem into ano_destino.
     Skips any whose actividade name already exists in the target year.
-    Returns counts and the created rows (for immediate UI update).
+    Uses the plan of preview_rollover when plan_token is still valid, and
+    computes it otherwise.
+
+    Up to ROLLOVER_SYNC_MAX_ROWS new activities: returns counts and the
+    created rows (for immediate UI update). Above that a background job
+    creates them, reporting progress and then "portal_rollover_concluido"
+    over realtime; returns {"queued": True, ...}.
     """
     _assert_coordenador()
+    params = _rollover_params(ano_origem, ano_destino, manter_orador, ajustar_datas)
+
+    cached = None
+    if plan_token:
+        key    = _ROLLOVER_PLAN_KEY.format(plan_token)
+        cached = frappe.cache().get_value(key)
+        frappe.cache().delete_value(key)
+    if cached and cached["user"] == frappe.session.user and cached["params"] == params:
+        plan = cached["plan"]
+        # Activities created in ano_destino since the preview are skipped too
+        existing = _existing_actividades_in(ano_destino)
+        late = [r for r in plan["create"] if r["actividade"] in existing]
+        if late:
+            plan["skip"] += late
+            plan["create"] = [r for r in plan["create"] if r["actividade"] not in existing]
+    else:
+        plan = _plan_rollover(**params)
+
+    new_rows = [{k: v for k, v in r.items() if k != "data_origem"} for r in plan["create"]]
+    skipped  = len(plan["skip"])
+
+    if len(new_rows) > ROLLOVER_SYNC_MAX_ROWS:
+        frappe.enqueue(
+            "portal.catequista.page.plano_anual.plano_anual.executar_rollover_job",
+            queue="long",
+            timeout=1800,
+            new_rows=new_rows, skipped=skipped, ano_destino=ano_destino,
+        )
+        return {"queued": True, "total": len(new_rows), "skipped": skipped, "ano_destino": ano_destino}
 
-    if ano_origem == ano_destino:
-        frappe.throw(_("O ano de origem e o ano de destino não podem ser iguais"))
-
-    keep_orador      = frappe.utils.cint(manter_orador) == 1
-    preserve_weekend = frappe.utils.cint(ajustar_datas) == 1
+    _insert_actividades(new_rows)
+    frappe.db.commit()
 
-    src_rows = frappe.db.sql("""
-        SELECT actividade, tipologia, data, data_fim, orador, local, orcamento
-        FROM `tabActividade do Plano`
-        WHERE ano_lectivo = %s
-        ORDER BY data IS NULL ASC, data ASC, name ASC
-    """, (ano_origem,), as_dict=True)
+    return {
+        "created": len(new_rows),
+        "skipped": skipped,
+        "ano_destino": ano_destino,
+        "rows": _with_tipologia(new_rows),
+    }
 
-    if not src_rows:
-        frappe.throw(_("O ano de origem ({0}) não tem actividades").format(ano_origem))
 
-    existing = {
-        r.actividade
-        for r in frappe.db.sql(
-            "SELECT actividade FROM `tabActividade do Plano` WHERE ano_lectivo = %s",
-            (ano_destino,), as_dict=True,
+def executar_rollover_job(new_rows, skipped, ano_destino):
+    """Background half of executar_rollover for large plans."""
+    def progress(done, total):
+        frappe.publish_progress(
+            done * 100 / total,
+            title="Rollover do Plano Anual",
+            description=f"{done} / {total}",
         )
-    }
 
-    created_names = []
-    skipped       = 0
+    _insert_actividades(new_rows, on_chunk=progress)
+    frappe.db.commit()
 
-    for row in src_rows:
-        if row.actividade in existing:
-            skipped += 1
-            continue
+    frappe.publish_realtime(
+        "portal_rollover_concluido",
+        {"created": len(new_rows), "skipped": skipped, "ano_destino": ano_destino},
+        user=frappe.session.user,
+    )
 
-        doc = frappe.new_doc("Actividade do Plano")
-        doc.actividade     = row.actividade
-        doc.tipologia      = row.tipologia or None
-        doc.estado         = "Pendente"
-        doc.ano_lectivo    = ano_destino
-        doc.data           = _shift_date_rollover(row.data, preserve_weekend) if preserve_weekend else None
-        doc.data_fim       = _shift_date_rollover(row.data_fim, preserve_weekend) if preserve_weekend and row.data_fim else None
-        doc.orador         = row.orador if keep_orador else None
-        doc.local          = row.local  or None
-        doc.orcamento      = row.orcamento or None
-        doc.notas_execucao = None
-        doc.data_original  = None
-        doc.insert(ignore_permissions=True)
-        created_names.append(doc.name)
 
-    frappe.db.commit()
+def _insert_actividades(rows, on_chunk=None):
+    """Bulk insert of new Actividade do Plano rows; sets each row's name."""
+    for row, name in zip(rows, bulk.reserve_names("Actividade do Plano", len(rows))):
+        row["name"] = name
+    bulk.insert_rows("Actividade do Plano", rows, on_chunk=on_chunk)
 
-    rows = []
-    if created_names:
-        placeholders = ",".join(["%s"] * len(created_names))
-        rows = frappe.db.sql(f"""
-            SELECT a.name, a.actividade, a.data, a.data_fim, a.data_original,
-                   a.orador, a.local, a.orcamento,
-                   a.tipologia, a.estado, a.notas_execucao, a.ano_lectivo,
-                   t.cor AS tipologia_cor, t.icone AS tipologia_icone
-            FROM `tabActividade do Plano` a
-            LEFT JOIN `tabTipologia Actividade` t ON t.name = a.tipologia
-            WHERE a.name IN ({placeholders})
-            ORDER BY a.data IS NULL ASC, a.data ASC
-        """, created_names, as_dict=True)
 
-    return {
-        "created": len(created_names),
-        "skipped": skipped,
-        "ano_destino": ano_destino,
-        "rows": rows,
-    }
+def _with_tipologia(rows):
+    """
+    Rows just inserted, in the shape get_actividades returns — built from
+    memory plus one lookup of the tipologias involved.
+    """
+    tipologias = {r["tipologia"] for r in rows if r.get("tipologia")}
+    details = {
+        t.name: t for t in frappe.db.sql("""
+            SELECT name, cor, icone FROM `tabTipologia Actividade` WHERE name IN %(names)s
+        """, {"names": list(tipologias)}, as_dict=True)
+    } if tipologias else {}
+
+    out = []
+    for r in rows:
+        t = details.get(r.get("tipologia"))
+        out.append(frappe._dict(r,
+            data_original=None,
+            notas_execucao=None,
+            tipologia_cor=t.cor if t else None,
+            tipologia_icone=t.icone if t else None,
+        ))
+    out.sort(key=lambda x: (x.data is None, x.data or "", x.name))
+    return out
 
 
 @frappe.whitelist()
@@ -948,10 +968,22 @@ def reorder_actividades(ano_lectivo, ordered_names):
     """
     Persist drag-and-drop order within a month by updating a sort_order field.
     ordered_names is a JSON list of document names in the new order.
+    Names outside ano_lectivo are ignored.
     """
     _assert_coordenador()
     names = json.loads(ordered_names) if isinstance(ordered_names, str) else ordered_names
-    for idx, name in enumerate(names):
-        frappe.db.set_value("Actividade do Plano", name, "idx", idx)
+    if names:
+        params = {"ano_lectivo": ano_lectivo, "names": names,
+                  "now": frappe.utils.now(), "user": frappe.session.user}
+        whens = []
+        for idx, name in enumerate(names):
+            params[f"n{idx}"] = name
+            whens.append(f"WHEN %(n{idx})s THEN {idx}")
+        frappe.db.sql(f"""
+            UPDATE `tabActividade do Plano`
+            SET idx = CASE name {" ".join(whens)} ELSE idx END,
+                modified = %(now)s, modified_by = %(user)s
+            WHERE name IN %(names)s AND ano_lectivo = %(ano_lectivo)s
+        """, params)
     frappe.db.commit()
     return {"success": True}
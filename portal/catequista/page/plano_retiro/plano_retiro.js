@@ -484,9 +484,17 @@ function createPlanoRetiroApp() {
                     <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><polyline points="6 9 6 2 18 2 18 9"/><path d="M6 18H4a2 2 0 0 1-2-2v-5a2 2 0 0 1 2-2h16a2 2 0 0 1 2 2v5a2 2 0 0 1-2 2h-2"/><rect x="6" y="14" width="12" height="8"/></svg>
                     Imprimir / PDF
                   </button>
-                  <button class="pr-export-action-btn pr-export-excel" @click="exportExcel" :disabled="exporting">
+                  <button class="pr-export-action-btn pr-export-excel" @click="exportData('xlsx')" :disabled="exporting">
                     <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
-                    {{ exporting ? 'A exportar...' : 'Excel (.xlsx)' }}
+                    {{ exporting === 'xlsx' ? 'A exportar...' : 'Excel (.xlsx)' }}
+                  </button>
+                  <button class="pr-export-action-btn pr-export-excel" @click="exportData('csv')" :disabled="exporting">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
+                    {{ exporting === 'csv' ? 'A exportar...' : 'CSV (.csv)' }}
+                  </button>
+                  <button class="pr-export-action-btn pr-export-excel" @click="exportData('ods')" :disabled="exporting">
+                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5"><rect x="3" y="3" width="18" height="18" rx="2"/><line x1="3" y1="9" x2="21" y2="9"/><line x1="3" y1="15" x2="21" y2="15"/><line x1="9" y1="3" x2="9" y2="21"/></svg>
+                    {{ exporting === 'ods' ? 'A exportar...' : 'ODS (.ods)' }}
                   </button>
                 </div>
 
@@ -736,10 +744,15 @@ function createPlanoRetiroApp() {
             }
             saving.value = true;
             try {
-              items.value = await api('save_programa', {
+              const diff = await api('save_programa', {
                 retiro_name: props.retiro.name,
                 items_json: JSON.stringify(valid),
               });
+              // Patch local state with the rows the server changed
+              const byName = new Map(items.value.map(i => [String(i.name), i]));
+              (diff.deleted || []).forEach(n => byName.delete(String(n)));
+              (diff.changed || []).forEach(r => byName.set(String(r.name), r));
+              items.value = [...byName.values()].sort((a, b) => a.idx - b.idx);
               editMode.value = false;
               editItems.value = [];
               frappe.show_alert({ message: 'Programa guardado', indicator: 'green' });
@@ -1134,11 +1147,12 @@ function createPlanoRetiroApp() {
         setTimeout(() => window.print(), 80);
       }
 
-      const exporting = ref(false);
+      const exporting = ref(false);   // format being exported, false when idle
+      const EXPORT_FORMAT_LABELS = { xlsx: 'Excel', csv: 'CSV', ods: 'ODS' };
 
-      async function exportExcel() {
+      async function exportData(format) {
         if (exporting.value) return;
-        exporting.value = true;
+        exporting.value = format;
         try {
           const params = new URLSearchParams({
             ano_lectivo:  anoLectivo.value,
@@ -1146,6 +1160,7 @@ function createPlanoRetiroApp() {
             fase:         filterFase.value   || '',
             search:       search.value       || '',
             fields_json:  JSON.stringify(exportFields.value),
+            format,
             csrf_token:   frappe.csrf_token,
           });
           const url = `/api/method/portal.catequista.page.plano_retiro.plano_retiro.export_retiros?${params}`;
@@ -1155,7 +1170,7 @@ function createPlanoRetiroApp() {
           document.body.appendChild(a);
           a.click();
           document.body.removeChild(a);
-          toast('A descarregar Excel...', 'success');
+          toast(`A descarregar ${EXPORT_FORMAT_LABELS[format]}...`, 'success');
         } catch(e) {
           toast('Erro ao exportar: ' + (e.message || e), 'error');
         } finally {
@@ -1209,7 +1224,7 @@ function createPlanoRetiroApp() {
         loadRetiros, toggleExpand, openCreate, openEdit, closeModal, saveRetiro,
         cycleEstado, deleteRetiro, duplicateRetiro, nextEstado, estadoIcon, fmtDate, fmtCurrency,
         editingCell, editingValue, startInlineEdit, commitInlineEdit, cancelInlineEdit,
-        clearSearch, clearFilters, setSort, exportExcel, printRetiros,
+        clearSearch, clearFilters, setSort, exportData, printRetiros,
       };
     },
   });
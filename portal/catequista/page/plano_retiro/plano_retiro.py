@@ -2,6 +2,13 @@ import frappe
 from frappe import _
 import json
 
+from portal import bulk
+from portal.catequista.doctype.plano_de_retiro.plano_de_retiro import base_name, next_name
+from portal.catequista.page.plano_anual.plano_anual import _shift_date_rollover
+from portal.filters import compile_filters, parse_spec
+from portal.export_formats import build_ods, csv_response, set_download, validate_format
+from portal.xlsx_report import build_xlsx
+
 
 def _assert_coordenador():
     user = frappe.session.user
@@ -160,224 +167,357 @@ def get_programa(retiro_name):
     return rows
 
 
+_PROGRAMA_FIELDS = ("hora", "actividade", "responsavel", "notas")
+
+
 @frappe.whitelist()
 def save_programa(retiro_name, items_json):
+    """
+    Save the programme as a diff against the stored Retiro Item rows.
+
+    items_json is the full programme in order; rows loaded from get_programa
+    keep their "name". Changed rows are updated, new ones inserted, missing
+    ones deleted and idx only rewritten where the position moved — all in
+    one transaction, without re-saving the parent.
+
+    Returns {"changed": [updated and inserted rows], "deleted": [names]}
+    for the page to patch its copy of the programme.
+    """
     _assert_coordenador()
     items = json.loads(items_json) if isinstance(items_json, str) else items_json
-    doc = frappe.get_doc("Plano de Retiro", retiro_name)
-    doc.set("programa", [])
-    for item in items:
-        doc.append("programa", {
-            "hora":        item.get("hora") or None,
-            "actividade":  item.get("actividade") or "",
-            "responsavel": item.get("responsavel") or None,
-            "notas":       item.get("notas") or None,
-        })
-    doc.save(ignore_permissions=True)
+
+    # Lock the retiro so concurrent saves of its programme serialize here
+    if not frappe.db.sql(
+        "SELECT name FROM `tabPlano de Retiro` WHERE name = %s FOR UPDATE", (retiro_name,)
+    ):
+        frappe.throw(_("Retiro não encontrado"))
+
+    # Autoincrement names come back as ints; the client may send either
+    current = {
+        str(r.name): r for r in frappe.db.sql("""
+            SELECT name, hora, actividade, responsavel, notas, idx
+            FROM `tabRetiro Item`
+            WHERE parent = %s AND parenttype = 'Plano de Retiro' AND parentfield = 'programa'
+        """, (retiro_name,), as_dict=True)
+    }
+
+    updates, new_rows, kept = {}, [], set()
+    for idx, item in enumerate(items, 1):
+        values = {f: (item.get(f) or None) for f in _PROGRAMA_FIELDS}
+        if not values["actividade"]:
+            frappe.throw(_("Cada linha precisa de uma actividade."))
+
+        row = current.get(str(item.get("name") or ""))
+        if row is None:
+            new_rows.append(dict(values, parent=retiro_name, parenttype="Plano de Retiro",
+                                 parentfield="programa", idx=idx))
+            continue
+
+        kept.add(str(row.name))
+        changes = {f: v for f, v in values.items() if v != (row[f] or None)}
+        if row.idx != idx:
+            changes["idx"] = idx
+        if changes:
+            updates[str(row.name)] = changes
+
+    deleted = [name for name in current if name not in kept]
+
+    if deleted:
+        frappe.db.sql("DELETE FROM `tabRetiro Item` WHERE name IN %(names)s", {"names": deleted})
+    bulk.set_values("Retiro Item", updates)
+    for row, name in zip(new_rows, bulk.reserve_names("Retiro Item", len(new_rows))):
+        row["name"] = name
+    bulk.insert_rows("Retiro Item", new_rows)
+
+    changed_names = list(updates) + [r["name"] for r in new_rows]
+    if deleted or changed_names:
+        # Bumps modified, so a stale desk form of the retiro cannot overwrite this
+        frappe.db.set_value("Plano de Retiro", retiro_name, "modified_by", frappe.session.user)
     frappe.db.commit()
-    return frappe.db.sql("""
+
+    changed = frappe.db.sql("""
         SELECT name, hora, actividade, responsavel, notas, idx
         FROM `tabRetiro Item`
-        WHERE parent = %s ORDER BY idx ASC
-    """, (retiro_name,), as_dict=True)
+        WHERE name IN %(names)s ORDER BY idx ASC
+    """, {"names": changed_names}, as_dict=True) if changed_names else []
+
+    return {"changed": changed, "deleted": deleted}
+
+
+# ── Rollover ───────────────────────────────────────────────────────────────────
+
+def _plan_rollover_retiros(ano_origem, ano_destino, preserve_weekend):
+    """
+    Compute the retiro rollover in one pass, with three queries in total:
+    the source retiros, their programme rows and the names already taken.
+
+    Returns {"create": [(parent row, [programme rows])], "skip": [source rows]},
+    both empty when ano_origem has no retiros.
+    A source is skipped when ano_destino already has a retiro of the same
+    fases on the shifted date. New names and titles follow the Plano de
+    Retiro autoname scheme, resolved against the taken names in memory.
+    """
+    if ano_origem == ano_destino:
+        frappe.throw(_("O ano de origem e o ano de destino não podem ser iguais"))
+
+    src_rows = frappe.db.sql("""
+        SELECT name, titulo, data, local, orador, tema, notas,
+               fase_1, fase_2, valor_de_contribuicao
+        FROM `tabPlano de Retiro`
+        WHERE ano_lectivo = %s
+        ORDER BY data IS NULL ASC, data ASC, name ASC
+    """, (ano_origem,), as_dict=True)
+    if not src_rows:
+        # Nothing to copy — the retiro part of a plano anual rollover is a no-op
+        return {"create": [], "skip": []}
+
+    programa = {}
+    for item in frappe.db.sql("""
+        SELECT parent, hora, actividade, responsavel, notas
+        FROM `tabRetiro Item`
+        WHERE parenttype = 'Plano de Retiro' AND parent IN %(names)s
+        ORDER BY parent, idx ASC
+    """, {"names": [r.name for r in src_rows]}, as_dict=True):
+        programa.setdefault(item.parent, []).append(item)
+
+    taken, existing = set(), set()
+    for r in frappe.db.sql(
+        "SELECT name, ano_lectivo, fase_1, fase_2, data FROM `tabPlano de Retiro`", as_dict=True,
+    ):
+        taken.add(r.name)
+        if r.ano_lectivo == ano_destino:
+            existing.add((r.fase_1, r.fase_2, str(r.data)[:10] if r.data else None))
+
+    plan = {"create": [], "skip": []}
+    for row in src_rows:
+        data = _shift_date_rollover(row.data, preserve_weekend)
+        if (row.fase_1, row.fase_2, data) in existing:
+            plan["skip"].append(row)
+            continue
+        existing.add((row.fase_1, row.fase_2, data))
+
+        name, titulo = next_name(base_name(row.fase_1, row.fase_2, data), taken.__contains__)
+        taken.add(name)
+        plan["create"].append(({
+            "name":                  name,
+            "titulo":                titulo,
+            "data":                  data,
+            "ano_lectivo":           ano_destino,
+            "estado":                "Planeado",
+            "local":                 row.local or None,
+            "orador":                row.orador or None,
+            "tema":                  row.tema or None,
+            "notas":                 row.notas or None,
+            "fase_1":                row.fase_1,
+            "fase_2":                row.fase_2 or None,
+            "valor_de_contribuicao": row.valor_de_contribuicao or None,
+            "origem":                row.name,
+        }, programa.get(row.name, [])))
+    return plan
 
 
 @frappe.whitelist()
-def export_retiros(ano_lectivo, estado="", fase="", search="", fields_json=""):
+def preview_rollover_retiros(ano_origem, ano_destino, ajustar_datas="1"):
+    """What executar_rollover_retiros would create and skip."""
     _assert_coordenador()
+    plan = _plan_rollover_retiros(ano_origem, ano_destino, frappe.utils.cint(ajustar_datas) == 1)
+    return {
+        "ano_origem":  ano_origem,
+        "ano_destino": ano_destino,
+        "to_create": [{
+            "origem":        parent["origem"],
+            "name":          parent["name"],
+            "titulo":        parent["titulo"],
+            "data_destino":  parent["data"],
+            "itens":         len(items),
+        } for parent, items in plan["create"]],
+        "to_skip": [{
+            "origem":       r.name,
+            "titulo":       r.titulo,
+            "data_origem":  str(r.data)[:10] if r.data else None,
+        } for r in plan["skip"]],
+    }
 
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils import get_column_letter
-        import io
-        from datetime import date as _date
-    except ImportError:
-        frappe.throw(_("openpyxl não está instalado. Execute: pip install openpyxl"))
-
-    conditions = ["ano_lectivo = %s"]
-    params     = [ano_lectivo]
-
-    if estado:
-        conditions.append("estado = %s")
-        params.append(estado)
-
-    if fase:
-        conditions.append("(fase_1 = %s OR fase_2 = %s)")
-        params.extend([fase, fase])
-
-    search = (search or "").strip()
-    if search:
-        sq = f"%{search}%"
-        conditions.append("(titulo LIKE %s OR orador LIKE %s OR local LIKE %s OR tema LIKE %s)")
-        params.extend([sq, sq, sq, sq])
-
-    where = " AND ".join(conditions)
-
-    rows = frappe.db.sql(f"""
-        SELECT name, titulo, data, estado, local, orador, tema,
-               fase_1, fase_2, valor_de_contribuicao, notas
-        FROM `tabPlano de Retiro`
-        WHERE {where}
-        ORDER BY data IS NULL ASC, data ASC
-    """, params, as_dict=True)
 
-    MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-             "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
+@frappe.whitelist()
+def executar_rollover_retiros(ano_origem, ano_destino, ajustar_datas="1"):
+    """
+    Copy the retiros of ano_origem, with their programme, into ano_destino:
+    one bulk INSERT for the retiros and one for all their Retiro Item rows,
+    committed together.
+    """
+    _assert_coordenador()
+    plan = _plan_rollover_retiros(ano_origem, ano_destino, frappe.utils.cint(ajustar_datas) == 1)
+
+    parents, items = [], []
+    for parent, programa in plan["create"]:
+        parents.append({k: v for k, v in parent.items() if k != "origem"})
+        for idx, item in enumerate(programa, 1):
+            items.append({
+                "parent":      parent["name"],
+                "parenttype":  "Plano de Retiro",
+                "parentfield": "programa",
+                "idx":         idx,
+                "hora":        item.hora,
+                "actividade":  item.actividade,
+                "responsavel": item.responsavel,
+                "notas":       item.notas,
+            })
+
+    for item, name in zip(items, bulk.reserve_names("Retiro Item", len(items))):
+        item["name"] = name
+
+    bulk.insert_rows("Plano de Retiro", parents)
+    bulk.insert_rows("Retiro Item", items)
+    frappe.db.commit()
 
-    def fmt_date(d):
-        if not d:
-            return "—"
-        s = str(d)[:10]
-        y, m, day = s.split("-")
-        return f"{int(day)} {MESES[int(m)-1]} {y}"
+    return {
+        "created":     len(parents),
+        "itens":       len(items),
+        "skipped":     len(plan["skip"]),
+        "ano_destino": ano_destino,
+    }
 
-    def _fill(hex_color):
-        return PatternFill("solid", fgColor=hex_color)
 
-    def _side(style="thin", color="D1D5DB"):
-        return Side(style=style, color=color)
+_MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
+          "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
+
+_EXPORT_FIELD_META = [
+    ("titulo",       "Título",            35, "text"),
+    ("orador",       "Orador",            20, "text"),
+    ("fases",        "Fases",             15, "text"),
+    ("data",         "Data",              15, "text"),
+    ("local",        "Local",             20, "text"),
+    ("contribuicao", "Contribuição (MZN)", 18, "num"),
+    ("estado",       "Estado",            12, "status"),
+    ("tema",         "Tema",              25, "text"),
+    ("notas",        "Notas",             35, "text"),
+]
+
+# Look of the export — see portal.xlsx_report
+EXPORT_THEME = {
+    "name":   "pr",
+    "fonts": {
+        "title":  {"bold": True, "size": 14, "color": "FFFFFF"},
+        "meta":   {"size": 9, "color": "7A5A18", "italic": True},
+        "header": {"bold": True, "size": 9, "color": "7A5A18"},
+        "body":   {"size": 9, "color": "1F2937"},
+        "muted":  {"size": 9, "color": "6B7280"},
+        "note":   {"size": 9, "color": "1F2937"},
+    },
+    "accent":             {"rule": "D4A843", "light": "E8C464"},
+    "title_fill":         "9A7020",
+    "meta_fill":          "FEF9EC",
+    "header_fill":        "F5DFA0",
+    "group_current_fill": "E8C464",
+    "alt_fill":           "FFFDF5",
+    "header_box":         True,
+    "status": {
+        "Planeado":  ("DBEAFE", "1D4ED8", True),
+        "Realizado": ("DCFCE7", "166534", True),
+        "Cancelado": ("FEE2E2", "991B1B", True),
+    },
+    "status_fallback": ("F9FAFB", "1F2937", False),
+    "heights":    {"title": 26, "meta": 18, "header": 18, "group": 18, "row": 16},
+    "spacer":     4,
+    "n_width":    5,
+    "freeze_col": "A",
+}
 
-    def _border():
-        s = _side()
-        return Border(left=s, right=s, top=s, bottom=s)
 
-    TITLE_FONT  = Font(name="Calibri", bold=True, size=14, color="FFFFFF")
-    META_FONT   = Font(name="Calibri", size=9,  color="6B7280", italic=True)
-    HEADER_FONT = Font(name="Calibri", bold=True, size=9, color="374151")
-    BODY_FONT   = Font(name="Calibri", size=9,  color="1F2937")
-    MUTED_FONT  = Font(name="Calibri", size=9,  color="6B7280")
+@frappe.whitelist()
+def export_retiros(ano_lectivo, estado="", fase="", search="", fields_json="", format="xlsx", filters_json=""):
+    """
+    Exports the retiros — a styled .xlsx file, or plain .csv (streamed) /
+    .ods (see portal.export_formats). Respects the filters the UI has active.
+    """
+    _assert_coordenador()
+    format = validate_format(format)
 
-    TITLE_FILL  = _fill("9A7020")
-    META_FILL   = _fill("FEF9EC")
-    HEADER_FILL = _fill("F5DFA0")
+    from datetime import date as _date
 
-    STATUS_DATA = {
-        "Planeado":  (_fill("DBEAFE"), Font(name="Calibri", size=9, bold=True, color="1D4ED8")),
-        "Realizado": (_fill("DCFCE7"), Font(name="Calibri", size=9, bold=True, color="166534")),
-        "Cancelado": (_fill("FEE2E2"), Font(name="Calibri", size=9, bold=True, color="991B1B")),
-    }
+    spec    = parse_spec(filters_json, estado=estado, fase=fase, search=search)
+    rows    = _export_rows(ano_lectivo, spec)
+    columns = _export_columns(fields_json)
+    fname   = f"Plano_Retiros_{ano_lectivo.replace('/', '-')}.{format}"
 
-    # Parse selected fields (default all enabled)
-    try:
-        fields = json.loads(fields_json) if fields_json else {}
-    except Exception:
-        fields = {}
+    if format == "csv":
+        return csv_response(fname, columns, map(_export_values, rows))
+
+    if format == "ods":
+        set_download(fname, build_ods("Plano de Retiros", columns, map(_export_values, rows)))
+        return
 
-    FIELD_META = [
-        ("titulo",       "Título",            35, "text"),
-        ("orador",       "Orador",            20, "text"),
-        ("fases",        "Fases",             15, "text"),
-        ("data",         "Data",              15, "text"),
-        ("local",        "Local",             20, "text"),
-        ("contribuicao", "Contribuição (MZN)", 18, "num"),
-        ("estado",       "Estado",            12, "status"),
-        ("tema",         "Tema",              25, "text"),
-        ("notas",        "Notas",             35, "text"),
-    ]
-    active_cols = [(k, lbl, w, ct) for k, lbl, w, ct in FIELD_META if fields.get(k, True)]
-    COLS   = ["N"] + [lbl for _, lbl, _, _ in active_cols]
-    WIDTHS = [5]   + [w   for _, _,   w, _ in active_cols]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Plano de Retiros"
-
-    nc = len(COLS)
-
-    # Title row
-    ws.merge_cells(f"A1:{get_column_letter(nc)}1")
-    tc = ws["A1"]
-    tc.value = f"Plano de Retiros — {ano_lectivo}"
-    tc.font  = TITLE_FONT
-    tc.fill  = TITLE_FILL
-    tc.alignment = Alignment(horizontal="left", vertical="center", indent=1)
-    ws.row_dimensions[1].height = 26
-
-    # Meta row
-    ws.merge_cells(f"A2:{get_column_letter(nc)}2")
-    mc = ws["A2"]
     filters_desc = []
-    if estado: filters_desc.append(f"Estado: {estado}")
-    if fase:   filters_desc.append(f"Fase: {fase}")
-    if search: filters_desc.append(f'Pesquisa: "{search}"')
+    if spec.get("estado"): filters_desc.append(f"Estado: {spec['estado']}")
+    if spec.get("fase"):   filters_desc.append(f"Fase: {spec['fase']}")
+    if spec.get("search"): filters_desc.append(f'Pesquisa: "{spec["search"]}"')
     meta_text = f"Total: {len(rows)} retiro(s)"
     if filters_desc:
         meta_text += "  |  Filtros: " + ", ".join(filters_desc)
     meta_text += f"  |  Exportado em {_date.today().strftime('%d/%m/%Y')}"
-    mc.value     = meta_text
-    mc.font      = Font(name="Calibri", size=9, color="7A5A18", italic=True)
-    mc.fill      = META_FILL
-    mc.alignment = Alignment(horizontal="left", vertical="center", indent=1)
-    ws.row_dimensions[2].height = 18
-    ws.row_dimensions[3].height = 4
-
-    # Header row
-    HR = 4
-    for ci, (col_name, width) in enumerate(zip(COLS, WIDTHS), 1):
-        cell = ws.cell(row=HR, column=ci)
-        cell.value = col_name
-        cell.font  = Font(name="Calibri", bold=True, size=9, color="7A5A18")
-        cell.fill  = HEADER_FILL
-        cell.alignment = Alignment(horizontal="center" if ci == 1 else "left", vertical="center")
-        cell.border = _border()
-        ws.column_dimensions[get_column_letter(ci)].width = width
-    ws.row_dimensions[HR].height = 18
-    ws.freeze_panes = ws.cell(row=HR + 1, column=1)
-
-    # Data rows
-    for ri, row in enumerate(rows, 1):
-        rn  = HR + ri
-        alt = ri % 2 == 0
-        fases_str    = " + ".join(filter(None, [row.fase_1, row.fase_2]))
-        contribuicao = f"{float(row.valor_de_contribuicao):.2f}" if row.valor_de_contribuicao else "—"
-        s_fill, s_font = STATUS_DATA.get(row.estado, (_fill("F9FAFB"), BODY_FONT))
-
-        FIELD_VALUES = {
-            "titulo":       row.titulo or "",
-            "orador":       row.orador or "",
-            "fases":        fases_str,
-            "data":         fmt_date(row.data),
-            "local":        row.local  or "",
-            "contribuicao": contribuicao,
-            "estado":       row.estado or "",
-            "tema":         row.tema   or "",
-            "notas":        row.notas  or "",
-        }
-
-        # N column
-        n_cell = ws.cell(row=rn, column=1)
-        n_cell.value     = ri
-        n_cell.font      = MUTED_FONT
-        n_cell.alignment = Alignment(horizontal="center", vertical="center")
-        n_cell.border    = Border(bottom=Side(style="thin", color="E5E7EB"))
-        if alt: n_cell.fill = _fill("FFFDF5")
-
-        for ci, (key, _, _, ctype) in enumerate(active_cols, 2):
-            cell = ws.cell(row=rn, column=ci)
-            cell.value  = FIELD_VALUES[key]
-            cell.border = Border(bottom=Side(style="thin", color="E5E7EB"))
-            if ctype == "status":
-                cell.font      = s_font
-                cell.fill      = s_fill
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            elif ctype == "num":
-                cell.font      = MUTED_FONT
-                cell.alignment = Alignment(horizontal="right", vertical="center")
-                if alt: cell.fill = _fill("FFFDF5")
-            else:
-                cell.font = BODY_FONT
-                if alt: cell.fill = _fill("FFFDF5")
-        ws.row_dimensions[rn].height = 16
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-
-    fname = f"Plano_Retiros_{ano_lectivo.replace('/', '-')}.xlsx"
-    frappe.response.filename    = fname
-    frappe.response.filecontent = buf.read()
-    frappe.response.type        = "download"
+
+    content = build_xlsx(
+        "Plano de Retiros",
+        f"Plano de Retiros — {ano_lectivo}",
+        meta_text,
+        columns, [{"label": None, "rows": map(_export_values, rows)}], EXPORT_THEME,
+    )
+    set_download(fname, content)
+
+
+# Spec keys understood by the retiro queries (see portal.filters)
+RETIRO_FILTER_FIELDS = {
+    "estado": "estado",
+    "fase":   ("fase_1", "fase_2"),
+    "data":   "data",
+    "search": ("titulo", "orador", "local", "tema"),
+}
+
+
+def _export_rows(ano_lectivo, spec):
+    """Retiros matching the filter spec, by date."""
+    where, params = compile_filters(spec, RETIRO_FILTER_FIELDS)
+    params["ano_lectivo"] = ano_lectivo
+
+    return frappe.db.sql(f"""
+        SELECT name, titulo, data, estado, local, orador, tema,
+               fase_1, fase_2, valor_de_contribuicao, notas
+        FROM `tabPlano de Retiro`
+        WHERE ano_lectivo = %(ano_lectivo)s AND {where}
+        ORDER BY data IS NULL ASC, data ASC
+    """, params, as_dict=True)
+
+
+def _export_columns(fields_json):
+    """_EXPORT_FIELD_META restricted to the selected fields (default all enabled)."""
+    try:
+        fields = json.loads(fields_json) if fields_json else {}
+    except Exception:
+        fields = {}
+    return [col for col in _EXPORT_FIELD_META if fields.get(col[0], True)]
+
+
+def _fmt_date(d):
+    if not d:
+        return "—"
+    y, m, day = str(d)[:10].split("-")
+    return f"{int(day)} {_MESES[int(m)-1]} {y}"
+
+
+def _export_values(row):
+    """Cell values of one _export_rows row, keyed like _EXPORT_FIELD_META."""
+    return {
+        "titulo":       row.titulo or "",
+        "orador":       row.orador or "",
+        "fases":        " + ".join(filter(None, [row.fase_1, row.fase_2])),
+        "data":         _fmt_date(row.data),
+        "local":        row.local  or "",
+        "contribuicao": f"{float(row.valor_de_contribuicao):.2f}" if row.valor_de_contribuicao else "—",
+        "estado":       row.estado or "",
+        "tema":         row.tema   or "",
+        "notas":        row.notas  or "",
+    }
 
 
 def _fetch_retiro(name):
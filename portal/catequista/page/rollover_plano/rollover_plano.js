@@ -79,6 +79,13 @@ function createRolloverApp() {
           <span class="rp-hint">Actividades ao Sáb/Dom mantêm o mesmo dia da semana no ano seguinte</span>
         </span>
       </label>
+      <label class="rp-checkbox-label">
+        <input type="checkbox" v-model="incluirRetiros" />
+        <span>
+          Incluir Plano de Retiros
+          <span class="rp-hint">Copia também os retiros do ano, com o respectivo programa</span>
+        </span>
+      </label>
     </div>
 
     <div v-if="formError" class="rp-alert rp-alert-error">{{ formError }}</div>
@@ -164,21 +171,64 @@ function createRolloverApp() {
       </table>
     </div>
 
+    <!-- Retiros -->
+    <div v-if="previewRetiros" class="rp-card rp-card-create">
+      <div class="rp-section-header">
+        <span class="rp-badge rp-badge-create">{{ previewRetiros.to_create.length }}</span>
+        Retiros a criar
+      </div>
+      <div v-if="previewRetiros.to_create.length === 0" class="rp-empty">Nenhum retiro novo para criar.</div>
+      <table v-else class="rp-table">
+        <thead>
+          <tr>
+            <th>Retiro</th>
+            <th>Origem</th>
+            <th>Data destino</th>
+            <th>Programa</th>
+          </tr>
+        </thead>
+        <tbody>
+          <tr v-for="row in previewRetiros.to_create" :key="row.name">
+            <td>{{ row.titulo }}</td>
+            <td>{{ row.origem }}</td>
+            <td class="rp-date rp-date-new">
+              {{ fmtDate(row.data_destino) }}
+              <span v-if="row.data_destino" class="rp-weekday">{{ weekday(row.data_destino) }}</span>
+            </td>
+            <td>{{ row.itens }} ite{{ row.itens !== 1 ? 'ns' : 'm' }}</td>
+          </tr>
+        </tbody>
+      </table>
+      <p v-if="previewRetiros.to_skip.length > 0" class="rp-empty">
+        {{ previewRetiros.to_skip.length }} ignorado(s) — já existe um retiro das mesmas fases nessa data.
+      </p>
+    </div>
+
     <div v-if="execError" class="rp-alert rp-alert-error">{{ execError }}</div>
 
     <div class="rp-actions">
       <button class="rp-btn rp-btn-ghost" @click="step = 'form'">← Voltar</button>
       <button
         class="rp-btn rp-btn-primary"
-        :disabled="preview.to_create.length === 0 || loading"
+        :disabled="totalACriar === 0 || loading"
         @click="doExecutar"
       >
         <span v-if="loading" class="rp-spinner"></span>
-        <span v-else>Confirmar e criar ({{ preview.to_create.length }})</span>
+        <span v-else>Confirmar e criar ({{ totalACriar }})</span>
       </button>
     </div>
   </div>
 
+  <!-- ── STEP: queued (large plans run in the background) ───────── -->
+  <div v-if="step === 'queued'" class="rp-card rp-card-done">
+    <div class="rp-done-icon">⋯</div>
+    <h2 class="rp-done-title">A criar {{ queued.total }} actividades…</h2>
+    <p class="rp-done-sub">O rollover continua em segundo plano. Esta página actualiza quando terminar.</p>
+    <p v-if="resultRetiros" class="rp-done-sub">
+      {{ resultRetiros.created }} retiro(s) criado(s), com {{ resultRetiros.itens }} itens de programa.
+    </p>
+  </div>
+
   <!-- ── STEP: done ─────────────────────────────────────────────── -->
   <div v-if="step === 'done'" class="rp-card rp-card-done">
     <div class="rp-done-icon">✓</div>
@@ -189,6 +239,9 @@ function createRolloverApp() {
     <p v-if="result.skipped > 0" class="rp-done-sub">
       {{ result.skipped }} ignorada{{ result.skipped !== 1 ? 's' : '' }} (já existiam em {{ result.ano_destino }}).
     </p>
+    <p v-if="resultRetiros" class="rp-done-sub">
+      {{ resultRetiros.created }} retiro(s) criado(s), com {{ resultRetiros.itens }} itens de programa.
+    </p>
     <div class="rp-done-actions">
       <button class="rp-btn rp-btn-primary" @click="openPlano">
         Abrir em Plano Anual →
@@ -208,11 +261,15 @@ function createRolloverApp() {
         anoDestino:   '',
         manterOrador: true,
         ajustarDatas: true,
+        incluirRetiros: false,
         loading:      false,
         formError:    '',
         execError:    '',
         preview:      null,
+        previewRetiros: null,
+        queued:       null,
         result:       null,
+        resultRetiros:  null,
       };
     },
 
@@ -220,6 +277,11 @@ function createRolloverApp() {
       canPreview() {
         return this.anoOrigem && this.anoDestino && this.anoOrigem !== this.anoDestino;
       },
+      totalACriar() {
+        if (!this.preview) return 0;
+        return this.preview.to_create.length
+          + (this.previewRetiros ? this.previewRetiros.to_create.length : 0);
+      },
     },
 
     methods: {
@@ -250,11 +312,31 @@ function createRolloverApp() {
             ajustar_datas: this.ajustarDatas ? '1' : '0',
           },
           callback: (r) => {
-            this.loading = false;
-            if (r.message) {
-              this.preview = r.message;
+            if (!r.message) { this.loading = false; return; }
+            this.preview        = r.message;
+            this.previewRetiros = null;
+            if (!this.incluirRetiros) {
+              this.loading = false;
               this.step    = 'preview';
+              return;
             }
+            frappe.call({
+              method: 'portal.catequista.page.plano_retiro.plano_retiro.preview_rollover_retiros',
+              args: {
+                ano_origem:    this.anoOrigem,
+                ano_destino:   this.anoDestino,
+                ajustar_datas: this.ajustarDatas ? '1' : '0',
+              },
+              callback: (rr) => {
+                this.loading        = false;
+                this.previewRetiros = rr.message || null;
+                this.step           = 'preview';
+              },
+              error: (err) => {
+                this.loading   = false;
+                this.formError = err.message || 'Erro ao pré-visualizar retiros.';
+              },
+            });
           },
           error: (err) => {
             this.loading   = false;
@@ -277,13 +359,38 @@ function createRolloverApp() {
             ano_destino:   this.anoDestino,
             manter_orador: this.manterOrador ? '1' : '0',
             ajustar_datas: this.ajustarDatas ? '1' : '0',
+            plan_token:    this.preview.plan_token || '',
           },
           callback: (r) => {
-            this.loading = false;
-            if (r.message) {
-              this.result = r.message;
-              this.step   = 'done';
-            }
+            if (!r.message) { this.loading = false; return; }
+            const finish = () => {
+              this.loading = false;
+              if (r.message.queued) {
+                // Finished later via portal_rollover_concluido
+                this.queued = r.message;
+                this.step   = 'queued';
+              } else {
+                this.result = r.message;
+                this.step   = 'done';
+              }
+            };
+            if (!this.previewRetiros || !this.previewRetiros.to_create.length) return finish();
+            frappe.call({
+              method: 'portal.catequista.page.plano_retiro.plano_retiro.executar_rollover_retiros',
+              args: {
+                ano_origem:    this.anoOrigem,
+                ano_destino:   this.anoDestino,
+                ajustar_datas: this.ajustarDatas ? '1' : '0',
+              },
+              callback: (rr) => {
+                this.resultRetiros = rr.message || null;
+                finish();
+              },
+              error: (err) => {
+                this.loading   = false;
+                this.execError = err.message || 'Erro ao copiar retiros.';
+              },
+            });
           },
           error: (err) => {
             this.loading   = false;
@@ -302,11 +409,21 @@ function createRolloverApp() {
         this.anoDestino   = '';
         this.manterOrador = true;
         this.ajustarDatas = true;
+        this.incluirRetiros = false;
         this.loading      = false;
         this.formError    = '';
         this.execError    = '';
         this.preview      = null;
+        this.previewRetiros = null;
+        this.queued       = null;
         this.result       = null;
+        this.resultRetiros  = null;
+      },
+
+      _onRolloverConcluido(data) {
+        if (this.step !== 'queued') return;
+        this.result = data;
+        this.step   = 'done';
       },
 
       _loadAnos() {
@@ -324,6 +441,11 @@ function createRolloverApp() {
 
     mounted() {
       this._loadAnos();
+      frappe.realtime.on('portal_rollover_concluido', this._onRolloverConcluido);
+    },
+
+    beforeUnmount() {
+      frappe.realtime.off('portal_rollover_concluido', this._onRolloverConcluido);
     },
   });
 }
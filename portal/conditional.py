@@ -0,0 +1,68 @@
+"""
+Portal de Catequese — ETag / If-None-Match conditional responses.
+
+How it works:
+  - Each read endpoint declares the doctypes its payload is built from.
+  - A single cheap query computes MAX(modified) and COUNT(*) for those tables;
+    together with the endpoint name, its arguments and any extra "vary" value
+    (the catequista, today's date…) this yields a strong ETag.
+  - When the client sends a matching If-None-Match the endpoint answers
+    304 Not Modified without building or serializing the payload.
+  - Otherwise the payload is built as usual and sent with the ETag header.
+
+Outside an HTTP GET (e.g. bench execute, tests) `respond` simply returns the
+built payload, so the endpoints stay callable from Python.
+"""
+
+import hashlib
+import json
+
+import frappe
+
+
+def fingerprint(doctypes):
+    """MAX(modified) + COUNT(*) of every doctype, fetched in one query."""
+    selects = ",\n".join(
+        f"(SELECT MAX(`modified`) FROM `tab{dt}`), (SELECT COUNT(*) FROM `tab{dt}`)"
+        for dt in doctypes
+    )
+    row = frappe.db.sql(f"SELECT {selects}")[0]
+    return "|".join(str(v) for v in row)
+
+
+def make_etag(endpoint, doctypes, vary=None):
+    payload = json.dumps(
+        [endpoint, fingerprint(doctypes), vary],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _is_http_get():
+    request = getattr(frappe.local, "request", None)
+    return request is not None and request.method == "GET"
+
+
+def respond(endpoint, doctypes, build, vary=None):
+    """
+    Return `build()` wrapped in a conditional response.
+    `build` is only called when the client's cached copy is stale.
+    """
+    if not _is_http_get():
+        return build()
+
+    from werkzeug.wrappers import Response
+    from frappe.utils.response import build_response
+
+    etag = make_etag(endpoint, doctypes, vary)
+
+    if frappe.local.request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        frappe.response["message"] = build()
+        response = build_response("json")
+
+    response.set_etag(etag)
+    # Always revalidate; the ETag makes revalidation cheap.
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
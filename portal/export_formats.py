@@ -0,0 +1,134 @@
+"""
+Portal de Catequese — Plain CSV and ODS exports next to the styled XLSX.
+
+How it works:
+  - The page exports take a `format` parameter ("xlsx", "csv" or "ods").
+    xlsx goes through portal.xlsx_report; csv and ods reuse the same column
+    spec and row values but skip all styling and need no openpyxl.
+  - CSV is served as a streaming (chunked) response: csv_response() returns
+    a werkzeug Response over a generator that encodes one row at a time, so
+    the file is never held in memory. The rows are fetched before the
+    response is returned, because the database connection is closed once
+    the request ends.
+  - ODS is a minimal OpenDocument spreadsheet written directly with zipfile
+    (mimetype, manifest and a content.xml written row by row).
+"""
+
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import frappe
+from frappe import _
+
+EXPORT_FORMATS = ("xlsx", "csv", "ods")
+
+
+def validate_format(format):
+    format = (format or "xlsx").lower()
+    if format not in EXPORT_FORMATS:
+        frappe.throw(_("Formato de exportação inválido: {0}").format(format))
+    return format
+
+
+# ── CSV ────────────────────────────────────────────────────────────────────
+
+def iter_csv(columns, rows):
+    """Yield the CSV as UTF-8 chunks — header first, then one chunk per row."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def flush():
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+        return data.encode("utf-8")
+
+    # BOM so Excel opens accented text correctly
+    buf.write("\ufeff")
+    writer.writerow([label for _key, label, _width, _kind in columns])
+    yield flush()
+
+    for row in rows:
+        writer.writerow(["" if row.get(key) is None else row.get(key)
+                         for key, _label, _width, _kind in columns])
+        yield flush()
+
+
+def csv_response(file_name, columns, rows):
+    """A chunked download response — return it from the whitelisted method."""
+    from werkzeug.wrappers import Response
+
+    return Response(
+        iter_csv(columns, rows),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+        direct_passthrough=True,
+    )
+
+
+# ── ODS ────────────────────────────────────────────────────────────────────
+
+_ODS_MIMETYPE = "application/vnd.oasis.opendocument.spreadsheet"
+
+_ODS_MANIFEST = f"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:media-type="{_ODS_MIMETYPE}"/>
+ <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>
+"""
+
+_ODS_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+ xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ office:version="1.2">
+<office:body><office:spreadsheet>
+"""
+
+_ODS_TAIL = "</office:spreadsheet></office:body></office:document-content>\n"
+
+
+def _ods_cell(value):
+    if value is None or value == "":
+        return "<table:table-cell/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<table:table-cell office:value-type="float" office:value="{value}"/>'
+    return (f'<table:table-cell office:value-type="string">'
+            f"<text:p>{escape(str(value))}</text:p></table:table-cell>")
+
+
+def build_ods(sheet_title, columns, rows):
+    """Header row plus one row per dict in `rows`; returns the .ods bytes."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        # The mimetype entry must come first and be stored uncompressed
+        zf.writestr("mimetype", _ODS_MIMETYPE, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/manifest.xml", _ODS_MANIFEST)
+
+        with zf.open("content.xml", "w") as out:
+            out.write(_ODS_HEAD.encode("utf-8"))
+            out.write(f"<table:table table:name={quoteattr(sheet_title)}>".encode("utf-8"))
+            out.write(
+                ("<table:table-row>"
+                 + "".join(_ods_cell(label) for _key, label, _width, _kind in columns)
+                 + "</table:table-row>").encode("utf-8")
+            )
+            for row in rows:
+                out.write(
+                    ("<table:table-row>"
+                     + "".join(_ods_cell(row.get(key)) for key, _label, _width, _kind in columns)
+                     + "</table:table-row>\n").encode("utf-8")
+                )
+            out.write(b"</table:table>")
+            out.write(_ODS_TAIL.encode("utf-8"))
+
+    return buf.getvalue()
+
+
+def set_download(file_name, content):
+    frappe.response["filename"]    = file_name
+    frappe.response["filecontent"] = content
+    frappe.response["type"]        = "download"
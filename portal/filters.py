@@ -0,0 +1,161 @@
+"""
+Portal de Catequese — Filter specs compiled to parameterized SQL.
+
+How it works:
+  - The desk pages describe their filters with one JSON spec, e.g.
+        {"estado": "Pendente", "tipologias": ["Retiro", ""], "month": "2025-03",
+         "search": "missa", "date_from": "2025-01-01", "date_to": "2025-06-30"}
+    parse_spec() validates it; empty values are dropped. Values must be
+    scalars or lists of scalars. Endpoints that still take a filter as its own
+    JSON param (e.g. tipologias_json) decode it with parse_list().
+  - Each query declares which spec keys it supports and the SQL expression
+    behind each one (a FIELDS map, e.g. plano_anual.TIMELINE_FILTER_FIELDS):
+        "search"                       → columns matched with LIKE (any)
+        "month" / "date_from"/"date_to" → the date column under "data"
+        any other key                  → a column, or a tuple of columns
+                                         (any of them equal); lists use IN
+    compile_filters() turns spec + FIELDS into a WHERE fragment and its
+    %(name)s parameters. Keys a query does not declare are ignored, so one
+    spec can drive queries over different doctypes.
+  - limit_clause() adds LIMIT/OFFSET for server-side pagination.
+    keyset_clause() is the alternative for lists the page edits in place: the
+    next page starts after the last row received ({"data", "name"}), so local
+    inserts and deletes do not shift it.
+"""
+
+import json
+import re
+
+import frappe
+from frappe import _
+from frappe.utils import cint, getdate
+
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+_SCALARS  = (str, int, float)
+
+
+def _loads(value, expected):
+    """Decode a JSON filter param; "Filtros inválidos" unless it is `expected`."""
+    if not isinstance(value, str):
+        return value
+    try:
+        decoded = json.loads(value) if value.strip() else expected()
+    except ValueError:
+        frappe.throw(_("Filtros inválidos"))
+    if not isinstance(decoded, expected):
+        frappe.throw(_("Filtros inválidos"))
+    return decoded
+
+
+def parse_list(value):
+    """A JSON list param (e.g. tipologias_json) validated like a spec value."""
+    return parse_spec({"value": _loads(value, list)}).get("value", [])
+
+
+def parse_spec(filters_json=None, **overrides):
+    """
+    filters_json (JSON string or dict) merged with the non-empty keyword
+    overrides, with empty values dropped and month/date values validated.
+    """
+    spec = dict(_loads(filters_json, dict) or {})
+    spec.update({k: v for k, v in overrides.items() if v not in (None, "", [])})
+
+    clean = {}
+    for key, value in spec.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, "", [], ()):
+            continue
+        if isinstance(value, (list, tuple)):
+            if not all(isinstance(v, _SCALARS) for v in value):
+                frappe.throw(_("Filtros inválidos"))
+        elif not isinstance(value, _SCALARS):
+            frappe.throw(_("Filtros inválidos"))
+        clean[key] = value
+
+    if "month" in clean and not _MONTH_RE.match(str(clean["month"])):
+        frappe.throw(_("Formato de mês inválido"))
+    for key in ("date_from", "date_to"):
+        if key in clean:
+            clean[key] = str(getdate(clean[key]))
+    return clean
+
+
+def compile_filters(spec, fields, prefix="f_"):
+    """
+    (where_sql, params) for `spec` over the expressions in `fields`.
+    where_sql is "1=1" when nothing applies.
+    """
+    conditions, params = [], {}
+    date_col = fields.get("data")
+
+    for key, value in spec.items():
+        p = f"{prefix}{key}"
+
+        if key == "search":
+            columns = fields.get("search")
+            if not columns:
+                continue
+            params[p] = f"%{value}%"
+            conditions.append("(" + " OR ".join(f"{c} LIKE %({p})s" for c in columns) + ")")
+
+        elif key == "month":
+            if not date_col:
+                continue
+            params[p] = value
+            conditions.append(f"DATE_FORMAT({date_col}, '%%Y-%%m') = %({p})s")
+
+        elif key in ("date_from", "date_to"):
+            if not date_col:
+                continue
+            params[p] = value
+            conditions.append(f"{date_col} {'>=' if key == 'date_from' else '<='} %({p})s")
+
+        else:
+            column = fields.get(key)
+            if not column:
+                continue
+            columns = column if isinstance(column, tuple) else (column,)
+            if isinstance(value, (list, tuple)):
+                params[p] = list(value)
+                op = f"IN %({p})s"
+            else:
+                params[p] = value
+                op = f"= %({p})s"
+            conditions.append("(" + " OR ".join(f"{c} {op}" for c in columns) + ")")
+
+    return (" AND ".join(conditions) or "1=1"), params
+
+
+def limit_clause(start=0, page_length=0):
+    """LIMIT/OFFSET for a page of results; "" when page_length is 0 (all rows)."""
+    page_length = cint(page_length)
+    if page_length <= 0:
+        return ""
+    return f"LIMIT {page_length} OFFSET {max(cint(start), 0)}"
+
+
+def keyset_clause(after, date_col, name_col, descending=False, prefix="k_"):
+    """
+    (where_sql, params) for the rows that follow `after` — {"data", "name"}
+    of the last row of the previous page, as JSON or dict — in the order
+        ORDER BY date_col IS NULL, date_col [DESC], name_col [DESC]
+    i.e. rows without a date last. ("1=1", {}) when `after` is empty.
+    """
+    after = _loads(after, dict) or {}
+    if not after:
+        return "1=1", {}
+    name = after.get("name")
+    if not isinstance(name, str) or not name:
+        frappe.throw(_("Filtros inválidos"))
+
+    op = "<" if descending else ">"
+    params = {f"{prefix}name": name}
+    if not after.get("data"):
+        return f"({date_col} IS NULL AND {name_col} {op} %({prefix}name)s)", params
+
+    params[f"{prefix}data"] = str(getdate(after["data"]))
+    return (
+        f"({date_col} IS NULL OR {date_col} {op} %({prefix}data)s"
+        f" OR ({date_col} = %({prefix}data)s AND {name_col} {op} %({prefix}name)s))"
+    ), params
@@ -22,6 +22,12 @@ fixtures = [
 # Required apps (pnsa_app must be installed for DocTypes to exist)
 # required_apps = ["pnsa_app"]
 
+# ── Desk scripts ──────────────────────────────────────────────────────────────
+# "Criar utilizadores em falta" button on the Catequista list (bulk provisioning)
+doctype_list_js = {
+    "Catequista": "public/js/catequista_list.js",
+}
+
 # ── After install ──────────────────────────────────────────────────────────────
 # Sets up the Catequista role and DocType permissions automatically.
 after_install = "portal.setup.after_install"
@@ -41,12 +47,83 @@ has_permission = {
     "Catecumeno": "portal.permissions.catecumeno_has_permission",
 }
 
+# ── Scheduler ─────────────────────────────────────────────────────────────────
+# Work skipped per row during Data Import runs once after the import finishes.
+scheduler_events = {
+    "all": [
+        "portal.avisos.atualizar_audiencias_pendentes",
+        "portal.permissions.provisionar_utilizadores_pendentes",
+    ],
+}
+
 # ── Doc events ─────────────────────────────────────────────────────────────────
 # Auto-assigns the Catequista role whenever a Catequista record is saved
 # with a linked User — admin just sets the user field and saves.
+#
+# Every doctype read by the public endpoints bumps the public cache version
+# (portal/cache.py) so cached guest responses are invalidated precisely.
+_BUMP_PUBLIC_CACHE = {
+    "on_change": "portal.cache.bump_version",
+    "on_trash": "portal.cache.bump_version",
+    "after_rename": "portal.cache.bump_version",
+}
+
+_SYNC_SEARCH_AND_BUMP = {
+    event: ["portal.search.sync_doc", handler]
+    for event, handler in _BUMP_PUBLIC_CACHE.items()
+}
+
+# Catequista and Turma changes can move people in or out of an aviso's
+# audience — keep the read-receipt counters current (portal/avisos.py).
+_REFRESH_AVISO_AUDIENCE = "portal.avisos.atualizar_audiencias"
+
+# user → Catequista identity used by the permission hooks (portal/permissions.py)
+_CLEAR_IDENTITY_CACHE = "portal.permissions.clear_identity_cache"
+
+# Catequista → active turmas used by the Catecumeno permission hooks
+_CLEAR_TURMAS_CACHE = "portal.permissions.clear_turmas_cache"
+
 doc_events = {
     "Catequista": {
         "after_insert": "portal.permissions.on_catequista_update",
         "on_update": "portal.permissions.on_catequista_update",
-    }
+        **_BUMP_PUBLIC_CACHE,
+        "on_change": [_BUMP_PUBLIC_CACHE["on_change"], _REFRESH_AVISO_AUDIENCE],
+        "on_trash": [_BUMP_PUBLIC_CACHE["on_trash"], _CLEAR_IDENTITY_CACHE],
+        "after_rename": [
+            _BUMP_PUBLIC_CACHE["after_rename"], _CLEAR_IDENTITY_CACHE, _CLEAR_TURMAS_CACHE,
+        ],
+        "after_delete": _REFRESH_AVISO_AUDIENCE,
+    },
+    # Role changes alter who the permission hooks restrict
+    "User": {
+        "on_update": _CLEAR_IDENTITY_CACHE,
+        "on_trash": _CLEAR_IDENTITY_CACHE,
+    },
+    # Both also keep the search index behind pesquisar() in sync (portal/search.py)
+    "Turma": {
+        **_SYNC_SEARCH_AND_BUMP,
+        "on_change": _SYNC_SEARCH_AND_BUMP["on_change"]
+        + [_REFRESH_AVISO_AUDIENCE, _CLEAR_TURMAS_CACHE],
+        "after_rename": _SYNC_SEARCH_AND_BUMP["after_rename"] + [_CLEAR_TURMAS_CACHE],
+        "after_delete": [_REFRESH_AVISO_AUDIENCE, _CLEAR_TURMAS_CACHE],
+    },
+    "Catecumeno": _SYNC_SEARCH_AND_BUMP,
+    "Turma Catecumenos": _BUMP_PUBLIC_CACHE,
+    "Preparacao do Sacramento": _BUMP_PUBLIC_CACHE,
+    # Compiled field projection of the catequista portal (portal.api._get_projection)
+    "Catequista Portal Settings": {
+        "on_update": "portal.api.clear_portal_config_cache",
+    },
+    "Custom Field": {
+        "on_update": "portal.api.clear_portal_config_cache",
+        "on_trash": "portal.api.clear_portal_config_cache",
+    },
+    "Property Setter": {
+        "on_update": "portal.api.clear_portal_config_cache",
+        "on_trash": "portal.api.clear_portal_config_cache",
+    },
+    "DocType": {
+        "on_update": "portal.api.clear_portal_config_cache",
+    },
 }
@@ -0,0 +1,11 @@
+"""
+Index tabCatecumeno.turma — catecumeno_permission_query filters on
+`turma IN (...)` for every catequista list view.
+"""
+
+import frappe
+
+
+def execute():
+    if frappe.db.table_exists("Catecumeno"):
+        frappe.db.add_index("Catecumeno", ["turma"])
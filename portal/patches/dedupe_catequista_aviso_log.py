@@ -0,0 +1,33 @@
+"""
+Merge duplicate Catequista Aviso Log rows before the unique
+(aviso, catequista) key is added by the model sync.
+"""
+
+import frappe
+
+
+def execute():
+    if not frappe.db.table_exists("Catequista Aviso Log"):
+        return
+
+    duplicados = frappe.db.sql("""
+        SELECT aviso, catequista,
+               MIN(name)                AS keep,
+               SUM(visualizacoes)       AS visualizacoes,
+               MAX(ultima_visualizacao) AS ultima_visualizacao
+        FROM `tabCatequista Aviso Log`
+        GROUP BY aviso, catequista
+        HAVING COUNT(*) > 1
+    """, as_dict=True)
+
+    for d in duplicados:
+        frappe.db.sql("""
+            UPDATE `tabCatequista Aviso Log`
+            SET visualizacoes = %(visualizacoes)s,
+                ultima_visualizacao = %(ultima_visualizacao)s
+            WHERE name = %(keep)s
+        """, d)
+        frappe.db.sql("""
+            DELETE FROM `tabCatequista Aviso Log`
+            WHERE aviso = %(aviso)s AND catequista = %(catequista)s AND name != %(keep)s
+        """, d)
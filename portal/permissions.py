@@ -10,6 +10,17 @@ How it works:
   - System Administrator and other privileged roles are unaffected
     (the functions return "" / None to fall through to normal permissions).
 
+Identity cache:
+  - user → (linked Catequista, is the user restricted to it) is resolved once
+    and kept in a Redis hash (frappe.cache().hget also memoizes it for the
+    request), so the permission hooks and portal.api cost no queries per call.
+  - Cleared from Catequista saves/renames/deletes and from User saves
+    (role changes), see hooks.py.
+  - The active turmas of each catequista are cached the same way
+    (TURMAS_CACHE_KEY), so catecumeno_has_permission is a set lookup and
+    catecumeno_permission_query a plain `turma IN (...)`. Cleared from Turma
+    and Catequista changes.
+
 User automation:
   - When a Catequista record is saved without a linked user, an ERPNext user
     is automatically created:
@@ -18,6 +29,13 @@ User automation:
       * password: pnsa@XXXX (random 4 digits), stored in senha_temporaria
   - If the user already exists (same email), it is linked without changes.
   - Admin can reset the password by editing senha_temporaria and saving.
+  - Data Import skips the per-record creation and only stamps the cache
+    (_PROVISIONAR_KEY). Once no Catequista has been imported for
+    IMPORT_QUIET_SECONDS, the scheduler (provisionar_utilizadores_pendentes)
+    enqueues provisionar_utilizadores_job, which provisions every Catequista
+    without a user in one background job. The "Criar utilizadores em falta"
+    button (provisionar_utilizadores) or bench execute
+    portal.permissions.provisionar_utilizadores_job do the same on demand.
 """
 
 import re
@@ -27,27 +45,96 @@ import unicodedata
 
 import frappe
 
+from portal.avisos import IMPORT_QUIET_SECONDS
+
 CATEQUISTA_ROLE = "Catequista"
 EMAIL_DOMAIN = "pnsa.co.mz"
 
+# Set while a Data Import left Catequistas without a user: {"since", "user"}
+_PROVISIONAR_KEY = "portal:provisionar_utilizadores_pendente"
+
+
+# ── Identity cache ────────────────────────────────────────────────────────────
+
+IDENTITY_CACHE_KEY = "portal:catequista_identity"
+
+
+def _resolve_identity(user):
+    if user in ("Administrator", "Guest"):
+        restricted = False
+    else:
+        roles = frappe.get_roles(user)
+        # Never restrict privileged users, even if they also carry the Catequista role
+        restricted = "System Manager" not in roles and CATEQUISTA_ROLE in roles
+
+    return {
+        "catequista": frappe.db.get_value("Catequista", {"user": user}, "name"),
+        "restricted": restricted,
+    }
+
+
+def _get_identity(user=None):
+    user = user or frappe.session.user
+    return frappe.cache().hget(
+        IDENTITY_CACHE_KEY, user, generator=lambda: _resolve_identity(user)
+    )
+
+
+def clear_identity_cache(doc=None, method=None, *args):
+    """
+    doc_events handler. A User save only affects that user; any Catequista
+    change may relink users, so it clears every entry.
+    """
+    if doc is not None and doc.doctype == "User":
+        def clear():
+            frappe.cache().hdel(IDENTITY_CACHE_KEY, doc.name)
+    else:
+        def clear():
+            frappe.cache().delete_value(IDENTITY_CACHE_KEY)
+
+    clear()
+    # Again after commit — a concurrent request may have re-cached the old row
+    after_commit = getattr(frappe.db, "after_commit", None)
+    if after_commit is not None:
+        after_commit.add(clear)
+
+
+TURMAS_CACHE_KEY = "portal:catequista_turmas"
+
+
+def get_turmas_ativas(catequista):
+    """Names of the active turmas where this catequista is titular or adjunto."""
+    return frappe.cache().hget(
+        TURMAS_CACHE_KEY, catequista,
+        generator=lambda: frappe.db.sql_list("""
+            SELECT name FROM `tabTurma`
+            WHERE (catequista = %(cat)s OR catequista_adj = %(cat)s)
+              AND status = 'Activo'
+            ORDER BY name
+        """, {"cat": catequista}),
+    )
+
+
+def clear_turmas_cache(doc=None, method=None, *args):
+    """doc_events handler for Turma and Catequista."""
+    def clear():
+        frappe.cache().delete_value(TURMAS_CACHE_KEY)
+
+    clear()
+    after_commit = getattr(frappe.db, "after_commit", None)
+    if after_commit is not None:
+        after_commit.add(clear)
+
 
 # ── Internal helpers ──────────────────────────────────────────────────────────
 
-def _get_catequista_name(user=None):
+def get_catequista_name(user=None):
     """Return the Catequista document name linked to this ERPNext user, or None."""
-    user = user or frappe.session.user
-    return frappe.db.get_value("Catequista", {"user": user}, "name")
+    return _get_identity(user)["catequista"]
 
 
 def _user_is_catequista(user=None):
-    user = user or frappe.session.user
-    if user == "Administrator":
-        return False
-    roles = frappe.get_roles(user)
-    # Never restrict privileged users, even if they also carry the Catequista role
-    if "System Manager" in roles:
-        return False
-    return CATEQUISTA_ROLE in roles
+    return _get_identity(user)["restricted"]
 
 
 # ── Turma ─────────────────────────────────────────────────────────────────────
@@ -61,7 +148,7 @@ def turma_permission_query(user):
     if not _user_is_catequista(user):
         return ""
 
-    cat = _get_catequista_name(user)
+    cat = get_catequista_name(user)
     if not cat:
         return "1=0"  # catequista role but no linked Catequista record → no access
 
@@ -77,7 +164,7 @@ def turma_has_permission(doc, ptype, user):
     if not _user_is_catequista(user):
         return None
 
-    cat = _get_catequista_name(user)
+    cat = get_catequista_name(user)
     if not cat:
         return False
 
@@ -93,17 +180,17 @@ def catecumeno_permission_query(user):
     if not _user_is_catequista(user):
         return ""
 
-    cat = _get_catequista_name(user)
+    cat = get_catequista_name(user)
     if not cat:
         return "1=0"
 
-    e = frappe.db.escape(cat)
-    return f"""EXISTS (
-        SELECT 1 FROM `tabTurma` t
-        WHERE t.`name` = `tabCatecumeno`.`turma`
-          AND (t.`catequista` = {e} OR t.`catequista_adj` = {e})
-          AND t.`status` = 'Activo'
-    )"""
+    turmas = get_turmas_ativas(cat)
+    if not turmas:
+        return "1=0"
+
+    return "`tabCatecumeno`.`turma` IN ({})".format(
+        ", ".join(frappe.db.escape(t) for t in turmas)
+    )
 
 
 def catecumeno_has_permission(doc, ptype, user):
@@ -113,22 +200,11 @@ def catecumeno_has_permission(doc, ptype, user):
     if not _user_is_catequista(user):
         return None
 
-    cat = _get_catequista_name(user)
+    cat = get_catequista_name(user)
     if not cat:
         return False
 
-    if not doc.turma:
-        return False
-
-    turma = frappe.db.get_value(
-        "Turma", doc.turma,
-        ["catequista", "catequista_adj", "status"],
-        as_dict=True,
-    )
-    if not turma or turma.status != "Activo":
-        return False
-
-    return turma.catequista == cat or turma.catequista_adj == cat
+    return bool(doc.turma) and doc.turma in get_turmas_ativas(cat)
 
 
 # ── User creation helpers ─────────────────────────────────────────────────────
@@ -141,18 +217,43 @@ def _slugify(name):
     return re.sub(r"[^a-z0-9]", "", first_word.lower()) or "catequista"
 
 
-def _unique_username(base):
+def _like_prefix(text):
+    """LIKE pattern matching values that start with `text` literally."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def _taken_usernames(base):
+    """Every username starting with `base`, in one query."""
+    return set(frappe.db.sql_list(
+        "SELECT username FROM `tabUser` WHERE username LIKE %s", (_like_prefix(base),)
+    ))
+
+
+def _taken_emails(slug):
+    """Every user email of the form slug*@EMAIL_DOMAIN, in one query."""
+    return set(frappe.db.sql_list(
+        "SELECT name FROM `tabUser` WHERE name LIKE %s",
+        (f"{_like_prefix(slug)}@{EMAIL_DOMAIN}",),
+    ))
+
+
+def _unique_username(base, taken=None):
+    taken = _taken_usernames(base) if taken is None else taken
     username, n = base, 2
-    while frappe.db.exists("User", {"username": username}):
+    while username in taken:
         username, n = f"{base}{n}", n + 1
+    taken.add(username)
     return username
 
 
-def _unique_email(slug):
+def _unique_email(slug, taken=None):
+    taken = _taken_emails(slug) if taken is None else taken
     email = f"{slug}@{EMAIL_DOMAIN}"
     n = 2
-    while frappe.db.exists("User", email):
+    while email in taken:
         email, n = f"{slug}{n}@{EMAIL_DOMAIN}", n + 1
+    taken.add(email)
     return email
 
 
@@ -170,7 +271,17 @@ def on_catequista_update(doc, method):
     2. If user is linked and senha_temporaria changed → apply new password.
     3. Always ensure the Catequista role is assigned to the linked user.
     """
+    clear_identity_cache()
+
     if not doc.user:
+        # Data Import: leave it to the bulk job, enqueued once the import is
+        # over (provisionar_utilizadores_pendentes), which resolves unique
+        # names per prefix and reports once at the end
+        if frappe.flags.in_import:
+            frappe.cache().set_value(
+                _PROVISIONAR_KEY, {"since": frappe.utils.now(), "user": frappe.session.user},
+            )
+            return
         _create_and_link_user(doc)
         return  # _create_and_link_user already handles role assignment
 
@@ -188,19 +299,10 @@ def on_catequista_update(doc, method):
 
 def _create_and_link_user(doc):
     """Create an ERPNext user for this Catequista and write it back."""
-    from frappe.utils.password import update_password
-
-    # Resolve email: use field if set, otherwise generate from name
-    email = getattr(doc, "email", None) or None
-    if not email:
-        slug = _slugify(doc.name)
-        email = _unique_email(slug)
+    estado, email, password = _provision_user(doc.name, getattr(doc, "email", None))
+    doc.user = email
 
-    # If a user with that email already exists, just link it
-    if frappe.db.exists("User", email):
-        frappe.db.set_value("Catequista", doc.name, "user", email)
-        doc.user = email
-        _ensure_role(email)
+    if estado == "ligado":
         frappe.msgprint(
             f"Utilizador existente <b>{email}</b> ligado a este catequista.",
             indicator="blue",
@@ -208,9 +310,49 @@ def _create_and_link_user(doc):
         )
         return
 
+    doc.senha_temporaria = password
+    frappe.msgprint(
+        f"Utilizador <b>{email}</b> criado com senha temporária <b>{password}</b>.",
+        indicator="green",
+        alert=True,
+    )
+
+
+def _provision_user(catequista, email=None, taken=None, existing_emails=None):
+    """
+    Create (or link) the user of one Catequista and write it back.
+
+    taken:           {"usernames": {base: set}, "emails": {slug: set}} — taken
+                     names per prefix, shared across calls by the bulk job so
+                     each prefix is queried once.
+    existing_emails: emails known to exist already (bulk job); None → query.
+
+    Returns (estado, email, password) with estado "criado" or "ligado".
+    """
+    from frappe.utils.password import update_password
+
+    taken = taken if taken is not None else {"usernames": {}, "emails": {}}
+
+    # Resolve email: use field if set, otherwise generate from name
+    if not email:
+        slug = _slugify(catequista)
+        if slug not in taken["emails"]:
+            taken["emails"][slug] = _taken_emails(slug)
+        email = _unique_email(slug, taken["emails"][slug])
+
+    # If a user with that email already exists, just link it
+    exists = (email in existing_emails if existing_emails is not None
+              else frappe.db.exists("User", email))
+    if exists:
+        frappe.db.set_value("Catequista", catequista, "user", email)
+        _ensure_role(email)
+        return "ligado", email, None
+
     # Build unique username from the email local-part
-    slug = email.split("@")[0]
-    username = _unique_username(slug)
+    base = email.split("@")[0]
+    if base not in taken["usernames"]:
+        taken["usernames"][base] = _taken_usernames(base)
+    username = _unique_username(base, taken["usernames"][base])
     password = _make_password()
 
     # Create the User document
@@ -218,7 +360,7 @@ def _create_and_link_user(doc):
         "doctype": "User",
         "email": email,
         "username": username,
-        "first_name": doc.name,
+        "first_name": catequista,
         "send_welcome_email": 0,
         "roles": [{"role": CATEQUISTA_ROLE}],
     })
@@ -226,18 +368,117 @@ def _create_and_link_user(doc):
     update_password(email, password)
 
     # Write user + temp password back to the Catequista record
-    frappe.db.set_value("Catequista", doc.name, {
+    frappe.db.set_value("Catequista", catequista, {
         "user": email,
         "senha_temporaria": password,
     })
-    doc.user = email
-    doc.senha_temporaria = password
+    return "criado", email, password
 
-    frappe.msgprint(
-        f"Utilizador <b>{email}</b> criado com senha temporária <b>{password}</b>.",
-        indicator="green",
-        alert=True,
+
+# ── Bulk provisioning ─────────────────────────────────────────────────────────
+
+@frappe.whitelist()
+def provisionar_utilizadores():
+    """
+    Enfileira a criação de utilizadores para todos os Catequistas sem user
+    (ex.: depois de importar a lista de catequistas de um novo ano).
+    O progresso e o resumo final chegam ao utilizador por realtime.
+    """
+    frappe.only_for("System Manager")
+    _enqueue_provisionar(frappe.session.user)
+    return {"queued": True}
+
+
+def _enqueue_provisionar(user):
+    frappe.enqueue(
+        "portal.permissions.provisionar_utilizadores_job",
+        queue="long",
+        timeout=3600,
+        job_name="portal:provisionar_utilizadores",
+        user=user,
+    )
+
+
+def provisionar_utilizadores_pendentes():
+    """
+    Scheduler job: after a Data Import of Catequista, provision the missing
+    users once, as soon as no row has been imported for IMPORT_QUIET_SECONDS.
+    The summary goes to the user who ran the import.
+    """
+    pendente = frappe.cache().get_value(_PROVISIONAR_KEY)
+    if not pendente:
+        return
+    # Rows are still arriving — wait for the import to go quiet
+    if frappe.utils.time_diff_in_seconds(frappe.utils.now(), pendente["since"]) < IMPORT_QUIET_SECONDS:
+        return
+
+    frappe.cache().delete_value(_PROVISIONAR_KEY)
+    _enqueue_provisionar(pendente["user"])
+
+
+def provisionar_utilizadores_job(user=None):
+    """
+    Create or link users for every Catequista without one; progress and the
+    summary are sent to `user` (default: the session user).
+    Also runnable directly:
+        bench execute portal.permissions.provisionar_utilizadores_job
+    """
+    user = user or frappe.session.user
+    pendentes = frappe.db.sql("""
+        SELECT name, email FROM `tabCatequista`
+        WHERE IFNULL(user, '') = ''
+        ORDER BY name
+    """, as_dict=True)
+
+    explicit = [c.email for c in pendentes if c.email]
+    existing_emails = set(frappe.db.sql_list(
+        "SELECT name FROM `tabUser` WHERE name IN %(emails)s", {"emails": explicit},
+    )) if explicit else set()
+
+    taken = {"usernames": {}, "emails": {}}
+    resumo = {"criados": [], "ligados": [], "erros": []}
+    total = len(pendentes)
+
+    for i, c in enumerate(pendentes, 1):
+        try:
+            estado, email, password = _provision_user(c.name, c.email, taken, existing_emails)
+            existing_emails.add(email)
+            if estado == "criado":
+                resumo["criados"].append({"catequista": c.name, "user": email, "senha": password})
+            else:
+                resumo["ligados"].append({"catequista": c.name, "user": email})
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), f"Portal: erro ao criar utilizador de {c.name}")
+            resumo["erros"].append(c.name)
+
+        if i % 10 == 0 or i == total:
+            # publish_progress always targets the session user (Administrator
+            # when enqueued by the scheduler) — send to the recipient instead
+            frappe.publish_realtime(
+                "progress",
+                {"percent": i * 100 / total, "title": "Criação de utilizadores",
+                 "description": f"{i} / {total}"},
+                user=user,
+            )
+
+    clear_identity_cache()
+    frappe.db.commit()
+
+    mensagem = (
+        f"Utilizadores criados: <b>{len(resumo['criados'])}</b>, "
+        f"ligados a existentes: <b>{len(resumo['ligados'])}</b>, "
+        f"erros: <b>{len(resumo['erros'])}</b>."
+    )
+    if resumo["erros"]:
+        mensagem += "<br>Ver Error Log: " + ", ".join(resumo["erros"])
+    frappe.publish_realtime(
+        "msgprint",
+        {"message": mensagem, "title": "Criação de utilizadores", "indicator": "green"},
+        user=user,
     )
+    return resumo
 
 
 def _apply_password(user_email, password):
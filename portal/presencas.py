@@ -0,0 +1,193 @@
+"""
+Portal de Catequese — Attendance log behind the presenças/faltas totals.
+
+How it works:
+  - Each session a catequista marks is stored one row per catecúmeno in
+    `tabRegisto de Presenca` (unique on turma + data + catecumeno), written
+    with a single INSERT ... ON DUPLICATE KEY UPDATE.
+  - The totals on Turma Catecumenos are never overwritten from the client:
+    registar_sessao() computes, per catecúmeno, the difference between the
+    previous and the new record of that session and applies it as an atomic
+    increment (SET total = total + delta). Two catequistas (titular and
+    adjunto) saving at the same time therefore never clobber each other.
+  - The totals can be rebuilt from the log at any time:
+        bench execute portal.presencas.recalcular_totais
+"""
+
+import frappe
+
+LOG_DOCTYPE = "Registo de Presenca"
+
+
+def _tc_fields():
+    """Actual Turma Catecumenos fieldnames behind the presencas/faltas aliases."""
+    from portal.api import _get_projection
+    tc_alias = _get_projection()["tc_alias"]
+    return tc_alias.get("total_presencas"), tc_alias.get("total_faltas")
+
+
+def registar_sessao(turma, data, presencas, rows_in_turma):
+    """
+    Record one session and update the totals.
+
+    presencas:     {catecumeno: 0/1}
+    rows_in_turma: {catecumeno: Turma Catecumenos row name}
+
+    Returns {catecumeno: (delta_presencas, delta_faltas)} for the rows changed.
+    """
+    if not presencas:
+        return {}
+
+    names = list(presencas)
+
+    # Lock this session's existing records so concurrent saves serialize here
+    previous = dict(frappe.db.sql(f"""
+        SELECT catecumeno, presente
+        FROM `tab{LOG_DOCTYPE}`
+        WHERE turma = %(turma)s AND data = %(data)s AND catecumeno IN %(names)s
+        FOR UPDATE
+    """, {"turma": turma, "data": data, "names": names}))
+
+    now  = frappe.utils.now()
+    user = frappe.session.user
+    values, params = [], {"now": now, "user": user, "turma": turma, "data": data}
+    for i, catecumeno in enumerate(names):
+        params[f"n{i}"] = frappe.generate_hash(length=12)
+        params[f"c{i}"] = catecumeno
+        params[f"p{i}"] = presencas[catecumeno]
+        values.append(
+            f"(%(n{i})s, %(now)s, %(now)s, %(user)s, %(user)s, 0,"
+            f" %(turma)s, %(data)s, %(c{i})s, %(p{i})s)"
+        )
+
+    frappe.db.sql(f"""
+        INSERT INTO `tab{LOG_DOCTYPE}`
+            (name, creation, modified, modified_by, owner, docstatus,
+             turma, data, catecumeno, presente)
+        VALUES {", ".join(values)}
+        ON DUPLICATE KEY UPDATE
+            presente    = VALUES(presente),
+            modified    = VALUES(modified),
+            modified_by = VALUES(modified_by)
+    """, params)
+
+    deltas = {}
+    for catecumeno, presente in presencas.items():
+        before = previous.get(catecumeno)
+        if before is None:
+            delta = (presente, 1 - presente)
+        else:
+            delta = (presente - before, before - presente)
+        if delta != (0, 0):
+            deltas[catecumeno] = delta
+
+    _apply_deltas({rows_in_turma[c]: d for c, d in deltas.items()})
+    return deltas
+
+
+def _apply_deltas(deltas):
+    """{row_name: (delta_presencas, delta_faltas)} → one atomic UPDATE."""
+    if not deltas:
+        return
+
+    presencas_field, faltas_field = _tc_fields()
+    params = {
+        "names":       list(deltas),
+        "modified":    frappe.utils.now(),
+        "modified_by": frappe.session.user,
+    }
+
+    assignments = []
+    for idx, field in ((0, presencas_field), (1, faltas_field)):
+        if not field:
+            continue
+        whens = []
+        for j, (row_name, delta) in enumerate(deltas.items()):
+            params[f"r{idx}_{j}"] = row_name
+            params[f"d{idx}_{j}"] = delta[idx]
+            whens.append(f"WHEN %(r{idx}_{j})s THEN %(d{idx}_{j})s")
+        assignments.append(
+            f"`{field}` = GREATEST(0, COALESCE(`{field}`, 0)"
+            f" + CASE name {' '.join(whens)} ELSE 0 END)"
+        )
+
+    if not assignments:
+        return
+
+    frappe.db.sql(f"""
+        UPDATE `tabTurma Catecumenos`
+        SET {", ".join(assignments)},
+            modified = %(modified)s,
+            modified_by = %(modified_by)s
+        WHERE name IN %(names)s
+    """, params)
+
+
+def sessao(turma, data):
+    """{catecumeno: 0/1} already logged for this session."""
+    return dict(frappe.db.sql(f"""
+        SELECT catecumeno, presente
+        FROM `tab{LOG_DOCTYPE}`
+        WHERE turma = %(turma)s AND data = %(data)s
+    """, {"turma": turma, "data": data}))
+
+
+def totais(turma, catecumenos):
+    """{catecumeno: {"total_presencas", "total_faltas"}} as stored on the turma rows."""
+    presencas_field, faltas_field = _tc_fields()
+    if not catecumenos:
+        return {}
+
+    cols = [
+        f"COALESCE(`{field}`, 0) AS {alias}" if field else f"0 AS {alias}"
+        for alias, field in (("total_presencas", presencas_field), ("total_faltas", faltas_field))
+    ]
+    rows = frappe.db.sql(f"""
+        SELECT catecumeno, {", ".join(cols)}
+        FROM `tabTurma Catecumenos`
+        WHERE parent = %(turma)s
+          AND parenttype = 'Turma'
+          AND parentfield = 'lista_catecumenos'
+          AND catecumeno IN %(catecumenos)s
+    """, {"turma": turma, "catecumenos": list(catecumenos)}, as_dict=True)
+    return {
+        r.catecumeno: {"total_presencas": r.total_presencas, "total_faltas": r.total_faltas}
+        for r in rows
+    }
+
+
+def recalcular_totais(turma=None):
+    """
+    Rebuild presenças/faltas on Turma Catecumenos from the attendance log with
+    one aggregate UPDATE. Rows without any logged session are left untouched.
+        bench execute portal.presencas.recalcular_totais
+        bench execute portal.presencas.recalcular_totais --kwargs "{'turma': 'T-001'}"
+    """
+    presencas_field, faltas_field = _tc_fields()
+    assignments = []
+    if presencas_field:
+        assignments.append(f"tc.`{presencas_field}` = agg.presencas")
+    if faltas_field:
+        assignments.append(f"tc.`{faltas_field}` = agg.faltas")
+    if not assignments:
+        return 0
+
+    turma_cond = "AND r.turma = %(turma)s" if turma else ""
+    frappe.db.sql(f"""
+        UPDATE `tabTurma Catecumenos` tc
+        JOIN (
+            SELECT r.turma, r.catecumeno,
+                   SUM(r.presente = 1) AS presencas,
+                   SUM(r.presente = 0) AS faltas
+            FROM `tab{LOG_DOCTYPE}` r
+            WHERE 1=1 {turma_cond}
+            GROUP BY r.turma, r.catecumeno
+        ) agg ON agg.turma = tc.parent AND agg.catecumeno = tc.catecumeno
+        SET {", ".join(assignments)}
+        WHERE tc.parenttype = 'Turma' AND tc.parentfield = 'lista_catecumenos'
+    """, {"turma": turma})
+
+    updated = frappe.db.sql("SELECT ROW_COUNT()")[0][0]
+    frappe.db.commit()
+    print(f"[portal] Totais de presenças recalculados: {updated} linhas.")
+    return updated
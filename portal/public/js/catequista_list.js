@@ -0,0 +1,24 @@
+// Catequista list — bulk user provisioning (portal.permissions.provisionar_utilizadores)
+(function () {
+	const settings = frappe.listview_settings['Catequista'] = frappe.listview_settings['Catequista'] || {};
+	const onload = settings.onload;
+
+	settings.onload = function (listview) {
+		if (onload) onload(listview);
+		if (!frappe.user.has_role('System Manager')) return;
+
+		listview.page.add_inner_button(__('Criar utilizadores em falta'), function () {
+			frappe.confirm(
+				__('Criar (ou ligar) utilizadores para todos os catequistas sem utilizador?'),
+				function () {
+					frappe.call('portal.permissions.provisionar_utilizadores').then(() => {
+						frappe.show_alert({
+							message: __('A criar utilizadores em segundo plano…'),
+							indicator: 'blue',
+						}, 5);
+					});
+				},
+			);
+		});
+	};
+})();
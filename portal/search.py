@@ -0,0 +1,288 @@
+"""
+Portal de Catequese — Search index behind pesquisar().
+
+How it works:
+  - Every searchable name (catecúmeno, encarregado, catequista/catequista_adj
+    of a Turma) is split into words, folded to lowercase ASCII
+    ("Dércio" → "dercio") and stored one word per row in `tabIndice de Pesquisa`.
+  - The index is kept in sync by doc_events on Catecumeno and Turma (see
+    hooks.py) and can be rebuilt at any time:
+        bench execute portal.search.rebuild_search_index
+  - A search folds the query the same way and matches each query word as a
+    prefix (`palavra LIKE 'derc%'`), which uses the B-tree index on palavra —
+    latency depends on the number of matches, not on the table size.
+  - pesquisar() resolves, ranks, de-duplicates, limits and joins all match
+    kinds in one round-trip.
+  - prefix_conditions() applies the same prefix match as a filter on a
+    Catecumeno query (the public list's free-text filter).
+"""
+
+import re
+import unicodedata
+
+import frappe
+
+INDEX_DOCTYPE = "Indice de Pesquisa"
+
+# Query words beyond this are ignored — keeps the generated SQL bounded
+MAX_QUERY_WORDS = 5
+
+
+def fold(text):
+    """'Dércio  Bobo' → 'dercio bobo' (lowercase, accents removed)."""
+    nfkd = unicodedata.normalize("NFKD", text or "")
+    return nfkd.encode("ascii", "ignore").decode("ascii").lower()
+
+
+def fold_words(text):
+    """Folded words of `text`, in order, without punctuation."""
+    return re.findall(r"[a-z0-9]+", fold(text))
+
+
+# ── Index maintenance ─────────────────────────────────────────────────────────
+
+def _tokens(ref_doctype, ref_name, tipo, text):
+    return [
+        (frappe.generate_hash(length=12), ref_doctype, ref_name, tipo, word, pos)
+        for pos, word in enumerate(fold_words(text))
+    ]
+
+
+def _catecumeno_tokens(name, encarregado):
+    return (_tokens("Catecumeno", name, "nome", name)
+            + _tokens("Catecumeno", name, "encarregado", encarregado))
+
+
+def _turma_tokens(name, catequista, catequista_adj):
+    return (_tokens("Turma", name, "catequista", catequista)
+            + _tokens("Turma", name, "catequista", catequista_adj))
+
+
+def _insert(rows):
+    if rows:
+        frappe.db.bulk_insert(
+            INDEX_DOCTYPE,
+            ["name", "ref_doctype", "ref_name", "tipo", "palavra", "posicao"],
+            rows,
+        )
+
+
+def _delete(ref_doctype, ref_name):
+    frappe.db.sql(
+        f"DELETE FROM `tab{INDEX_DOCTYPE}` WHERE ref_doctype = %s AND ref_name = %s",
+        (ref_doctype, ref_name),
+    )
+
+
+def reindex_catecumeno(name):
+    """Re-read one Catecumeno and replace its index rows."""
+    _delete("Catecumeno", name)
+    row = frappe.db.get_value("Catecumeno", name, ["name", "encarregado"], as_dict=True)
+    if row:
+        _insert(_catecumeno_tokens(row.name, row.encarregado))
+
+
+def sync_doc(doc, method=None, *args):
+    """
+    doc_events handler for Catecumeno and Turma (on_change, on_trash, after_rename).
+    after_rename receives (old_name, new_name, merge) as extra arguments.
+    """
+    if method == "on_trash":
+        _delete(doc.doctype, doc.name)
+        return
+
+    if method == "after_rename" and args:
+        _delete(doc.doctype, args[0])
+
+    if doc.doctype == "Catecumeno":
+        _delete("Catecumeno", doc.name)
+        _insert(_catecumeno_tokens(doc.name, doc.get("encarregado")))
+    elif doc.doctype == "Turma":
+        _delete("Turma", doc.name)
+        _insert(_turma_tokens(doc.name, doc.get("catequista"), doc.get("catequista_adj")))
+
+
+def rebuild_search_index():
+    """
+    Rebuild the whole index from Catecumeno and Turma.
+    Safe to run at any time:
+        bench execute portal.search.rebuild_search_index
+    """
+    frappe.db.sql(f"DELETE FROM `tab{INDEX_DOCTYPE}`")
+
+    rows = []
+    for c in frappe.db.sql("SELECT name, encarregado FROM `tabCatecumeno`", as_dict=True):
+        rows.extend(_catecumeno_tokens(c.name, c.encarregado))
+    for t in frappe.db.sql(
+        "SELECT name, catequista, catequista_adj FROM `tabTurma`", as_dict=True
+    ):
+        rows.extend(_turma_tokens(t.name, t.catequista, t.catequista_adj))
+
+    _insert(rows)
+    frappe.db.commit()
+    print(f"[portal] Índice de pesquisa reconstruído: {len(rows)} palavras.")
+
+
+# ── Querying ──────────────────────────────────────────────────────────────────
+
+# Maximum results returned per match kind by pesquisar()
+DEFAULT_LIMITS = {"nome": 20, "encarregado": 10, "catequista": 10}
+
+
+def prefix_conditions(query, catecumeno_col="c.name", turma_col="c.turma"):
+    """
+    (conditions, params) keeping the catecúmenos for which every query word
+    is a prefix of a word of their name or of their turma's catequistas.
+    Each condition is an EXISTS probe on the palavra index.
+    """
+    conditions, params = [], {}
+    for i, word in enumerate(fold_words(query)[:MAX_QUERY_WORDS]):
+        params[f"q{i}"] = f"{word}%"
+        conditions.append(f"""EXISTS (
+            SELECT 1 FROM `tab{INDEX_DOCTYPE}` i
+            WHERE i.palavra LIKE %(q{i})s
+              AND ((i.ref_doctype = 'Catecumeno' AND i.tipo = 'nome' AND i.ref_name = {catecumeno_col})
+                OR (i.ref_doctype = 'Turma' AND i.ref_name = {turma_col}))
+        )""")
+    return conditions, params
+
+
+def pesquisar(query, limits=None):
+    """
+    Run a portal search in a single query.
+
+    Every query word must match an indexed word as a prefix. Hits are
+    de-duplicated in SQL (a catecúmeno matched by name is not repeated as an
+    encarregado match), capped at limits[tipo] per match kind, joined to
+    Catecumeno/Turma and UNIONed into one result set ordered by match kind
+    (nome, encarregado, catequista) and then by relevance: exact word
+    matches, whether the first query word starts the name, then name.
+
+    Returns {"catecumenos": [...], "catequistas": [...]}, the shape of
+    portal.api.pesquisar.
+    """
+    words = fold_words(query)[:MAX_QUERY_WORDS]
+    if not words:
+        return {"catecumenos": [], "catequistas": []}
+
+    limits = limits or DEFAULT_LIMITS
+    params = {f"limit_{tipo}": n for tipo, n in limits.items()}
+    matched, exact, where = [], [], []
+    for i, word in enumerate(words):
+        # fold_words only yields [a-z0-9], so no LIKE wildcards need escaping
+        params[f"p{i}"] = f"{word}%"
+        params[f"w{i}"] = word
+        where.append(f"palavra LIKE %(p{i})s")
+        matched.append(f"MAX(palavra LIKE %(p{i})s)")
+        exact.append(f"MAX(palavra = %(w{i})s)")
+
+    tipo_limit = " ".join(f"WHEN '{tipo}' THEN %(limit_{tipo})s" for tipo in limits)
+
+    rows = frappe.db.sql(f"""
+        WITH hits AS (
+            SELECT
+                ref_doctype,
+                ref_name,
+                tipo,
+                FIELD(tipo, 'nome', 'encarregado', 'catequista') AS tipo_rank,
+                {" + ".join(exact)} AS exactas,
+                MAX(posicao = 0 AND palavra LIKE %(p0)s) AS inicio
+            FROM `tab{INDEX_DOCTYPE}`
+            WHERE {" OR ".join(where)}
+            GROUP BY ref_doctype, ref_name, tipo
+            HAVING {" AND ".join(matched)}
+        ),
+        unique_hits AS (
+            SELECT
+                hits.*,
+                ROW_NUMBER() OVER (
+                    PARTITION BY ref_doctype, ref_name ORDER BY tipo_rank ASC
+                ) AS dup
+            FROM hits
+        ),
+        ranked AS (
+            SELECT
+                unique_hits.*,
+                ROW_NUMBER() OVER (
+                    PARTITION BY tipo
+                    ORDER BY exactas DESC, inicio DESC, ref_name ASC
+                ) AS rn
+            FROM unique_hits
+            WHERE dup = 1
+        )
+        SELECT
+            'catecumeno'    AS kind,
+            r.tipo_rank, r.exactas, r.inicio,
+            c.name,
+            c.fase,
+            c.turma,
+            c.sexo,
+            c.status,
+            c.encarregado,
+            t.local,
+            t.dia,
+            t.hora,
+            t.catequista,
+            t.catequista_adj,
+            IF(r.tipo = 'encarregado', 'encarregado', NULL) AS found_via
+        FROM ranked r
+        JOIN `tabCatecumeno` c ON c.name = r.ref_name
+        LEFT JOIN `tabTurma` t ON t.name = c.turma
+        WHERE r.ref_doctype = 'Catecumeno'
+          AND r.rn <= CASE r.tipo {tipo_limit} ELSE 0 END
+
+        UNION ALL
+
+        SELECT
+            'catequista'    AS kind,
+            r.tipo_rank, r.exactas, r.inicio,
+            t.name,
+            t.fase,
+            t.name          AS turma,
+            NULL            AS sexo,
+            t.status,
+            NULL            AS encarregado,
+            t.local,
+            t.dia,
+            t.hora,
+            t.catequista,
+            t.catequista_adj,
+            NULL            AS found_via
+        FROM ranked r
+        JOIN `tabTurma` t ON t.name = r.ref_name
+        WHERE r.ref_doctype = 'Turma'
+          AND r.rn <= CASE r.tipo {tipo_limit} ELSE 0 END
+
+        ORDER BY tipo_rank ASC, exactas DESC, inicio DESC, name ASC
+    """, params, as_dict=True)
+
+    catecumenos, catequistas = [], []
+    for row in rows:
+        if row.kind == "catecumeno":
+            catecumenos.append({
+                "name":           row.name,
+                "fase":           row.fase,
+                "turma":          row.turma,
+                "sexo":           row.sexo,
+                "status":         row.status,
+                "encarregado":    row.encarregado,
+                "local":          row.local,
+                "dia":            row.dia,
+                "hora":           row.hora,
+                "catequista":     row.catequista,
+                "catequista_adj": row.catequista_adj,
+                "found_via":      row.found_via,
+            })
+        else:
+            catequistas.append({
+                "catequista":     row.catequista,
+                "catequista_adj": row.catequista_adj,
+                "turma":          row.turma,
+                "fase":           row.fase,
+                "local":          row.local,
+                "dia":            row.dia,
+                "hora":           row.hora,
+                "status":         row.status,
+            })
+
+    return {"catecumenos": catecumenos, "catequistas": catequistas}
@@ -5,6 +5,7 @@ Run automatically after `bench install-app portal`.
 Can also be re-run manually:
     bench execute portal.setup.after_install
     bench execute portal.setup.seed_field_config
+    bench execute portal.search.rebuild_search_index
 """
 
 import frappe
@@ -41,6 +42,7 @@ def after_install():
     _setup_permissions()
     _setup_custom_fields()
     seed_field_config()
+    _build_search_index()
     frappe.db.commit()
     print("[portal] Setup completo: papel 'Catequista', permissões e campos personalizados configurados.")
 
@@ -121,3 +123,12 @@ def seed_field_config():
         print("[portal] Configuração inicial de campos e secções do portal criada.")
     except Exception as e:
         print(f"[portal] Aviso: não foi possível criar configuração inicial: {e}")
+
+
+def _build_search_index():
+    """Populate the pesquisar() search index from existing Catecumeno/Turma records."""
+    try:
+        from portal.search import rebuild_search_index
+        rebuild_search_index()
+    except Exception as e:
+        print(f"[portal] Aviso: não foi possível construir o índice de pesquisa: {e}")
@@ -0,0 +1,60 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from portal.api import _minha_turma
+from portal.tests.utils import count_queries, insert_doc
+
+CATEQUISTA = "_Test Catequista Minha Turma"
+
+
+class TestMinhaTurma(FrappeTestCase):
+    """get_minha_turma issues the same number of queries for 1 or N turmas."""
+
+    def setUp(self):
+        self.turmas = 0
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def _make_turma(self, catecumenos=3):
+        self.turmas += 1
+        turma_name = f"_Test Turma {self.turmas}"
+        rows = []
+        for i in range(catecumenos):
+            catecumeno = insert_doc(
+                "Catecumeno", name=f"_Test Catecumeno {self.turmas}-{i}",
+                turma=turma_name, fase="1ª Fase", status="Activo",
+            )
+            rows.append({"catecumeno": catecumeno.name})
+
+        return insert_doc(
+            "Turma", name=turma_name,
+            fase="1ª Fase", ano_lectivo="2025/2026", status="Activo",
+            catequista=CATEQUISTA, lista_catecumenos=rows,
+        )
+
+    def _count(self):
+        with count_queries() as sql:
+            turmas = _minha_turma(CATEQUISTA)
+        return sql.call_count, turmas
+
+    def test_query_count_is_constant_in_turmas(self):
+        self._make_turma()
+        _minha_turma(CATEQUISTA)  # warm the field projection and meta caches
+
+        one, turmas = self._count()
+        self.assertEqual(len(turmas), 1)
+
+        for _i in range(4):
+            self._make_turma(catecumenos=5)
+        many, turmas = self._count()
+
+        self.assertEqual(len(turmas), 5)
+        self.assertEqual(sum(t["total_catecumenos"] for t in turmas), 3 + 4 * 5)
+        self.assertEqual(one, many)
+
+    def test_no_turmas_is_one_query(self):
+        _minha_turma(CATEQUISTA)
+        count, turmas = self._count()
+        self.assertEqual(turmas, [])
+        self.assertEqual(count, 1)
@@ -0,0 +1,76 @@
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from portal.catequista.page.plano_anual import plano_anual
+from portal.tests.utils import count_queries, insert_doc, no_commit
+
+ANO = "_Test 2025/2026"
+
+
+class TestPlanoAnualBulk(FrappeTestCase):
+    """The plano anual bulk endpoints issue O(1) queries in len(names)."""
+
+    def setUp(self):
+        self._no_commit = no_commit()
+        self._no_commit.start()
+
+    def tearDown(self):
+        self._no_commit.stop()
+        frappe.db.rollback()
+
+    def _make(self, count):
+        return [
+            insert_doc(
+                "Actividade do Plano",
+                actividade=f"_Test Actividade {i}", estado="Pendente",
+                ano_lectivo=ANO, data=f"2025-10-{i % 28 + 1:02d}",
+            ).name
+            for i in range(count)
+        ]
+
+    def _count(self, call, names):
+        with count_queries() as sql:
+            call(names)
+        return sql.call_count
+
+    def _assert_constant(self, call):
+        call(self._make(1))  # warm meta, roles and field-projection caches
+        one  = self._count(call, self._make(1))
+        many = self._count(call, self._make(50))
+        self.assertEqual(one, many)
+
+    def test_bulk_update_estado(self):
+        self._assert_constant(
+            lambda names: plano_anual.bulk_update_estado(json.dumps(names), "Realizada")
+        )
+
+    def test_bulk_delete(self):
+        self._assert_constant(lambda names: plano_anual.bulk_delete(json.dumps(names)))
+
+    def test_bulk_move_month(self):
+        self._assert_constant(
+            lambda names: plano_anual.bulk_move_month(json.dumps(names), "2026-02")
+        )
+
+    def test_reorder_actividades(self):
+        self._assert_constant(
+            lambda names: plano_anual.reorder_actividades(ANO, json.dumps(names[::-1]))
+        )
+
+    def test_bulk_delete_removes_rows_and_dependents(self):
+        names = self._make(3)
+        frappe.get_doc(
+            "Actividade do Plano", names[0]
+        ).add_comment("Comment", "_Test comentário")
+
+        self.assertEqual(plano_anual.bulk_delete(json.dumps(names)), {"deleted": 3})
+        self.assertFalse(frappe.db.exists("Actividade do Plano", {"name": ("in", names)}))
+        self.assertFalse(frappe.db.exists(
+            "Comment", {"reference_doctype": "Actividade do Plano", "reference_name": names[0]}
+        ))
+        self.assertEqual(frappe.db.count(
+            "Deleted Document",
+            {"deleted_doctype": "Actividade do Plano", "deleted_name": ("in", names)},
+        ), 3)
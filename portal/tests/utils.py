@@ -0,0 +1,42 @@
+"""
+Portal de Catequese — Helpers shared by the portal test suite.
+
+How it works:
+  - count_queries() wraps frappe.db.sql for the duration of a `with` block
+    and exposes the number of statements issued, so tests can assert that an
+    endpoint's query count does not grow with its input.
+  - insert_doc() creates fixture rows of doctypes owned by pnsa_app (Turma,
+    Catecumeno, ...) without depending on their mandatory fields or links.
+  - Endpoints under test commit; no_commit() turns frappe.db.commit into a
+    no-op so each test's fixtures are rolled back in tearDown.
+
+Run with:
+    bench --site <site> run-tests --app portal
+"""
+
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import frappe
+
+
+@contextmanager
+def count_queries():
+    """Yields a mock whose call_count is the number of frappe.db.sql calls."""
+    with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+        yield sql
+
+
+def no_commit():
+    """Patch frappe.db.commit away so the test transaction can be rolled back."""
+    return patch.object(frappe.db, "commit", lambda *args, **kwargs: None)
+
+
+def insert_doc(doctype, name=None, **values):
+    """Insert a fixture document, skipping mandatory and link validation."""
+    return frappe.get_doc(dict(doctype=doctype, **values)).insert(
+        ignore_permissions=True,
+        ignore_links=True,
+        ignore_mandatory=True,
+        set_name=name,
+    )
@@ -0,0 +1,279 @@
+"""
+Portal de Catequese — Styled XLSX report engine shared by the page exports.
+
+How it works:
+  - A report is a column spec (FIELD_META-style tuples: key, label, width,
+    kind), a list of row groups and a theme (colours and fonts, see
+    plano_anual.EXPORT_THEME / plano_retiro.EXPORT_THEME).
+  - Font/PatternFill/Border/Alignment objects are built once per theme and
+    cached; each workbook registers them as named styles, and every cell only
+    references a style name.
+  - The workbook is written in openpyxl write_only mode, so rows stream to
+    the file as they are produced.
+  - Benchmark (time and peak memory for synthetic rows):
+        bench execute portal.xlsx_report.benchmark --kwargs "{'rows': 10000}"
+
+Column kinds:
+  text, wrap (top-aligned, wrapped), date (centred), num (right, muted),
+  currency (right, "MZN" number format), status (coloured per value via
+  theme["status"], theme["status_fallback"] otherwise), notes (small italic,
+  wrapped).
+"""
+
+import io
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# theme name → {style suffix: (font, fill, alignment, border, number_format)}
+_STYLE_CACHE = {}
+
+
+def _style_specs(theme):
+    """Style objects of a theme — built on first use and reused afterwards."""
+    specs = _STYLE_CACHE.get(theme["name"])
+    if specs is not None:
+        return specs
+
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+    def font(spec):
+        return Font(name="Calibri", **spec)
+
+    def fill(hex_color):
+        return PatternFill("solid", fgColor=hex_color) if hex_color else None
+
+    def side(style, color):
+        return Side(style=style, color=color)
+
+    center   = Alignment(horizontal="center", vertical="center")
+    left_mid = Alignment(horizontal="left",   vertical="center")
+    right    = Alignment(horizontal="right",  vertical="center")
+    top_wrap = Alignment(horizontal="left",   vertical="top", wrap_text=True)
+    indented = Alignment(horizontal="left",   vertical="center", indent=1)
+
+    fonts   = {k: font(v) for k, v in theme["fonts"].items()}
+    gold    = theme["accent"]
+    rule    = Border(bottom=side("thin", "E5E7EB"))
+    box     = Border(**{s: side("thin", "D1D5DB") for s in ("left", "right", "top", "bottom")})
+    headerb = (box if theme.get("header_box")
+               else Border(bottom=side("medium", gold["rule"]), top=side("thin", gold["light"])))
+    monthb  = Border(top=side("medium", gold["rule"]), bottom=side("thin", gold["light"]))
+    footerb = Border(top=side("medium", gold["rule"]))
+
+    specs = {
+        "title":       (fonts["title"], fill(theme["title_fill"]), indented, None, None),
+        "meta":        (fonts["meta"], fill(theme["meta_fill"]), indented, None, None),
+        "header_n":    (fonts["header"], fill(theme["header_fill"]), center, headerb, None),
+        "header":      (fonts["header"], fill(theme["header_fill"]), left_mid, headerb, None),
+        "group":       (fonts["header"], fill(theme["header_fill"]), indented, monthb, None),
+        "group_curr":  (fonts["header"], fill(theme["group_current_fill"]), indented, monthb, None),
+        "group_rule":  (None, None, None, monthb, None),
+        "footer":      (fonts["header"], None, right, footerb, None),
+        "footer_rule": (None, None, None, footerb, None),
+    }
+
+    body = {
+        "n":        (fonts["muted"], center, None),
+        "text":     (fonts["body"], left_mid, None),
+        "wrap":     (fonts["body"], top_wrap, None),
+        "date":     (fonts["body"], center, None),
+        "num":      (fonts["muted"], right, None),
+        "currency": (fonts["body"], right, '#,##0.00 "MZN"'),
+        "notes":    (fonts["note"], top_wrap, None),
+    }
+    alt = fill(theme["alt_fill"])
+    for kind, (f, a, fmt) in body.items():
+        specs[kind]          = (f, None, a, rule, fmt)
+        specs[f"{kind}_alt"] = (f, alt, a, rule, fmt)
+
+    status = dict(theme["status"], **{"": theme["status_fallback"]})
+    for value, (bg, fg, bold) in status.items():
+        specs[_status_suffix(value)] = (
+            font({"size": theme["fonts"]["body"]["size"], "color": fg, "bold": bold}),
+            fill(bg), center, rule, None,
+        )
+
+    _STYLE_CACHE[theme["name"]] = specs
+    return specs
+
+
+def _status_suffix(value):
+    return f"status_{frappe.scrub(value)}" if value else "status_other"
+
+
+def _register_styles(wb, theme):
+    """Register the theme's styles as named styles; returns suffix → style name."""
+    from openpyxl.styles import NamedStyle
+
+    names = {}
+    for suffix, (font, fill, alignment, border, number_format) in _style_specs(theme).items():
+        style = NamedStyle(name=f"{theme['name']}_{suffix}")
+        if font:          style.font = font
+        if fill:          style.fill = fill
+        if alignment:     style.alignment = alignment
+        if border:        style.border = border
+        if number_format: style.number_format = number_format
+        wb.add_named_style(style)
+        names[suffix] = style.name
+    return names
+
+
+def assert_xlsx_available():
+    """Fail early, before any work is queued, when openpyxl is missing."""
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        frappe.throw(_("openpyxl não está instalado. Execute: pip install openpyxl"
+                       " — ou exporte em CSV ou ODS."))
+
+
+def build_xlsx(sheet_title, title, meta, columns, groups, theme, footer=None):
+    """
+    Build a styled report and return the .xlsx bytes.
+
+    columns: [(key, label, width, kind)] — an "#" column is prepended.
+    groups:  [{"label": str | None, "current": bool, "rows": [dict]}]; a
+             label adds a separator row spanning all columns. Row dicts map
+             column keys to cell values.
+    footer:  optional text of a right-aligned closing row.
+    """
+    assert_xlsx_available()
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    heights = theme["heights"]
+    nc = 1 + len(columns)
+    last_col = get_column_letter(nc)
+    header_row = 4 if theme.get("spacer") else 3
+
+    wb = Workbook(write_only=True)
+    style = _register_styles(wb, theme)
+    ws = wb.create_sheet(sheet_title)
+    ws.sheet_view.showGridLines = False
+    ws.freeze_panes = f"{theme['freeze_col']}{header_row + 1}"
+
+    ws.column_dimensions["A"].width = theme["n_width"]
+    for ci, col in enumerate(columns, 2):
+        ws.column_dimensions[get_column_letter(ci)].width = col[2]
+
+    current_row = 0
+
+    def append(cells, height, merge=False):
+        nonlocal current_row
+        current_row += 1
+        ws.row_dimensions[current_row].height = height
+        if merge:
+            ws.merged_cells.add(f"A{current_row}:{last_col}{current_row}")
+        out = []
+        for value, suffix in cells:
+            c = WriteOnlyCell(ws, value=value)
+            c.style = style[suffix]
+            out.append(c)
+        ws.append(out)
+
+    append([(title, "title")], heights["title"], merge=True)
+    append([(meta, "meta")], heights["meta"], merge=True)
+    if theme.get("spacer"):
+        append([], theme["spacer"])
+    append([("#", "header_n")] + [(col[1], "header") for col in columns],
+           heights["header"])
+
+    for group in groups:
+        if group.get("label") is not None:
+            append(
+                [(group["label"], "group_curr" if group.get("current") else "group")]
+                + [(None, "group_rule")] * (nc - 1),
+                heights["group"], merge=True,
+            )
+
+        for idx, row in enumerate(group["rows"]):
+            alt = "_alt" if idx % 2 else ""
+            cells = [(idx + 1, f"n{alt}")]
+            for key, _label, _width, kind in columns:
+                value = row.get(key)
+                if kind == "status":
+                    suffix = _status_suffix(value)
+                    cells.append((value, suffix if suffix in style else "status_other"))
+                elif kind == "currency" and value in (None, ""):
+                    cells.append(("", f"text{alt}"))
+                else:
+                    cells.append(("" if value is None else value, f"{kind}{alt}"))
+            append(cells, heights["row"])
+
+    if footer:
+        append([], heights["row"])
+        append([(footer, "footer")] + [(None, "footer_rule")] * (nc - 1),
+               heights["row"], merge=True)
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def benchmark(rows=10000):
+    """
+    Export `rows` synthetic plano anual rows and report time and peak memory
+    (from two separate runs, so tracing does not inflate the time).
+        bench execute portal.xlsx_report.benchmark --kwargs "{'rows': 10000}"
+    """
+    import random
+    import time
+    import tracemalloc
+    from datetime import date, timedelta
+
+    from portal.catequista.page.plano_anual.plano_anual import EXPORT_THEME, _EXPORT_FIELD_META
+
+    estados = list(EXPORT_THEME["status"])
+    start = date(2025, 1, 1)
+    synthetic = sorted(
+        (
+            {
+                "actividade":     f"Actividade {i}",
+                "tipologia":      random.choice(["Formação", "Liturgia", "Retiro", "Reunião"]),
+                "data":           (start + timedelta(days=random.randint(0, 364))).isoformat(),
+                "data_original":  "",
+                "orador":         f"Orador {i % 50}",
+                "local":          "Paróquia Nossa Senhora da Assunção",
+                "orcamento":      float(random.randint(0, 50000)),
+                "estado":         random.choice(estados),
+                "notas_execucao": "Notas de execução " * 3,
+            }
+            for i in range(max(1, cint(rows)))
+        ),
+        key=lambda r: r["data"],
+    )
+
+    groups = {}
+    for row in synthetic:
+        groups.setdefault(row["data"][:7], []).append(row)
+
+    def build():
+        return build_xlsx(
+            "Plano Anual", "Benchmark", "Linhas sintéticas", _EXPORT_FIELD_META,
+            [{"label": key, "rows": group} for key, group in groups.items()],
+            EXPORT_THEME, footer=f"Total: {len(synthetic)}",
+        )
+
+    # Timed without tracemalloc, whose per-allocation hook slows the build;
+    # peak memory is measured on a second, untimed run.
+    t0 = time.perf_counter()
+    content = build()
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "rows":       len(synthetic),
+        "seconds":    round(elapsed, 3),
+        "peak_mb":    round(peak / 1024 / 1024, 2),
+        "size_kb":    round(len(content) / 1024, 1),
+    }
+    print(f"[portal] xlsx benchmark: {result}")
+    return result
+